@@ -0,0 +1,170 @@
+"""
+Quiz activation broadcast benchmark against a fake Bot API that enforces Telegram's limits.
+
+Usage:
+    python -m benchmarks.broadcast_benchmark [--students 2000] [--rate 25] [--concurrency 10]
+
+The fake Bot API answers 429 with retry_after once more than --api-cap messages arrived
+within a second, 403 for every --blocked-every-th student (blocked the bot) and 500 for a
+random --error-rate of the calls. The broadcast runs chunk by chunk through
+src.services.broadcast.send_next_chunk on a temporary SQLite database, like the job would.
+
+Reports messages per second, the busiest second seen by the fake API, how many 429s the
+sender provoked, and the sent and dead-lettered counts written to the database as JSON.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import date
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import SendMessage
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.e2e_benchmark import current_commit
+from benchmarks.telegram_benchmark import FakeSession
+from src.bot.sender import BroadcastSender
+from src.config import TELEGRAM_BROADCAST_CHUNK_SIZE
+from src.database.database import dispose_engines, get_session_maker, set_engine
+from src.models.models import Base, Course, QuizBroadcast, QuizBroadcastFailure, User
+from src.services.broadcast import send_next_chunk
+
+COURSE_ID = 1
+FIRST_TELEGRAM_ID = 700000
+
+
+class RateCappedSession(FakeSession):
+    """FakeSession that fails sends the way Telegram does when a bot goes too fast or is blocked."""
+
+    def __init__(self, latency: float, cap: int, blocked_every: int, error_rate: float, seed: int = 0):
+        super().__init__(latency)
+        self.cap = cap
+        self.blocked_every = blocked_every
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.too_many_requests = 0
+        self.per_second: dict[int, int] = defaultdict(int)
+        self._window: deque = deque()
+        self._started = time.monotonic()
+
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None) -> Any:
+        if isinstance(method, SendMessage):
+            now = time.monotonic()
+            while self._window and self._window[0] <= now - 1:
+                self._window.popleft()
+            if len(self._window) >= self.cap:
+                self.too_many_requests += 1
+                raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=1)
+            self._window.append(now)
+            self.per_second[int(now - self._started)] += 1
+            if self.blocked_every and (method.chat_id - FIRST_TELEGRAM_ID) % self.blocked_every == 0:
+                raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+            if self.rng.random() < self.error_rate:
+                raise TelegramServerError(method=method, message="Internal Server Error")
+        return await super().make_request(bot, method, timeout)
+
+
+async def seed(students: int) -> int:
+    async with get_session_maker()() as session:
+        session.add(Course(
+            id=COURSE_ID, name="Benchmark", start_date=date(2025, 1, 1),
+            end_date=date(2025, 12, 31), people_count=students,
+        ))
+        for number in range(students):
+            session.add(User(
+                telegram_id=FIRST_TELEGRAM_ID + number, name=f"Student{number}", surname="Benchmark",
+                username=f"bc_student{number}", email=f"bc_student{number}@example.com",
+                hashed_password="x", course_id=COURSE_ID,
+                is_active=True, is_superuser=False, is_verified=False,
+            ))
+        broadcast = QuizBroadcast(course_id=COURSE_ID, quiz_number=1)
+        session.add(broadcast)
+        await session.commit()
+        return broadcast.id
+
+
+async def main(args: argparse.Namespace) -> dict:
+    logging.getLogger().setLevel(args.log_level)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/benchmark.db")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        set_engine(engine)
+        broadcast_id = await seed(args.students)
+
+        session = RateCappedSession(
+            latency=args.api_latency_ms / 1000, cap=args.api_cap,
+            blocked_every=args.blocked_every, error_rate=args.error_rate,
+        )
+        bot = Bot("42:BENCHMARK", session=session)
+        sender = BroadcastSender(
+            rate=args.rate, concurrency=args.concurrency,
+            max_attempts=args.max_attempts, retry_base=args.retry_seconds,
+        )
+
+        started = time.perf_counter()
+        chunks = 0
+        while await send_next_chunk(broadcast_id, bot, sender):
+            chunks += 1
+            print(f"chunk {chunks}: {sender.sent} sent", file=sys.stderr)
+        seconds = time.perf_counter() - started
+
+        async with get_session_maker()() as db:
+            broadcast = await db.get(QuizBroadcast, broadcast_id)
+            dead_letters = (await db.execute(
+                select(func.count()).select_from(QuizBroadcastFailure)
+                .where(QuizBroadcastFailure.broadcast_id == broadcast_id)
+            )).scalar()
+            report_row = {"status": broadcast.status, "sent": broadcast.sent, "failed": broadcast.failed}
+        await dispose_engines()
+
+    # The first and last second are partial, the busiest full second is what the cap applies to
+    busiest = max(session.per_second.values(), default=0)
+    return {
+        "commit": current_commit(),
+        "students": args.students,
+        "chunk_size": TELEGRAM_BROADCAST_CHUNK_SIZE,
+        "chunks": chunks,
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "api_cap": args.api_cap,
+        "seconds": round(seconds, 3),
+        "messages_per_second": round((sender.sent + sender.failed) / seconds, 1),
+        "busiest_second": busiest,
+        "too_many_requests": session.too_many_requests,
+        "retried": sender.retried,
+        "broadcast": report_row,
+        "dead_letters": dead_letters,
+        "delivered_or_dead_lettered": report_row["sent"] + report_row["failed"] == args.students,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000, help="students in the course")
+    parser.add_argument("--rate", type=float, default=25, help="sender messages per second")
+    parser.add_argument("--concurrency", type=int, default=10, help="sender requests in flight")
+    parser.add_argument("--max-attempts", type=int, default=3, help="attempts before a message is dead-lettered")
+    parser.add_argument("--retry-seconds", type=float, default=0.2, help="first retry backoff")
+    parser.add_argument("--api-cap", type=int, default=30, help="messages per second the fake API accepts")
+    parser.add_argument("--api-latency-ms", type=float, default=50, help="simulated Bot API round trip")
+    parser.add_argument("--blocked-every", type=int, default=50, help="every n-th student blocked the bot, 0 for none")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of calls failing with a 500")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--log-level", default="WARNING", help="application log level during the run")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,100 @@
+"""
+Compression benchmark on realistic quiz payloads.
+
+Usage:
+    python -m benchmarks.compression_benchmark [--iterations 200]
+
+For every quiz size it reports the raw and compressed body size, the time to compress
+a body the first time (cache miss), the time to serve it again (cache hit) and the
+estimated transfer time on a slow mobile link.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from src.middleware.compression import CompressionMiddleware, brotli
+
+WORDS = (
+    "which of the following statements about the function is correct when the input "
+    "list is empty and the loop never executes returns value raises exception because "
+    "python evaluates default arguments once at definition time so mutable objects are "
+    "shared between calls explanation variable scope closure generator iterator"
+).split()
+
+LINK_BYTES_PER_SECOND = {
+    "3g": 1_600_000 / 8,
+    "4g": 10_000_000 / 8,
+}
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "?"
+
+
+def make_quiz(question_count: int, seed: int = 0) -> bytes:
+    """Build a quiz document shaped like `Quiz` in src/schemas/quiz_schemas.py."""
+    rng = random.Random(seed)
+    questions = []
+    for number in range(question_count):
+        correct = rng.randrange(4)
+        questions.append({
+            "image_url": f"https://bucket.s3.amazonaws.com/quiz_images/q{number}.png" if number % 3 == 0 else None,
+            "image_key": f"quiz_images/q{number}.png" if number % 3 == 0 else None,
+            "question": _sentence(rng, rng.randint(12, 30)),
+            "answer": [[index == correct, _sentence(rng, rng.randint(3, 10))] for index in range(4)],
+            "explanation": _sentence(rng, rng.randint(20, 60)),
+        })
+    quiz = {
+        "_id": "665f1c2e9b1e8a3f4c2d1a0b",
+        "course_id": 1,
+        "quiz_number": 1,
+        "questions": questions,
+        "time_for_completion": 600,
+        "is_active": True,
+    }
+    return json.dumps(quiz).encode()
+
+
+async def measure(middleware: CompressionMiddleware, body: bytes, encoding: str, iterations: int) -> dict:
+    middleware.cache.clear()
+    started = time.perf_counter()
+    compressed = await middleware.compress(body, encoding)
+    cold = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await middleware.compress(body, encoding)
+    warm = (time.perf_counter() - started) / iterations
+
+    result = {
+        "encoding": encoding,
+        "compressed_bytes": len(compressed),
+        "ratio": round(len(body) / len(compressed), 2),
+        "cold_compress_us": round(cold * 1e6, 1),
+        "cached_us": round(warm * 1e6, 1),
+    }
+    for link, rate in LINK_BYTES_PER_SECOND.items():
+        result[f"saved_ms_{link}"] = round((len(body) - len(compressed)) / rate * 1000, 1)
+    return result
+
+
+async def main(iterations: int) -> None:
+    middleware = CompressionMiddleware(app=None)
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    report = []
+    for question_count in (5, 20, 50, 100):
+        body = make_quiz(question_count)
+        for encoding in encodings:
+            row = {"questions": question_count, "raw_bytes": len(body)}
+            row.update(await measure(middleware, body, encoding, iterations))
+            report.append(row)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,243 @@
+"""
+End-to-end benchmark of the real `src.main:app`, driven in process through an ASGI client.
+
+Usage:
+    python -m benchmarks.e2e_benchmark [--requests 500] [--concurrency 50] [--output report.json]
+    python -m benchmarks.e2e_benchmark --scenario login_storm --compare baseline.json
+
+No Atlas, AWS or Postgres is needed: Postgres is replaced by a temporary SQLite file (or a
+throwaway database passed with --database-url), Mongo by mongomock-motor and S3 by moto.
+The stand-ins are listed in benchmarks/requirements.txt.
+
+Every scenario reports throughput and p50/p95/p99 latency in milliseconds as JSON, tagged
+with the current commit, so reports from two commits can be compared with --compare.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import boto3
+from bson import ObjectId
+import httpx
+from fastapi_users.password import PasswordHelper
+from moto import mock_aws
+from mongomock_motor import AsyncMongoMockClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Every simulated client shares one address, per-IP limits would turn the scenarios into 429s.
+# Must be set before src.config is imported, export RATE_LIMIT_ENABLED=true to measure with them.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from benchmarks.compression_benchmark import make_quiz
+from src.database.aws_s3 import S3Handler, set_s3_handler
+from src.database.database import dispose_engines, get_session_maker, set_engine
+from src.database.mongo import get_quiz_collection, set_mongo_client
+from src.main import app, lifespan
+from src.models.models import Base, Course, User
+
+BUCKET_NAME = "benchmark-bucket"
+PASSWORD = "benchmark-password"
+COURSE_ID = 1
+QUIZ_COUNT = 10
+IMAGE_BYTES = 200 * 1024
+
+
+async def seed(users: int) -> None:
+    """One course, `users` students sharing a password, and QUIZ_COUNT quizzes of 20 questions."""
+    hashed_password = PasswordHelper().hash(PASSWORD)
+    async with get_session_maker()() as session:
+        session.add(Course(
+            id=COURSE_ID, name="Benchmark", start_date=date(2025, 1, 1),
+            end_date=date(2025, 12, 31), people_count=users,
+        ))
+        for number in range(1, users + 1):
+            session.add(User(
+                telegram_id=100000 + number, name=f"Student{number}", surname="Benchmark",
+                username=f"student{number}", email=f"student{number}@example.com",
+                hashed_password=hashed_password, course_id=COURSE_ID,
+                is_active=True, is_superuser=False, is_verified=False,
+            ))
+        await session.commit()
+
+    quizzes = []
+    for quiz_number in range(1, QUIZ_COUNT + 1):
+        quiz = json.loads(make_quiz(20, seed=quiz_number))
+        # Same shape as documents written by POST /quiz/, whose ids are strings
+        quiz.update(_id=str(ObjectId()), course_id=COURSE_ID, quiz_number=quiz_number)
+        quizzes.append(quiz)
+    await get_quiz_collection().insert_many(quizzes)
+
+
+def quiz_open_stampede(index: int, users: int) -> dict:
+    """Everyone opens the same freshly activated quiz at once."""
+    return {"method": "GET", "url": f"/quiz/course/{COURSE_ID}/number/1"}
+
+
+def login_storm(index: int, users: int) -> dict:
+    """The whole course logs in at the start of a session."""
+    number = index % users + 1
+    return {
+        "method": "POST",
+        "url": "/login",
+        "json": {"email": f"student{number}@example.com", "password": PASSWORD},
+    }
+
+
+def grade_submission_burst(index: int, users: int) -> dict:
+    """Students hand in quizzes around the deadline, each (user, quiz) pair once."""
+    return {
+        "method": "POST",
+        "url": "/grades/",
+        "json": {
+            "course_id": COURSE_ID,
+            "user_id": index % users + 1,
+            "grade": float(index % 11),
+            "quiz_number": index // users + 1,
+            "date": datetime(2025, 6, 1, 12, 0).isoformat(),
+            "time_completion": 120.0 + index % 60,
+        },
+    }
+
+
+def image_upload(index: int, users: int) -> dict:
+    """Question images uploaded while quizzes are being authored."""
+    image = io.BytesIO(os.urandom(IMAGE_BYTES))
+    return {"method": "POST", "url": "/s3/", "files": {"file": (f"bench_{index}.png", image, "image/png")}}
+
+
+SCENARIOS = {
+    "quiz_open_stampede": quiz_open_stampede,
+    "login_storm": login_storm,
+    "grade_submission_burst": grade_submission_burst,
+    "image_upload": image_upload,
+}
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(fraction * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(client: httpx.AsyncClient, build_request, requests: int, concurrency: int, users: int) -> dict:
+    latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        kwargs = build_request(index, users)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(**kwargs)
+            latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Relative change per scenario, positive throughput and negative latency changes are improvements."""
+    changes = {}
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        changes[name] = {
+            metric: f"{(result[metric] - before[metric]) / before[metric] * 100:+.1f}%"
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+            if before.get(metric)
+        }
+    return {"baseline_commit": baseline.get("commit"), "changes": changes}
+
+
+async def main(args: argparse.Namespace) -> dict:
+    # Logs share stdout with the report, pass --log-level INFO to include their cost anyway
+    logging.getLogger().setLevel(args.log_level)
+    with tempfile.TemporaryDirectory() as directory, mock_aws():
+        database_url = args.database_url or f"sqlite+aiosqlite:///{directory}/benchmark.db"
+        engine = create_async_engine(database_url)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+        set_engine(engine)
+        set_mongo_client(AsyncMongoMockClient())
+
+        s3_client = boto3.client("s3", region_name="us-east-1")
+        s3_client.create_bucket(Bucket=BUCKET_NAME)
+        set_s3_handler(S3Handler(s3_client, bucket_name=BUCKET_NAME))
+
+        await seed(args.users)
+
+        report = {
+            "commit": current_commit(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "scenarios": {},
+        }
+        transport = httpx.ASGITransport(app=app)
+        async with lifespan(app), httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name in args.scenario or SCENARIOS:
+                report["scenarios"][name] = await run_scenario(
+                    client, SCENARIOS[name], args.requests, args.concurrency, args.users
+                )
+                print(f"{name}: {report['scenarios'][name]['throughput_rps']} req/s", file=sys.stderr)
+        await dispose_engines()
+        set_s3_handler(None)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight at once")
+    parser.add_argument("--users", type=int, default=100, help="seeded students")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--database-url", help="async SQLAlchemy URL of a throwaway database, all tables are dropped")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--compare", help="report of an earlier run to compare against")
+    parser.add_argument("--log-level", default="WARNING", help="application log level during the run")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            report["comparison"] = compare(report, json.load(baseline_file))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    print(json.dumps(report, indent=2))
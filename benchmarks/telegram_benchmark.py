@@ -0,0 +1,290 @@
+"""
+Telegram bot benchmark: fake updates posted to POST /telegram/webhook of the real `src.main:app`.
+
+Usage:
+    python -m benchmarks.telegram_benchmark [--chats 200] [--questions 10] [--api-latency-ms 50]
+
+Every chat is a seeded student who sends /start and /quiz 1, then clicks an answer button
+for every question the bot sends back until the grade is saved. The Bot API is replaced by a
+fake session that records what the bot sends per chat and answers after --api-latency-ms,
+so no token or network is needed. Afterwards every chat bursts --burst "/quiz N" commands for
+quizzes that don't exist, and the replies are checked to come back in the order sent.
+
+Reports webhook latency (time until Telegram would get its answer), the time from an update
+to the bot's reply and the pipeline counters as JSON.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, AsyncGenerator, Dict, Optional
+
+import httpx
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import AnswerCallbackQuery, EditMessageReplyMarkup, GetMe, SendMessage, SendPhoto
+from aiogram.types import Chat, Message, User as TelegramUser
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Every update comes from one address, see benchmarks/e2e_benchmark.py
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from benchmarks.compression_benchmark import make_quiz
+from benchmarks.e2e_benchmark import current_commit, percentile
+from src.bot.webhook import start_telegram_bot, telegram_pipeline
+from src.database.database import dispose_engines, get_session_maker, set_engine
+from src.database.mongo import get_quiz_collection, set_mongo_client
+from src.main import app, lifespan
+from src.models.models import Base, Course, User
+
+SECRET = "benchmark-secret"
+COURSE_ID = 1
+FIRST_TELEGRAM_ID = 500000
+
+
+class FakeSession(BaseSession):
+    """Bot API stand-in: records the messages sent to every chat and wakes up whoever waits for them."""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.sent: dict[int, list[Message]] = defaultdict(list)
+        self.calls: dict[str, int] = defaultdict(int)
+        self._new_message: dict[int, asyncio.Event] = defaultdict(asyncio.Event)
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        await asyncio.sleep(self.latency)
+        if isinstance(method, GetMe):
+            return TelegramUser(id=1, is_bot=True, first_name="QuizBot", username="quiz_bot")
+        if isinstance(method, (SendMessage, SendPhoto)):
+            message = Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=method.chat_id, type="private"),
+                text=getattr(method, "text", None),
+                caption=getattr(method, "caption", None),
+                reply_markup=method.reply_markup,
+            )
+            self.sent[method.chat_id].append(message)
+            self._new_message[method.chat_id].set()
+            return message.as_(bot)
+        if isinstance(method, (AnswerCallbackQuery, EditMessageReplyMarkup)):
+            return True
+        raise NotImplementedError(type(method).__name__)
+
+    async def wait_for_message(self, chat_id: int, count: int) -> Message:
+        """Wait until the bot has sent `count` messages to the chat, return the last of them."""
+        while len(self.sent[chat_id]) < count:
+            self._new_message[chat_id].clear()
+            await self._new_message[chat_id].wait()
+        return self.sent[chat_id][count - 1]
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(
+            self,
+            url: str,
+            headers: Optional[Dict[str, Any]] = None,
+            timeout: int = 30,
+            chunk_size: int = 65536,
+            raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+class FakeChat:
+    """One student talking to the bot, builds the updates Telegram would post for them."""
+
+    update_ids = itertools.count(1)
+
+    def __init__(self, telegram_id: int):
+        self.telegram_id = telegram_id
+        self.sender = {"id": telegram_id, "is_bot": False, "first_name": f"Student{telegram_id}"}
+        self.chat = {"id": telegram_id, "type": "private"}
+
+    def message(self, text: str) -> dict:
+        command_length = len(text.split()[0]) if text.startswith("/") else 0
+        return {
+            "update_id": next(self.update_ids),
+            "message": {
+                "message_id": next(self.update_ids),
+                "date": int(time.time()),
+                "chat": self.chat,
+                "from": self.sender,
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": command_length}] if command_length else [],
+            },
+        }
+
+    def click(self, message: Message, data: str) -> dict:
+        return {
+            "update_id": next(self.update_ids),
+            "callback_query": {
+                "id": str(next(self.update_ids)),
+                "from": self.sender,
+                "chat_instance": str(self.telegram_id),
+                "message": {
+                    "message_id": message.message_id,
+                    "date": int(time.time()),
+                    "chat": self.chat,
+                    "text": message.text or message.caption or "",
+                },
+                "data": data,
+            },
+        }
+
+
+async def seed(chats: int, questions: int) -> None:
+    async with get_session_maker()() as session:
+        session.add(Course(
+            id=COURSE_ID, name="Benchmark", start_date=date(2025, 1, 1),
+            end_date=date(2025, 12, 31), people_count=chats,
+        ))
+        for number in range(chats):
+            session.add(User(
+                telegram_id=FIRST_TELEGRAM_ID + number, name=f"Student{number}", surname="Benchmark",
+                username=f"tg_student{number}", email=f"tg_student{number}@example.com",
+                hashed_password="x", course_id=COURSE_ID,
+                is_active=True, is_superuser=False, is_verified=False,
+            ))
+        await session.commit()
+
+    quiz = json.loads(make_quiz(questions, seed=1))
+    quiz.update(_id=str(ObjectId()), course_id=COURSE_ID, quiz_number=1)
+    await get_quiz_collection().insert_one(quiz)
+
+
+class Run:
+    def __init__(self, client: httpx.AsyncClient, session: FakeSession):
+        self.client = client
+        self.session = session
+        self.webhook_latencies = []
+        self.reply_latencies = []
+        self.statuses = defaultdict(int)
+
+    async def post(self, update: dict) -> None:
+        started = time.perf_counter()
+        response = await self.client.post(
+            "/telegram/webhook", json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+        )
+        self.webhook_latencies.append(time.perf_counter() - started)
+        self.statuses[response.status_code] += 1
+
+    async def exchange(self, chat: FakeChat, update: dict) -> Message:
+        """Post an update and wait for the bot's answer to it."""
+        expected = len(self.session.sent[chat.telegram_id]) + 1
+        started = time.perf_counter()
+        await self.post(update)
+        reply = await self.session.wait_for_message(chat.telegram_id, expected)
+        self.reply_latencies.append(time.perf_counter() - started)
+        return reply
+
+    async def take_quiz(self, chat: FakeChat) -> bool:
+        await self.exchange(chat, chat.message("/start"))
+        reply = await self.exchange(chat, chat.message("/quiz 1"))
+        while reply.reply_markup is not None:
+            first_button = reply.reply_markup.inline_keyboard[0][0]
+            reply = await self.exchange(chat, chat.click(reply, first_button.callback_data))
+        return "finished" in (reply.text or "")
+
+    async def burst(self, chat: FakeChat, commands: int) -> bool:
+        """Send commands back to back without waiting, True if the replies kept their order."""
+        already_sent = len(self.session.sent[chat.telegram_id])
+        numbers = [1000 + index for index in range(commands)]
+        for number in numbers:
+            await self.post(chat.message(f"/quiz {number}"))
+        await self.session.wait_for_message(chat.telegram_id, already_sent + commands)
+        replies = self.session.sent[chat.telegram_id][already_sent:]
+        return [reply.text for reply in replies] == [f"Quiz #{number} is not available." for number in numbers]
+
+
+def latency_summary(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    # aiogram logs every handled update, pass --log-level INFO to include that cost anyway
+    logging.getLogger().setLevel(args.log_level)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/benchmark.db")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        set_engine(engine)
+        set_mongo_client(AsyncMongoMockClient())
+        await seed(args.chats, args.questions)
+
+        session = FakeSession(latency=args.api_latency_ms / 1000)
+        chats = [FakeChat(FIRST_TELEGRAM_ID + number) for number in range(args.chats)]
+        transport = httpx.ASGITransport(app=app)
+        async with lifespan(app), httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            # The lifespan only starts the bot when TELEGRAM_WEBHOOK_ENABLED is set
+            if not telegram_pipeline.running:
+                await start_telegram_bot(Bot("42:BENCHMARK", session=session), secret=SECRET)
+            run = Run(client, session)
+
+            started = time.perf_counter()
+            finished = await asyncio.gather(*(run.take_quiz(chat) for chat in chats))
+            quiz_seconds = time.perf_counter() - started
+            print(f"quizzes: {sum(finished)}/{len(chats)} in {quiz_seconds:.2f}s", file=sys.stderr)
+
+            in_order = await asyncio.gather(*(run.burst(chat, args.burst) for chat in chats))
+        # Read after the lifespan drained the workers, so the counters include every update
+        pipeline = {
+            "workers": telegram_pipeline.workers,
+            "handled": telegram_pipeline.handled,
+            "failed": telegram_pipeline.failed,
+            "rejected": telegram_pipeline.rejected,
+        }
+        await dispose_engines()
+
+    return {
+        "commit": current_commit(),
+        "chats": args.chats,
+        "questions": args.questions,
+        "api_latency_ms": args.api_latency_ms,
+        "quizzes_finished": sum(finished),
+        "quiz_seconds": round(quiz_seconds, 3),
+        "updates_per_second": round(len(run.reply_latencies) / quiz_seconds, 1),
+        "chats_in_order": sum(in_order),
+        "webhook": latency_summary(run.webhook_latencies),
+        "reply": latency_summary(run.reply_latencies),
+        "statuses": {str(status): count for status, count in sorted(run.statuses.items())},
+        "bot_api_calls": dict(session.calls),
+        "pipeline": pipeline,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200, help="students taking the quiz at once")
+    parser.add_argument("--questions", type=int, default=10, help="questions in the quiz")
+    parser.add_argument("--burst", type=int, default=5, help="commands every chat sends back to back at the end")
+    parser.add_argument("--api-latency-ms", type=float, default=50, help="simulated Bot API round trip")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--log-level", default="WARNING", help="application log level during the run")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    print(json.dumps(report, indent=2))
@@ -1,3 +1,4 @@
+import logging
 import os
 from typing import Optional
 from fastapi import Depends, Request
@@ -16,6 +17,8 @@ from src.models.models import User
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Constants
 SECRET = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ACCESS_TOKEN_EXPIRE_SECONDS = 3600  # 1 hour
@@ -27,13 +30,13 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     verification_token_secret = SECRET
 
     async def on_after_register(self, user: User, request: Optional[Request] = None):
-        print(f"✅ User {user.email} (ID: {user.id}) has registered.")
+        logger.info("User registered", extra={"event": "auth.registered", "user_id": user.id})
 
     async def on_after_login(self, user: User, request: Optional[Request] = None):
-        print(f"🔐 User {user.email} (ID: {user.id}) logged in.")
+        logger.info("User logged in", extra={"event": "auth.login", "user_id": user.id})
 
     async def on_after_logout(self, user: User, request: Optional[Request] = None):
-        print(f"🚪 User {user.email} (ID: {user.id}) logged out.")
+        logger.info("User logged out", extra={"event": "auth.logout", "user_id": user.id})
 
 
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
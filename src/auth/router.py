@@ -1,3 +1,5 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -12,6 +14,8 @@ from src.schemas.auth_schemas import UserRead, UserCreate, UserUpdate, LoginRequ
 from src.models.models import User
 from src.database.database import get_async_session
 
+logger = logging.getLogger(__name__)
+
 # Create the main auth router
 router = APIRouter(tags=["authentication"])
 
@@ -54,7 +58,7 @@ async def authenticate_with_password_helper(
             user = result.scalar_one_or_none()
 
         if not user:
-            print(f"❌ User not found: {email}")
+            logger.info("Login failed", extra={"event": "auth.login_failed", "reason": "unknown_user"})
             return None
 
         # CORRECT: Use password_helper from UserManager
@@ -65,24 +69,25 @@ async def authenticate_with_password_helper(
             )
 
             if not verified:
-                print(f"❌ Invalid password for user: {email}")
+                logger.info("Login failed", extra={
+                    "event": "auth.login_failed", "reason": "invalid_password", "user_id": user.id
+                })
                 return None
 
-        except Exception as verify_error:
-            print(f"❌ Password verification failed: {verify_error}")
+        except Exception:
+            logger.warning("Password verification failed", exc_info=True, extra={
+                "event": "auth.verify_error", "user_id": user.id
+            })
             return None
 
         if not user.is_active:
-            print(f"❌ User inactive: {email}")
+            logger.info("Login failed", extra={"event": "auth.login_failed", "reason": "inactive", "user_id": user.id})
             return None
 
-        print(f"✅ Authentication successful for: {email}")
         return user
 
-    except Exception as e:
-        print(f"❌ Authentication error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Authentication error", extra={"event": "auth.error"})
         return None
 
 
@@ -97,8 +102,6 @@ async def custom_login(
 ):
     """Custom login using UserManager's password_helper."""
 
-    print(f"🔐 Login attempt for: {login_data.email}")
-
     # Use password_helper for verification
     user = await authenticate_with_password_helper(
         login_data.email,
@@ -108,14 +111,11 @@ async def custom_login(
     )
 
     if not user:
-        print(f"❌ Authentication failed for: {login_data.email}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid email/username or password"
         )
 
-    print(f"✅ User authenticated: {user.email} (ID: {user.id})")
-
     # Generate JWT token using the auth backend
     strategy = auth_backend.get_strategy()
     token = await strategy.write_token(user)
@@ -132,8 +132,6 @@ async def custom_login(
     # Call after login hook
     await user_manager.on_after_login(user, request)
 
-    print(f"🍪 Cookie set for user: {user.email}")
-
     # Return detailed user information
     return {
         "access_token": token,
@@ -161,8 +159,6 @@ async def custom_logout(
 ):
     """Custom logout endpoint."""
 
-    print(f"🚪 Logout for user: {current_user.email}")
-
     # Clear the cookie
     response.delete_cookie(key="auth_token")
 
@@ -0,0 +1,160 @@
+import base64
+import hashlib
+import hmac
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from aiogram import BaseMiddleware, F, Router
+from aiogram.filters import Command, CommandObject, CommandStart
+from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message, TelegramObject
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.database import get_session_maker
+from src.schemas.grades_schemas import GradeCreate
+from src.services.grades import create_grade, has_grade
+from src.services.quizzes import get_quiz
+from src.services.users import get_user_by_telegram_id
+
+router = Router(name="quiz_bot")
+
+NOT_REGISTERED = "You are not registered yet, sign up in the course web app first."
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """One database session per update, handed to the handlers as `db`."""
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        async with get_session_maker()() as db:
+            data["db"] = db
+            return await handler(event, data)
+
+
+class AnswerState(NamedTuple):
+    """
+    Progress through a quiz, carried in the callback data of the answer buttons instead of being
+    kept by the worker, so any worker process can handle the next answer. Signed, so a client
+    can't hand itself a better score.
+    """
+    quiz_number: int
+    question: int
+    option: int
+    correct: int
+    started: int
+
+    def encode(self, key: bytes) -> str:
+        payload = "a:" + ":".join(str(value) for value in self)
+        return f"{payload}:{_sign(key, payload)}"
+
+    @classmethod
+    def decode(cls, data: str, key: bytes) -> Optional["AnswerState"]:
+        payload, _, signature = data.rpartition(":")
+        if not hmac.compare_digest(signature, _sign(key, payload)):
+            return None
+        try:
+            return cls(*(int(value) for value in payload.split(":")[1:]))
+        except (TypeError, ValueError):
+            return None
+
+
+def _sign(key: bytes, payload: str) -> str:
+    # Callback data is limited to 64 bytes, 8 bytes of MAC are plenty against guessing
+    digest = hmac.new(key, payload.encode(), hashlib.sha256).digest()[:8]
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+async def send_question(message: Message, quiz: dict, state: AnswerState, callback_key: bytes) -> None:
+    question = quiz["questions"][state.question]
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=text, callback_data=state._replace(option=option).encode(callback_key))]
+        for option, (_, text) in enumerate(question.get("answer", []))
+    ])
+    text = f"Quiz #{quiz['quiz_number']}, question {state.question + 1}/{len(quiz['questions'])}\n\n{question['question']}"
+    if question.get("image_url"):
+        await message.answer_photo(question["image_url"], caption=text, reply_markup=keyboard)
+    else:
+        await message.answer(text, reply_markup=keyboard)
+
+
+@router.message(CommandStart())
+async def start(message: Message, db: AsyncSession) -> None:
+    user = await get_user_by_telegram_id(db, message.from_user.id)
+    if user is None:
+        await message.answer(NOT_REGISTERED)
+        return
+    await message.answer(f"Hi {user.name}! Send /quiz <number> to start a quiz of your course.")
+
+
+@router.message(Command("quiz"))
+async def start_quiz(message: Message, command: CommandObject, db: AsyncSession, callback_key: bytes) -> None:
+    user = await get_user_by_telegram_id(db, message.from_user.id)
+    if user is None:
+        await message.answer(NOT_REGISTERED)
+        return
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Send /quiz <number>, e.g. /quiz 3")
+        return
+
+    quiz_number = int(command.args)
+    quiz = await get_quiz(user.course_id, quiz_number)
+    if quiz is None or not quiz.get("is_active") or not quiz.get("questions"):
+        await message.answer(f"Quiz #{quiz_number} is not available.")
+        return
+    if await has_grade(db, user.course_id, user.id, quiz_number):
+        await message.answer(f"You already completed quiz #{quiz_number}.")
+        return
+
+    state = AnswerState(quiz_number=quiz_number, question=0, option=0, correct=0, started=int(time.time()))
+    await send_question(message, quiz, state, callback_key)
+
+
+@router.callback_query(F.data.startswith("a:"))
+async def answer(callback: CallbackQuery, db: AsyncSession, callback_key: bytes) -> None:
+    state = AnswerState.decode(callback.data, callback_key)
+    user = await get_user_by_telegram_id(db, callback.from_user.id)
+    if state is None or user is None:
+        await callback.answer("This answer can't be accepted.", show_alert=True)
+        return
+    quiz = await get_quiz(user.course_id, state.quiz_number)
+    if quiz is None or state.question >= len(quiz["questions"]):
+        await callback.answer("This quiz has changed, start it again with /quiz.", show_alert=True)
+        return
+
+    options = quiz["questions"][state.question].get("answer", [])
+    correct = state.correct + int(state.option < len(options) and bool(options[state.option][0]))
+    await callback.answer()
+    # The buttons of an answered question go away, so it can't be answered twice
+    await callback.message.edit_reply_markup(reply_markup=None)
+
+    if state.question + 1 < len(quiz["questions"]):
+        next_state = state._replace(question=state.question + 1, correct=correct)
+        await send_question(callback.message, quiz, next_state, callback_key)
+        return
+
+    grade = GradeCreate(
+        course_id=user.course_id,
+        user_id=user.id,
+        grade=correct,
+        quiz_number=state.quiz_number,
+        date=datetime.utcnow(),
+        time_completion=max(0, int(time.time()) - state.started),
+    )
+    try:
+        await create_grade(db, grade)
+    except HTTPException as e:
+        await callback.message.answer(f"Your result was not saved: {e.detail}")
+        return
+    await callback.message.answer(
+        f"Quiz #{state.quiz_number} finished: {correct} of {len(quiz['questions'])} answers correct."
+    )
+
+
+@router.message()
+async def fallback(message: Message) -> None:
+    await message.answer("Send /quiz <number> to start a quiz of your course.")
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+def update_chat_id(update: Update) -> int:
+    """Chat an update belongs to, updates without one are spread by their id."""
+    event = update.event
+    chat = getattr(event, "chat", None)
+    if chat is None and getattr(event, "message", None) is not None:
+        chat = event.message.chat  # callback queries
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else update.update_id
+
+
+class UpdatePipeline:
+    """
+    Bounded hand-off between the webhook and the aiogram dispatcher. Updates are sharded by
+    chat over `workers` queues, one worker each, so the updates of a chat are handled one at a
+    time and in the order Telegram sent them while different chats run in parallel.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self._bot: Optional[Bot] = None
+        self._dispatcher: Optional[Dispatcher] = None
+        self.handled = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def submit(self, update: Update) -> bool:
+        """Queue the update, False when its shard is full and Telegram should redeliver it later."""
+        queue = self._queues[update_chat_id(update) % self.workers]
+        if queue.full():
+            self.rejected += 1
+            return False
+        queue.put_nowait(update)
+        return True
+
+    def pending(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    async def start(self, bot: Bot, dispatcher: Dispatcher) -> None:
+        self._bot = bot
+        self._dispatcher = dispatcher
+        shard_size = max(1, self.queue_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=shard_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self, drain_timeout: float) -> None:
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Telegram pipeline stopped with %d updates unhandled", self.pending())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self._dispatcher.feed_update(self._bot, update)
+                self.handled += 1
+            except Exception:
+                # Telegram already got its 200, a failing handler must not stop the chat's later updates
+                self.failed += 1
+                logger.exception(
+                    "Telegram update %d failed", update.update_id,
+                    extra={"event": "telegram.update_failed", "update_type": update.event_type},
+                )
+            finally:
+                queue.task_done()
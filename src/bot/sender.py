@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+    TelegramUnauthorizedError,
+)
+
+from src.config import (
+    TELEGRAM_BROADCAST_CONCURRENCY,
+    TELEGRAM_BROADCAST_MAX_ATTEMPTS,
+    TELEGRAM_BROADCAST_RATE,
+    TELEGRAM_BROADCAST_RETRY_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SendLimiter:
+    """
+    Spaces sends `1 / rate` seconds apart, so no second ever holds more than `rate` of them.
+    `pause` holds every sender back after Telegram answered 429, which it does per bot and
+    not per chat.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        self._next = max(self._next, time.monotonic() + seconds)
+
+
+class BroadcastSender:
+    """
+    Sends one message to many chats: at most `concurrency` requests in flight and `rate` per
+    second. Network errors and 5xx are retried with exponential backoff up to `max_attempts`
+    times, a 429 waits for its retry_after without using up an attempt, anything else Telegram
+    rejects (blocked bot, deleted account) is not retried. The limits are per process, a
+    second process broadcasting at the same time is slowed down by the 429s instead.
+    """
+
+    def __init__(
+            self,
+            rate: float = TELEGRAM_BROADCAST_RATE,
+            concurrency: int = TELEGRAM_BROADCAST_CONCURRENCY,
+            max_attempts: int = TELEGRAM_BROADCAST_MAX_ATTEMPTS,
+            retry_base: float = TELEGRAM_BROADCAST_RETRY_SECONDS,
+    ):
+        self.limiter = SendLimiter(rate)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.sent = 0
+        self.retried = 0
+        self.throttled = 0
+        self.failed = 0
+
+    async def send(self, bot: Bot, chat_id: int, text: str) -> tuple[int, Optional[str]]:
+        """
+        Send `text` to the chat. Returns the attempts made and the last error, None once delivered.
+        An invalid bot token raises, every other message would fail the same way.
+        """
+        attempts = 0
+        while True:
+            async with self._semaphore:
+                await self.limiter.wait()
+                attempts += 1
+                try:
+                    await bot.send_message(chat_id, text)
+                    self.sent += 1
+                    return attempts, None
+                except TelegramRetryAfter as e:
+                    self.limiter.pause(e.retry_after)
+                    self.throttled += 1
+                    attempts -= 1
+                    continue
+                except TelegramUnauthorizedError:
+                    raise
+                except (TelegramNetworkError, TelegramServerError) as e:
+                    error = f"{type(e).__name__}: {e.message}"
+                except TelegramAPIError as e:
+                    self.failed += 1
+                    return attempts, f"{type(e).__name__}: {e.message}"
+
+            if attempts >= self.max_attempts:
+                self.failed += 1
+                return attempts, error
+            self.retried += 1
+            # Backoff outside the semaphore, so a failing chat doesn't hold a slot while it waits
+            await asyncio.sleep(self.retry_base * 2 ** (attempts - 1))
+
+
+broadcast_sender = BroadcastSender()
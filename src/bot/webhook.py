@@ -0,0 +1,67 @@
+import hashlib
+import hmac
+import logging
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+
+from src.bot.handlers import DbSessionMiddleware, router
+from src.bot.pipeline import UpdatePipeline
+from src.config import (
+    TELEGRAM_DRAIN_SECONDS,
+    TELEGRAM_QUEUE_SIZE,
+    TELEGRAM_WEBHOOK_URL,
+    TELEGRAM_WORKERS,
+    get_env_or_raise,
+)
+
+logger = logging.getLogger(__name__)
+
+dispatcher = Dispatcher()
+dispatcher.update.outer_middleware(DbSessionMiddleware())
+dispatcher.include_router(router)
+
+telegram_pipeline = UpdatePipeline(workers=TELEGRAM_WORKERS, queue_size=TELEGRAM_QUEUE_SIZE)
+
+_bot: Optional[Bot] = None
+_secret: Optional[str] = None
+
+
+def get_telegram_bot() -> Optional[Bot]:
+    return _bot
+
+
+def webhook_secret_matches(secret_token: Optional[str]) -> bool:
+    return _secret is not None and secret_token is not None and hmac.compare_digest(secret_token, _secret)
+
+
+async def start_telegram_bot(bot: Optional[Bot] = None, secret: Optional[str] = None) -> None:
+    """
+    Start the update workers. `bot` and `secret` replace the real bot and TELEGRAM_WEBHOOK_SECRET,
+    e.g. a bot with a fake session for benchmarks; the webhook is only registered for the real one.
+    """
+    global _bot, _secret
+    _secret = secret or get_env_or_raise("TELEGRAM_WEBHOOK_SECRET")
+    _bot = bot or Bot(get_env_or_raise("TELEGRAM_BOT_TOKEN"))
+    dispatcher["callback_key"] = hashlib.sha256(_secret.encode()).digest()
+    await telegram_pipeline.start(_bot, dispatcher)
+
+    if TELEGRAM_WEBHOOK_URL and bot is None:
+        try:
+            await _bot.set_webhook(
+                TELEGRAM_WEBHOOK_URL,
+                secret_token=_secret,
+                allowed_updates=dispatcher.resolve_used_update_types(),
+            )
+        except Exception:
+            logger.warning("Could not register the Telegram webhook", exc_info=True)
+
+
+async def stop_telegram_bot() -> None:
+    global _bot, _secret
+    if _bot is None:
+        return
+    await telegram_pipeline.stop(TELEGRAM_DRAIN_SECONDS)
+    await _bot.session.close()
+    _bot = None
+    _secret = None
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from src.config import (
+    ANALYTICS_CACHE_MAX_ENTRIES,
+    ANALYTICS_CACHE_TTL_SECONDS,
+    QUIZ_CACHE_MAX_ENTRIES,
+    QUIZ_CACHE_TTL_SECONDS,
+)
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache whose entries expire after `ttl` seconds.
+    Values are shared between callers, so they must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def delete_matching(self, predicate: Callable[[Hashable], bool]) -> None:
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Quiz documents keyed by (course_id, quiz_number)
+quiz_cache = TTLCache(max_entries=QUIZ_CACHE_MAX_ENTRIES, ttl=QUIZ_CACHE_TTL_SECONDS)
+
+# Per-quiz analytics keyed by (course_id, quiz_number) and per-course completion counts keyed by
+# (course_id, None), both dropped on every grade write
+analytics_cache = TTLCache(max_entries=ANALYTICS_CACHE_MAX_ENTRIES, ttl=ANALYTICS_CACHE_TTL_SECONDS)
+
+
+def invalidate_quiz(course_id: int, quiz_number: int) -> None:
+    quiz_cache.delete((course_id, quiz_number))
+
+
+def invalidate_course_quizzes(course_id: int) -> None:
+    quiz_cache.delete_matching(lambda key: key[0] == course_id)
+
+
+def invalidate_quiz_analytics(course_id: int, quiz_number: int) -> None:
+    analytics_cache.delete((course_id, quiz_number))
+    analytics_cache.delete((course_id, None))
@@ -0,0 +1,172 @@
+"""
+Maintenance of the per-course partitions of `grade` (Postgres only).
+
+Usage:
+    python -m src.commands.grade_partitions status
+    python -m src.commands.grade_partitions ensure [--grace-days 30] [--dir archives/grades]
+    python -m src.commands.grade_partitions archive [--grace-days 30] [--dir archives/grades] [--dry-run]
+    python -m src.commands.grade_partitions restore COURSE_ID [--dir archives/grades]
+
+ensure   gives every course without one its own partition, moving its grades out of the
+         default partition. New courses get theirs when they are created, so this is only
+         needed after bulk imports or when the default partition reports rows. Courses that
+         are archived or past their archiving date are skipped, `restore` brings theirs back.
+archive  detaches the partition of every course whose end_date is more than --grace-days
+         ago, exports it to <dir>/grade_course_<id>.csv.gz and drops it. A course whose
+         export fails keeps its detached table, running the command again picks it up.
+         Leaderboards keep working from course_user_stats, individual grades of an archived
+         course are gone from the API until it is restored.
+restore  loads an archive back into the course's partition and attaches it, moving grades
+         written since out of the default partition. The archive is renamed to
+         <file>.restored afterwards, so it is never loaded twice.
+
+Each command prints one JSON object per course it acted on.
+"""
+import argparse
+import asyncio
+import json
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from src.config import GRADE_ARCHIVE_DIR, GRADE_ARCHIVE_GRACE_DAYS
+from src.database.database import dispose_engines, get_engine
+from src.services.grade_partitions import (
+    DEFAULT_PARTITION,
+    PARTITION_PREFIX,
+    archive_path,
+    attach_partition,
+    attached_partitions,
+    create_partition,
+    export_table,
+    finished_courses,
+    grade_is_partitioned,
+    import_table,
+    partition_name,
+    table_exists,
+)
+
+
+def report(**fields) -> None:
+    print(json.dumps(fields, default=str), flush=True)
+
+
+async def status(args: argparse.Namespace) -> None:
+    async with get_engine().connect() as connection:
+        partitions = await attached_partitions(connection)
+        result = await connection.execute(text(
+            "SELECT course.id, course.end_date, pg_total_relation_size(to_regclass(:prefix || course.id)) "
+            "FROM course ORDER BY course.id"
+        ), {"prefix": PARTITION_PREFIX})
+        for course_id, end_date, size in result:
+            report(course_id=course_id, end_date=end_date, partition=partitions.get(course_id), bytes=size)
+        default_rows = await connection.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}"))
+        report(partition=DEFAULT_PARTITION, rows=default_rows.scalar())
+
+
+async def ensure(args: argparse.Namespace) -> None:
+    ended_before = date.today() - timedelta(days=args.grace_days)
+    async with get_engine().connect() as connection:
+        partitions = await attached_partitions(connection)
+        courses = (await connection.execute(text("SELECT id, end_date FROM course ORDER BY id"))).all()
+
+    for course_id, end_date in courses:
+        if course_id in partitions:
+            continue
+        # An empty partition would hide the archive from `restore`
+        if end_date < ended_before or os.path.exists(archive_path(args.dir, course_id)):
+            continue
+        # One transaction per course, the ATTACH holds a lock on `grade` until it commits
+        async with get_engine().begin() as connection:
+            if await create_partition(connection, course_id):
+                report(course_id=course_id, action="created", partition=partition_name(course_id))
+
+
+async def archive(args: argparse.Namespace) -> None:
+    os.makedirs(args.dir, exist_ok=True)
+    ended_before = date.today() - timedelta(days=args.grace_days)
+    async with get_engine().connect() as connection:
+        partitions = await attached_partitions(connection)
+        course_ids = await finished_courses(connection, ended_before)
+
+    for course_id in course_ids:
+        table = partition_name(course_id)
+        if args.dry_run:
+            if course_id in partitions:
+                report(course_id=course_id, action="would_archive", partition=table)
+            continue
+
+        if course_id in partitions:
+            async with get_engine().begin() as connection:
+                await connection.execute(text(f"ALTER TABLE grade DETACH PARTITION {table}"))
+        else:
+            async with get_engine().connect() as connection:
+                if not await table_exists(connection, table):
+                    continue  # archived before, or its grades are still in the default partition
+
+        path = archive_path(args.dir, course_id)
+        async with get_engine().begin() as connection:
+            rows = await export_table(connection, table, path)
+            await connection.execute(text(f"DROP TABLE {table}"))
+        report(course_id=course_id, action="archived", rows=rows, file=path)
+
+
+async def restore(args: argparse.Namespace) -> None:
+    course_id = args.course_id
+    table = partition_name(course_id)
+    path = archive_path(args.dir, course_id)
+    archived = os.path.exists(path)
+    async with get_engine().begin() as connection:
+        attached = course_id in await attached_partitions(connection)
+        detached = not attached and await table_exists(connection, table)
+        if attached and not archived:
+            raise SystemExit(f"{table} is already attached")
+        if not archived and not detached:
+            raise SystemExit(f"{path} does not exist")
+
+        rows = None
+        if not attached and not detached:
+            await connection.execute(text(f"CREATE TABLE {table} (LIKE grade INCLUDING DEFAULTS)"))
+        # A detached table was left by an interrupted `archive` and still holds the course's
+        # grades. An attached one was created after archiving, the archive is loaded into it.
+        if not detached:
+            rows = await import_table(connection, table, path)
+        if not attached:
+            await attach_partition(connection, table, course_id)
+    if archived:
+        os.replace(path, f"{path}.restored")
+    report(course_id=course_id, action="restored", rows=rows, partition=table)
+
+
+COMMANDS = {"status": status, "ensure": ensure, "archive": archive, "restore": restore}
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        async with get_engine().connect() as connection:
+            if not await grade_is_partitioned(connection):
+                raise SystemExit("grade is not partitioned, run `alembic upgrade head` first")
+        await COMMANDS[args.command](args)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="partition of every course and rows left in the default partition")
+    ensure_parser = subparsers.add_parser("ensure", help="create missing course partitions")
+    ensure_parser.add_argument("--grace-days", type=int, default=GRADE_ARCHIVE_GRACE_DAYS,
+                               help="days after end_date from which a course is left to the archive")
+    ensure_parser.add_argument("--dir", default=GRADE_ARCHIVE_DIR, help="directory the archives are kept in")
+    archive_parser = subparsers.add_parser("archive", help="export and drop partitions of finished courses")
+    archive_parser.add_argument("--grace-days", type=int, default=GRADE_ARCHIVE_GRACE_DAYS,
+                                help="days after end_date before a course is archived")
+    archive_parser.add_argument("--dir", default=GRADE_ARCHIVE_DIR, help="directory the archives are written to")
+    archive_parser.add_argument("--dry-run", action="store_true", help="only list the partitions that would be archived")
+    restore_parser = subparsers.add_parser("restore", help="attach an archived course partition again")
+    restore_parser.add_argument("course_id", type=int)
+    restore_parser.add_argument("--dir", default=GRADE_ARCHIVE_DIR, help="directory the archives are read from")
+
+    asyncio.run(main(parser.parse_args()))
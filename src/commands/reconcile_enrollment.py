@@ -0,0 +1,65 @@
+"""
+Recount Course.enrolled_count from the users of the course.
+
+Usage:
+    python -m src.commands.reconcile_enrollment [--course-id 3] [--dry-run]
+
+The counter is kept by a trigger in Postgres, so drift only comes from writes made while the
+trigger was missing (SQLite, or a restored dump). Completion counts need no recount, they are
+summed from course_user_stats when read. Prints one JSON object per course whose counter was wrong.
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import func, select, update
+
+from src.database.database import dispose_engines, get_engine
+from src.models.models import Course, User
+
+
+async def reconcile(course_id: int, dry_run: bool) -> None:
+    async with get_engine().begin() as connection:
+        # Locking the course row first makes trigger updates from concurrent writes wait for
+        # the recount, so none of them is counted twice or lost
+        stored = (await connection.execute(
+            select(Course.enrolled_count).where(Course.id == course_id).with_for_update()
+        )).scalar_one_or_none()
+        if stored is None:
+            return
+        enrolled = (await connection.execute(
+            select(func.count()).select_from(User).where(User.course_id == course_id)
+        )).scalar()
+        if enrolled == stored:
+            return
+
+        if not dry_run:
+            await connection.execute(
+                update(Course).where(Course.id == course_id).values(enrolled_count=enrolled)
+            )
+    print(json.dumps({
+        "course_id": course_id,
+        "enrolled_count": [stored, enrolled],
+        "fixed": not dry_run,
+    }), flush=True)
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        if args.course_id is not None:
+            course_ids = [args.course_id]
+        else:
+            async with get_engine().connect() as connection:
+                course_ids = (await connection.execute(select(Course.id).order_by(Course.id))).scalars().all()
+        # One short transaction per course, so a recount never holds more than one course row
+        for course_id in course_ids:
+            await reconcile(course_id, args.dry_run)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--course-id", type=int, help="only recount this course")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without fixing it")
+    asyncio.run(main(parser.parse_args()))
@@ -1,7 +1,7 @@
 import os
-import boto3
 
 from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
 
 load_dotenv()
 
@@ -14,18 +14,107 @@ def get_env_or_raise(key: str) -> str:
     return value
 
 
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=get_env_or_raise('AWS_ACCESS_KEY'),
-    aws_secret_access_key=get_env_or_raise('AWS_ACCESS_SECRET_KEY'),
-    region_name=get_env_or_raise('AWS_DEFAULT_REGION')
-)
-BUCKET_NAME = get_env_or_raise('BUCKET_NAME')
-
-POSTGRES_HOST = get_env_or_raise("POSTGRES_HOST")
-POSTGRES_PORT = get_env_or_raise("POSTGRES_PORT")
-POSTGRES_USER = get_env_or_raise("POSTGRES_USER")
-POSTGRES_PASSWORD = get_env_or_raise("POSTGRES_PASSWORD")
-POSTGRES_DB = get_env_or_raise("POSTGRES_DB")
-MONGO_USER = get_env_or_raise("MONGO_USER")
-MONGO_PASSWORD = get_env_or_raise("MONGO_PASSWORD")
\ No newline at end of file
+# Credentials (POSTGRES_*, MONGO_*, AWS_*, BUCKET_NAME) are read with get_env_or_raise when the
+# client that needs them is first built, so importing the app does not require them.
+
+
+class PoolSettings(BaseSettings):
+    """Connection pool tuning for Postgres (DB_*) and Mongo (MONGO_*), read from the environment."""
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: int = 300000
+    mongo_wait_queue_timeout_ms: int = 10000
+    db_pool_warm_connections: int = 2
+
+
+pool_settings = PoolSettings()
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "500"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_ENTRIES = int(os.getenv("COMPRESSION_CACHE_ENTRIES", "256"))
+
+QUIZ_CACHE_TTL_SECONDS = float(os.getenv("QUIZ_CACHE_TTL_SECONDS", "30"))
+QUIZ_CACHE_MAX_ENTRIES = int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "512"))
+# The question search index follows quiz writes incrementally, this full rebuild is only a safety net
+QUIZ_SEARCH_REBUILD_SECONDS = float(os.getenv("QUIZ_SEARCH_REBUILD_SECONDS", "3600"))
+
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "3600"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "1024"))
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+CACHE_INVALIDATION_ENABLED = os.getenv("CACHE_INVALIDATION_ENABLED", "true").lower() == "true"
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache_invalidation")
+CACHE_INVALIDATION_HEALTHCHECK_SECONDS = float(os.getenv("CACHE_INVALIDATION_HEALTHCHECK_SECONDS", "5"))
+
+POSTGRES_REPLICA_HOST = os.getenv("POSTGRES_REPLICA_HOST")
+POSTGRES_REPLICA_PORT = os.getenv("POSTGRES_REPLICA_PORT", "5432")
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "1"))
+
+# "memory" keeps Idempotency-Key responses per worker, "postgres" shares them between workers
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+QUIZ_IMPORT_MAX_BYTES = int(os.getenv("QUIZ_IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+QUIZ_IMPORT_MAX_QUIZZES = int(os.getenv("QUIZ_IMPORT_MAX_QUIZZES", "200"))
+QUIZ_IMPORT_IMAGE_CONCURRENCY = int(os.getenv("QUIZ_IMPORT_IMAGE_CONCURRENCY", "8"))
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of records kept per event, e.g. "auth.login=0.01,auth.login_failed=0.1"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Requests handled at once per worker, 0 disables the cap
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "0"))
+CONCURRENCY_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_SECONDS", "1"))
+
+# "memory" runs background jobs in-process, "postgres" keeps them in the background_job table
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "memory")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+JOBS_RETRY_BASE_SECONDS = float(os.getenv("JOBS_RETRY_BASE_SECONDS", "1"))
+JOBS_RETRY_MAX_SECONDS = float(os.getenv("JOBS_RETRY_MAX_SECONDS", "300"))
+JOBS_QUEUE_SIZE = int(os.getenv("JOBS_QUEUE_SIZE", "10000"))
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "2"))
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "300"))
+JOBS_DRAIN_SECONDS = float(os.getenv("JOBS_DRAIN_SECONDS", "10"))
+
+# Rows deleted or updated per transaction when a course is torn down
+COURSE_DELETE_BATCH_SIZE = int(os.getenv("COURSE_DELETE_BATCH_SIZE", "1000"))
+
+# Where `python -m src.commands.grade_partitions archive` writes the grades of finished courses,
+# and how many days after Course.end_date a course counts as finished
+GRADE_ARCHIVE_DIR = os.getenv("GRADE_ARCHIVE_DIR", "archives/grades")
+GRADE_ARCHIVE_GRACE_DAYS = int(os.getenv("GRADE_ARCHIVE_GRACE_DAYS", "30"))
+
+# Embedded Telegram bot: updates arrive on POST /telegram/webhook, the bot token and
+# TELEGRAM_WEBHOOK_SECRET are read with get_env_or_raise when the bot starts
+TELEGRAM_WEBHOOK_ENABLED = os.getenv("TELEGRAM_WEBHOOK_ENABLED", "false").lower() == "true"
+# Public URL registered with setWebhook on startup, leave empty to register it by hand
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+TELEGRAM_WORKERS = int(os.getenv("TELEGRAM_WORKERS", "8"))
+TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", "1024"))
+TELEGRAM_DRAIN_SECONDS = float(os.getenv("TELEGRAM_DRAIN_SECONDS", "10"))
+
+# Quiz activation broadcasts: Telegram allows about 30 messages per second per bot, the rate
+# stays below that. Failed messages are retried TELEGRAM_BROADCAST_MAX_ATTEMPTS times, with
+# exponential backoff from TELEGRAM_BROADCAST_RETRY_SECONDS, before they are dead-lettered
+TELEGRAM_BROADCAST_RATE = float(os.getenv("TELEGRAM_BROADCAST_RATE", "25"))
+TELEGRAM_BROADCAST_CONCURRENCY = int(os.getenv("TELEGRAM_BROADCAST_CONCURRENCY", "10"))
+TELEGRAM_BROADCAST_CHUNK_SIZE = int(os.getenv("TELEGRAM_BROADCAST_CHUNK_SIZE", "500"))
+TELEGRAM_BROADCAST_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_BROADCAST_MAX_ATTEMPTS", "3"))
+TELEGRAM_BROADCAST_RETRY_SECONDS = float(os.getenv("TELEGRAM_BROADCAST_RETRY_SECONDS", "1"))
@@ -1,6 +1,10 @@
-from typing import BinaryIO
+from typing import BinaryIO, Optional, Union
+
+import boto3
 from botocore.exceptions import ClientError
 
+from src.config import get_env_or_raise
+
 
 class S3Handler:
     def __init__(self, s3_client, bucket_name: str):
@@ -32,6 +36,38 @@ class S3Handler:
             return False, str(e)
 
 
+    def download_file(self, file_key: str) -> tuple[bool, Union[bytes, str]]:
+        """
+        Download a file from S3 bucket
+        Returns: Tuple of (success, file content or error message)
+        """
+        try:
+            s3_object = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+            return True, s3_object["Body"].read()
+        except ClientError as e:
+            return False, str(e)
+
+
+    def delete_files(self, file_keys: list[str]) -> tuple[bool, str]:
+        """
+        Delete many files from S3 bucket, up to 1000 keys per request
+        Returns: Tuple of (success, message or the keys that could not be deleted)
+        """
+        failed = []
+        try:
+            for start in range(0, len(file_keys), 1000):
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in file_keys[start:start + 1000]], "Quiet": True}
+                )
+                failed.extend(error["Key"] for error in response.get("Errors", []))
+        except ClientError as e:
+            return False, str(e)
+        if failed:
+            return False, f"Could not delete: {', '.join(failed)}"
+        return True, f"{len(file_keys)} files deleted successfully"
+
+
     def update_s3_image(self, file: BinaryIO, file_key: str) -> tuple[bool, str]:
         """
         Update an existing file in S3 bucket by uploading a new one with the same key
@@ -43,3 +79,26 @@ class S3Handler:
             return True, url
         except ClientError as e:
             return False, str(e)
+
+
+_s3_handler: Optional[S3Handler] = None
+
+
+def get_s3_handler() -> S3Handler:
+    """Build the boto3 client on first use instead of at import time."""
+    global _s3_handler
+    if _s3_handler is None:
+        s3_client = boto3.client(
+            's3',
+            aws_access_key_id=get_env_or_raise('AWS_ACCESS_KEY'),
+            aws_secret_access_key=get_env_or_raise('AWS_ACCESS_SECRET_KEY'),
+            region_name=get_env_or_raise('AWS_DEFAULT_REGION')
+        )
+        _s3_handler = S3Handler(s3_client, bucket_name=get_env_or_raise('BUCKET_NAME'))
+    return _s3_handler
+
+
+def set_s3_handler(handler: Optional[S3Handler]) -> None:
+    """Install an already built handler, e.g. one backed by a local stand-in for benchmarks."""
+    global _s3_handler
+    _s3_handler = handler
@@ -1,19 +1,181 @@
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import asyncio
+import time
+from typing import AsyncGenerator, Optional
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from src.config import POSTGRES_DB, POSTGRES_HOST, POSTGRES_PASSWORD, POSTGRES_PORT, POSTGRES_USER
+from src.cache import TTLCache
+from src.database.pool_metrics import InstrumentedAsyncPool
+from src.config import (
+    POSTGRES_REPLICA_HOST, POSTGRES_REPLICA_PORT,
+    REPLICA_LAG_CHECK_SECONDS, REPLICA_MAX_LAG_SECONDS, REPLICA_STICKY_SECONDS,
+    get_env_or_raise,
+    pool_settings,
+)
 
-# DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:5432/{POSTGRES_DB}"
-print(DATABASE_URL)
+# Engines and session makers are built on first use (normally by the app lifespan),
+# so importing this module needs neither credentials nor a reachable database.
+_engine: Optional[AsyncEngine] = None
+_async_session_maker: Optional[sessionmaker] = None
+_replica_engine: Optional[AsyncEngine] = None
+_replica_session_maker: Optional[sessionmaker] = None
+_replica_health = None
+
+
+def database_url(host: str, port: str) -> str:
+    user = get_env_or_raise("POSTGRES_USER")
+    password = get_env_or_raise("POSTGRES_PASSWORD")
+    database = get_env_or_raise("POSTGRES_DB")
+    return f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{database}"
+
+
+def build_engine(url: str) -> AsyncEngine:
+    """Create an engine with the pool configured from `pool_settings`."""
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=pool_settings.db_pool_size,
+        max_overflow=pool_settings.db_max_overflow,
+        pool_timeout=pool_settings.db_pool_timeout,
+        pool_recycle=pool_settings.db_pool_recycle,
+        pool_pre_ping=pool_settings.db_pool_pre_ping,
+        connect_args={"prepared_statement_cache_size": pool_settings.db_statement_cache_size},
+    )
+
+
+def set_engine(engine: Optional[AsyncEngine]) -> None:
+    """Install an already built engine, e.g. a local stand-in for benchmarks."""
+    global _engine, _async_session_maker
+    _engine = engine
+    _async_session_maker = (
+        sessionmaker(engine, class_=AsyncSession, expire_on_commit=False) if engine is not None else None
+    )
+
+
+def get_engine() -> AsyncEngine:
+    if _engine is None:
+        set_engine(build_engine(database_url(get_env_or_raise("POSTGRES_HOST"), "5432")))
+    return _engine
+
+
+def get_session_maker() -> sessionmaker:
+    get_engine()
+    return _async_session_maker
+
+
+def get_replica_engine() -> Optional[AsyncEngine]:
+    """Optional read replica, only used by routes that depend on get_read_session."""
+    global _replica_engine, _replica_session_maker, _replica_health
+    if _replica_engine is None and POSTGRES_REPLICA_HOST:
+        _replica_engine = build_engine(database_url(POSTGRES_REPLICA_HOST, POSTGRES_REPLICA_PORT))
+        _replica_session_maker = sessionmaker(_replica_engine, class_=AsyncSession, expire_on_commit=False)
+        _replica_health = ReplicaHealth(_replica_engine, REPLICA_MAX_LAG_SECONDS, REPLICA_LAG_CHECK_SECONDS)
+    return _replica_engine
+
+
+async def warm_up_pool(engine: AsyncEngine, connections: int) -> None:
+    """Open `connections` pool connections at once so the first requests don't pay for the handshakes."""
+    if connections <= 0:
+        return
+    results = await asyncio.gather(*(engine.connect() for _ in range(connections)), return_exceptions=True)
+    opened = [result for result in results if not isinstance(result, BaseException)]
+    try:
+        # Checked only now, so the connections that did open are still returned to the pool
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        await asyncio.gather(*(connection.execute(text("SELECT 1")) for connection in opened))
+    finally:
+        for connection in opened:
+            await connection.close()
+
+
+async def dispose_engines() -> None:
+    global _replica_engine, _replica_session_maker, _replica_health
+    if _engine is not None:
+        await _engine.dispose()
+    if _replica_engine is not None:
+        await _replica_engine.dispose()
+    set_engine(None)
+    _replica_engine = _replica_session_maker = _replica_health = None
+
+
+# Clients that wrote recently, their reads stay on the primary until the entry expires
+recent_writers = TTLCache(max_entries=10000, ttl=REPLICA_STICKY_SECONDS)
+
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaHealth:
+    """Caches the replica's replay lag so it is measured at most once per `check_interval`."""
+
+    def __init__(self, replica: AsyncEngine, max_lag: float, check_interval: float):
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self.usable = True
+        self._checked_at = 0.0
+
+    async def is_usable(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self.usable
+        # Set before awaiting so concurrent requests don't all run the check
+        self._checked_at = now
+        try:
+            async with self.replica.connect() as connection:
+                self.lag = float((await connection.execute(REPLICA_LAG_QUERY)).scalar())
+            self.usable = self.lag <= self.max_lag
+        except Exception:
+            self.lag = None
+            self.usable = False
+        return self.usable
+
+
+def client_key(request: Request) -> str:
+    """Identify a client for read-your-writes: its auth cookie when logged in, otherwise its address."""
+    token = request.cookies.get("auth_token")
+    if token:
+        return f"token:{token}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def mark_recent_write(request: Request) -> None:
+    recent_writers.set(client_key(request), True)
 
-engine = create_async_engine(DATABASE_URL)
-async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """Get an async session."""
-    async with async_session_maker() as session:
+    async with get_session_maker()() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Get an async session for read-only routes. Uses the replica when one is configured,
+    unless the client wrote recently or the replica lags behind more than allowed.
+    """
+    session_maker = get_session_maker()
+    if (
+            get_replica_engine() is not None
+            and recent_writers.get(client_key(request)) is None
+            and await _replica_health.is_usable()
+    ):
+        session_maker = _replica_session_maker
+
+    async with session_maker() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+
+from pymongo import monitoring
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class WaitStats:
+    """Thread-safe counters for how long callers waited to acquire a connection."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.acquired = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        with self._lock:
+            self.acquired += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._recent.append(wait)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            acquired, timeouts = self.acquired, self.timeouts
+            total_wait, max_wait = self.total_wait, self.max_wait
+
+        def percentile(fraction: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] * 1000
+
+        return {
+            "acquired": acquired,
+            "timeouts": timeouts,
+            "mean_wait_ms": total_wait / acquired * 1000 if acquired else 0.0,
+            "p50_wait_ms": percentile(0.50),
+            "p95_wait_ms": percentile(0.95),
+            "max_wait_ms": max_wait * 1000,
+        }
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = WaitStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.wait_stats.record_timeout()
+            raise
+        self.wait_stats.record(time.perf_counter() - started)
+        return connection
+
+    def metrics(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            **self.wait_stats.snapshot(),
+        }
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks Motor/PyMongo pool occupancy and checkout waits. Checkouts run synchronously
+    on driver threads, so the start time is kept per thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.wait_stats = WaitStats()
+        self.open_connections = 0
+        self.checked_out = 0
+
+    def metrics(self) -> dict:
+        with self._lock:
+            occupancy = {"open_connections": self.open_connections, "checked_out": self.checked_out}
+        return {**occupancy, **self.wait_stats.snapshot()}
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            self.wait_stats.record(time.perf_counter() - started)
+            self._local.started = None
+        with self._lock:
+            self.checked_out += 1
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self.wait_stats.record_timeout()
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
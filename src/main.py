@@ -1,15 +1,81 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.config import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_CACHE_ENTRIES,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MINIMUM_SIZE,
+    CONCURRENCY_QUEUE_TIMEOUT_SECONDS,
+    MAX_CONCURRENT_REQUESTS,
+    POSTGRES_REPLICA_HOST,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_MAX_KEYS,
+    TELEGRAM_WEBHOOK_ENABLED,
+    pool_settings,
+)
+from src.database.database import dispose_engines, get_engine, warm_up_pool
+from src.database.mongo import close_mongo_client, ping_mongo
+from src.logging_config import configure_logging
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.rate_limit import RateLimitMiddleware
+from src.middleware.read_your_writes import ReadYourWritesMiddleware
+from src.middleware.request_id import RequestIdMiddleware
+from src.bot.webhook import start_telegram_bot, stop_telegram_bot
+from src.services.invalidation import start_invalidation_bus, stop_invalidation_bus
+from src.services.jobs import job_queue
+
 from src.routes.grade_routes import router as grade_routes
 from src.routes.course_routes import router as course_routes
 from src.routes.quiz_routes import router as quiz_routes
 from src.routes.user_routes import router as user_routes
 from src.routes.s3_routes import router as s3_routes
+from src.routes.progress_routes import router as progress_routes
+from src.routes.analytics_routes import router as analytics_routes
+from src.routes.events_routes import router as events_routes
+from src.routes.metrics_routes import router as metrics_routes
+from src.routes.telegram_routes import router as telegram_routes
 from src.auth.router import router as auth_router
 
 
-app = FastAPI()
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are built here rather than at import time, so a worker that can't reach a
+    # backend still starts and reports it instead of crashing while importing the routes
+    started = time.perf_counter()
+    engine = get_engine()
+    try:
+        await warm_up_pool(engine, pool_settings.db_pool_warm_connections)
+    except Exception:
+        logger.warning("Could not warm up the Postgres pool", exc_info=True)
+    try:
+        await ping_mongo()
+    except Exception:
+        logger.warning("MongoDB did not answer the startup ping", exc_info=True)
+    await start_invalidation_bus(engine)
+    await job_queue.start()
+    if TELEGRAM_WEBHOOK_ENABLED:
+        await start_telegram_bot()
+    app.state.startup_seconds = time.perf_counter() - started
+    logger.info("Startup finished in %.3fs", app.state.startup_seconds)
+    yield
+    # Drain the bot updates and background jobs first, they may still need the database and the clients
+    await stop_telegram_bot()
+    await job_queue.stop()
+    await stop_invalidation_bus()
+    await dispose_engines()
+    close_mongo_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
@@ -18,7 +84,30 @@ origins = [
     "http://127.0.0.1:8080",
 ]
 
-# Configure CORS
+# Quiz documents are text-heavy JSON, compress them on the way out
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MINIMUM_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
+    cache_entries=COMPRESSION_CACHE_ENTRIES,
+)
+
+# Only needed when reads can be served by a replica
+if POSTGRES_REPLICA_HOST:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Reject floods before they reach the routes and take a database connection
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        max_keys=RATE_LIMIT_MAX_KEYS,
+        max_concurrent=MAX_CONCURRENT_REQUESTS,
+        queue_timeout=CONCURRENCY_QUEUE_TIMEOUT_SECONDS,
+    )
+
+# Configure CORS. Added after the rate limiter so it wraps it: a 429 or 503 without CORS
+# headers would reach browser code as an opaque network error instead
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -27,9 +116,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so everything logged while handling a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(auth_router)
 app.include_router(grade_routes)
 app.include_router(course_routes)
 app.include_router(quiz_routes)
 app.include_router(user_routes)
 app.include_router(s3_routes)
+app.include_router(progress_routes)
+app.include_router(analytics_routes)
+app.include_router(events_routes)
+app.include_router(metrics_routes)
+app.include_router(telegram_routes)
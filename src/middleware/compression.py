@@ -0,0 +1,191 @@
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/plain",
+    "text/html",
+    "text/css",
+    "application/javascript",
+)
+
+
+class CompressedBodyCache:
+    """
+    Small LRU of already compressed bodies keyed by (encoding, body digest).
+    Quiz documents are served many times with identical bytes, so hashing the body
+    is much cheaper than compressing it again on every hit.
+    """
+
+    def __init__(self, max_entries: int = 256, max_body_size: int = 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_body_size = max_body_size
+        self._entries: "OrderedDict[tuple[str, bytes], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, encoding: str, digest: bytes) -> Optional[bytes]:
+        key = (encoding, digest)
+        compressed = self._entries.get(key)
+        if compressed is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return compressed
+
+    def set(self, encoding: str, digest: bytes, compressed: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[(encoding, digest)] = compressed
+        self._entries.move_to_end((encoding, digest))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class CompressionMiddleware:
+    """
+    Gzip/brotli response compression for complete (non-streaming) responses.
+    Only bodies above `minimum_size` whose content type is in the allow-list get compressed.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            minimum_size: int = 500,
+            compressible_types: Iterable[str] = DEFAULT_COMPRESSIBLE_TYPES,
+            gzip_level: int = 6,
+            brotli_quality: int = 5,
+            cache_entries: int = 256,
+            threadpool_threshold: int = 256 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressible_types = frozenset(compressible_types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = CompressedBodyCache(max_entries=cache_entries)
+        self.threadpool_threshold = threadpool_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def is_compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        return content_type in self.compressible_types
+
+    async def compress(self, body: bytes, encoding: str) -> bytes:
+        cacheable = len(body) <= self.cache.max_body_size
+        if cacheable:
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            compressed = self.cache.get(encoding, digest)
+            if compressed is not None:
+                return compressed
+
+        if len(body) >= self.threadpool_threshold:
+            compressed = await run_in_threadpool(self._compress, body, encoding)
+        else:
+            compressed = self._compress(body, encoding)
+
+        if cacheable:
+            self.cache.set(encoding, digest, compressed)
+        return compressed
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.initial_message: Message = {}
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the headers back until we know whether the body gets compressed.
+            self.initial_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        self.passthrough = True
+        body = message.get("body", b"")
+        headers = Headers(raw=self.initial_message["headers"])
+
+        # Streaming responses (SSE, file downloads) are forwarded untouched.
+        if (
+                message.get("more_body", False)
+                or len(body) < self.middleware.minimum_size
+                or not self.middleware.is_compressible(headers)
+        ):
+            await self._send(self.initial_message)
+            await self._send(message)
+            return
+
+        compressed = await self.middleware.compress(body, self.encoding)
+        mutable_headers = MutableHeaders(raw=self.initial_message["headers"])
+        mutable_headers["Content-Encoding"] = self.encoding
+        mutable_headers["Content-Length"] = str(len(compressed))
+        mutable_headers.add_vary_header("Accept-Encoding")
+
+        await self._send(self.initial_message)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick brotli when the client accepts it and the library is installed, otherwise gzip."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
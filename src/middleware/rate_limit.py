@@ -0,0 +1,200 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Optional
+
+import jwt
+from fastapi_users.jwt import decode_jwt
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.auth.config import get_jwt_strategy
+
+
+class RateLimitPolicy(NamedTuple):
+    """
+    Token bucket for one group of routes: `burst` requests at once, refilled at `rate` per second.
+    `key` picks whose bucket a request drains: "user" or "ip". "user" falls back to the client
+    address when the request carries no valid access token, with a bucket of `ip_burst` refilled
+    at `ip_rate` when those are set, since one address may then stand for many users.
+    """
+    name: str
+    methods: frozenset
+    path: str
+    rate: float
+    burst: int
+    key: str = "ip"
+    prefix: bool = False
+    ip_rate: Optional[float] = None
+    ip_burst: Optional[int] = None
+
+    def limits(self, identity: str) -> tuple[float, int]:
+        """Refill rate and size of the identity's bucket."""
+        if self.key == "user" and identity.startswith("ip:") and self.ip_burst is not None:
+            return self.ip_rate, self.ip_burst
+        return self.rate, self.burst
+
+    def matches(self, method: str, path: str) -> bool:
+        if method not in self.methods:
+            return False
+        if self.prefix:
+            return path.startswith(self.path)
+        return path.rstrip("/") == self.path.rstrip("/")
+
+
+# A whole class may log in from one school network, so the login limit per address is generous.
+# Grades are submitted without logging in, so most land in the per-address bucket, sized for a
+# class handing in at the deadline; a signed-in student still gets a bucket of their own.
+DEFAULT_POLICIES = (
+    RateLimitPolicy("login", frozenset({"POST"}), "/login", rate=2, burst=30, key="ip"),
+    RateLimitPolicy("register", frozenset({"POST"}), "/auth/register", rate=0.2, burst=5, key="ip"),
+    RateLimitPolicy("grade_submit", frozenset({"POST"}), "/grades/", rate=1, burst=10, key="user",
+                    ip_rate=5, ip_burst=60),
+    RateLimitPolicy("image_upload", frozenset({"POST", "PUT"}), "/s3/", rate=2, burst=10, key="user", prefix=True),
+)
+
+# Long-lived streams would hold a concurrency slot for their whole lifetime
+DEFAULT_EXEMPT_PREFIXES = ("/events", "/metrics")
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by (policy, identity). Each bucket is two floats, and at most `max_keys`
+    are kept: the least recently used ones are evicted, which only forgets buckets that have been
+    idle the longest and are therefore (nearly) full anyway.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[tuple, list]" = OrderedDict()
+        self.rejected = 0
+
+    def acquire(self, policy: RateLimitPolicy, identity: str) -> float:
+        """Take one token. Returns 0 when allowed, otherwise how many seconds until a token is available."""
+        now = time.monotonic()
+        rate, burst = policy.limits(identity)
+        key = (policy.name, identity)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(burst), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        self.rejected += 1
+        return (1 - bucket[0]) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def request_identity(scope: Scope, key: str) -> str:
+    # Only identities the client can't make up: anything it sends unverified, like a header or
+    # a random token, would give it a fresh bucket per request and push real users' buckets out
+    if key == "user":
+        user_id = _verified_user_id(_auth_token(Headers(scope=scope)))
+        if user_id is not None:
+            return f"user:{user_id}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def _verified_user_id(token: Optional[str]) -> Optional[str]:
+    """User id of a validly signed, unexpired access token. Checks the signature only, no database query."""
+    if not token:
+        return None
+    strategy = get_jwt_strategy()
+    try:
+        data = decode_jwt(token, strategy.decode_key, strategy.token_audience, algorithms=[strategy.algorithm])
+    except jwt.PyJWTError:
+        return None
+    return data.get("sub")
+
+
+def _auth_token(headers: Headers) -> Optional[str]:
+    authorization = headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    for cookie in headers.get("cookie", "").split(";"):
+        name, _, value = cookie.strip().partition("=")
+        if name == "auth_token" and value:
+            return value
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    Admission control in front of the routes:
+    per-identity token buckets answer 429 with Retry-After, and a global cap on requests in
+    flight answers 503 once a request has waited `queue_timeout` seconds for a free slot.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            policies: Iterable[RateLimitPolicy] = DEFAULT_POLICIES,
+            max_keys: int = 100000,
+            max_concurrent: int = 0,
+            queue_timeout: float = 1.0,
+            exempt_prefixes: Iterable[str] = DEFAULT_EXEMPT_PREFIXES,
+    ):
+        self.app = app
+        self.policies = tuple(policies)
+        self.limiter = TokenBucketLimiter(max_keys=max_keys)
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.exempt_prefixes = tuple(exempt_prefixes)
+        self._slots = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+        self.shed = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        for policy in self.policies:
+            if policy.matches(method, path):
+                retry_after = self.limiter.acquire(policy, request_identity(scope, policy.key))
+                if retry_after:
+                    await _reject(send, 429, "Too many requests, slow down", retry_after)
+                    return
+                break
+
+        if self._slots is None or path.startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            await _reject(send, 503, "Server is busy, try again shortly", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._slots.release()
+
+
+async def _reject(send: Send, status_code: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
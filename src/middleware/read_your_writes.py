@@ -0,0 +1,21 @@
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.database.database import mark_recent_write
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ReadYourWritesMiddleware:
+    """
+    Remembers clients that sent a write so get_read_session keeps their reads on the
+    primary for a short while, until the replica has caught up with their change.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["method"] not in SAFE_METHODS:
+            mark_recent_write(Request(scope))
+        await self.app(scope, receive, send)
@@ -14,20 +14,17 @@ from sqlalchemy import pool
 
 from alembic import context
 
-from src.config import POSTGRES_DB, POSTGRES_HOST, POSTGRES_PASSWORD, POSTGRES_PORT, POSTGRES_USER
+from src.config import get_env_or_raise
 # Import your models explicitly
-from src.models.models import Base, Course, User, Grade
+from src.models.models import Base, Course, User, Grade, CourseUserStats
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
 section = config.config_ini_section
-config.set_section_option(section, "POSTGRES_HOST", POSTGRES_HOST)
-config.set_section_option(section, "POSTGRES_PORT", POSTGRES_PORT)
-config.set_section_option(section, "POSTGRES_USER", POSTGRES_USER)
-config.set_section_option(section, "POSTGRES_PASSWORD", POSTGRES_PASSWORD)
-config.set_section_option(section, "POSTGRES_DB", POSTGRES_DB)
+for key in ("POSTGRES_HOST", "POSTGRES_PORT", "POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB"):
+    config.set_section_option(section, key, get_env_or_raise(key))
 
 # Interpret the config file for Python logging.
 fileConfig(config.config_file_name)
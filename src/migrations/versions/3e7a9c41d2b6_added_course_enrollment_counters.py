@@ -0,0 +1,99 @@
+"""Added course enrollment counters
+
+Revision ID: 3e7a9c41d2b6
+Revises: 5b8f0c2d7e41
+Create Date: 2026-10-19 19:12:48.603571
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e7a9c41d2b6'
+down_revision = '5b8f0c2d7e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('course', sa.Column('enrolled_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('course', sa.Column('completion_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Users are written by fastapi-users, the user routes and bulk statements alike,
+    # so the counters are kept in the writing transaction by triggers rather than by each path
+    op.execute("""
+        CREATE FUNCTION course_enrolled_count() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                IF OLD.course_id IS NOT NULL THEN
+                    UPDATE course SET enrolled_count = enrolled_count - 1 WHERE id = OLD.course_id;
+                END IF;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                IF NEW.course_id IS NOT NULL THEN
+                    UPDATE course SET enrolled_count = enrolled_count + 1 WHERE id = NEW.course_id;
+                END IF;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER user_enrolled_count AFTER INSERT OR DELETE ON "user"
+        FOR EACH ROW EXECUTE FUNCTION course_enrolled_count()
+    """)
+    op.execute("""
+        CREATE TRIGGER user_enrolled_count_moved AFTER UPDATE OF course_id ON "user"
+        FOR EACH ROW WHEN (OLD.course_id IS DISTINCT FROM NEW.course_id)
+        EXECUTE FUNCTION course_enrolled_count()
+    """)
+
+    # Counts the same grades as course_user_stats: those that belong to a student
+    op.execute("""
+        CREATE FUNCTION course_completion_count() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                IF OLD.user_id IS NOT NULL THEN
+                    UPDATE course SET completion_count = completion_count - 1 WHERE id = OLD.course_id;
+                END IF;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                IF NEW.user_id IS NOT NULL THEN
+                    UPDATE course SET completion_count = completion_count + 1 WHERE id = NEW.course_id;
+                END IF;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Created on the partitioned parent, so every partition, present or future, gets them.
+    # A grade moved to another course is a DELETE and an INSERT between partitions.
+    op.execute("""
+        CREATE TRIGGER grade_completion_count AFTER INSERT OR DELETE ON grade
+        FOR EACH ROW EXECUTE FUNCTION course_completion_count()
+    """)
+    op.execute("""
+        CREATE TRIGGER grade_completion_count_changed AFTER UPDATE OF user_id ON grade
+        FOR EACH ROW WHEN ((OLD.user_id IS NULL) <> (NEW.user_id IS NULL))
+        EXECUTE FUNCTION course_completion_count()
+    """)
+
+    op.execute("""
+        UPDATE course SET
+            enrolled_count = (SELECT count(*) FROM "user" WHERE "user".course_id = course.id),
+            completion_count = COALESCE(
+                (SELECT sum(quizzes_completed) FROM course_user_stats WHERE course_user_stats.course_id = course.id), 0
+            )
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER grade_completion_count_changed ON grade")
+    op.execute("DROP TRIGGER grade_completion_count ON grade")
+    op.execute("DROP FUNCTION course_completion_count()")
+    op.execute('DROP TRIGGER user_enrolled_count_moved ON "user"')
+    op.execute('DROP TRIGGER user_enrolled_count ON "user"')
+    op.execute("DROP FUNCTION course_enrolled_count()")
+    op.drop_column('course', 'completion_count')
+    op.drop_column('course', 'enrolled_count')
@@ -0,0 +1,37 @@
+"""Added background_job
+
+Revision ID: 472037543f24
+Revises: c6220bece02e
+Create Date: 2026-10-19 16:05:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '472037543f24'
+down_revision = 'c6220bece02e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('background_job',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_background_job_status_run_at', 'background_job', ['status', 'run_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_background_job_status_run_at', table_name='background_job')
+    op.drop_table('background_job')
@@ -0,0 +1,53 @@
+"""Added quiz_broadcast
+
+Revision ID: 8a4d6e2f1c93
+Revises: 3e7a9c41d2b6
+Create Date: 2026-10-19 20:24:11.305417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4d6e2f1c93'
+down_revision = '3e7a9c41d2b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('quiz_broadcast',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_number', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('sent', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('last_user_id', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_quiz_broadcast_course_quiz', 'quiz_broadcast', ['course_id', 'quiz_number'], unique=False)
+    op.create_table('quiz_broadcast_failure',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('broadcast_id', sa.Integer(), nullable=False),
+    sa.Column('telegram_id', sa.BigInteger(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['broadcast_id'], ['quiz_broadcast.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_quiz_broadcast_failure_broadcast_id'), 'quiz_broadcast_failure', ['broadcast_id'], unique=False)
+    op.create_index('ix_user_course_id_id', 'user', ['course_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_course_id_id', table_name='user')
+    op.drop_index(op.f('ix_quiz_broadcast_failure_broadcast_id'), table_name='quiz_broadcast_failure')
+    op.drop_table('quiz_broadcast_failure')
+    op.drop_index('ix_quiz_broadcast_course_quiz', table_name='quiz_broadcast')
+    op.drop_table('quiz_broadcast')
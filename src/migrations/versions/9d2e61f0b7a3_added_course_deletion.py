@@ -0,0 +1,37 @@
+"""Added course_deletion
+
+Revision ID: 9d2e61f0b7a3
+Revises: 472037543f24
+Create Date: 2026-10-19 17:42:37.918204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2e61f0b7a3'
+down_revision = '472037543f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('course_deletion',
+    sa.Column('course_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('user_mode', sa.String(length=10), nullable=False),
+    sa.Column('grades_deleted', sa.Integer(), nullable=False),
+    sa.Column('users_detached', sa.Integer(), nullable=False),
+    sa.Column('users_deleted', sa.Integer(), nullable=False),
+    sa.Column('quizzes_deleted', sa.Integer(), nullable=False),
+    sa.Column('images_deleted', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+
+
+def downgrade():
+    op.drop_table('course_deletion')
@@ -0,0 +1,60 @@
+"""Derived course completion count
+
+Revision ID: e5c1a7d9b024
+Revises: 8a4d6e2f1c93
+Create Date: 2026-10-19 21:05:37.418206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c1a7d9b024'
+down_revision = '8a4d6e2f1c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Every grade write updated the course row, serialising a course's submissions on its lock.
+    # The count is summed from course_user_stats on read instead (src.services.leaderboard).
+    op.execute("DROP TRIGGER grade_completion_count_changed ON grade")
+    op.execute("DROP TRIGGER grade_completion_count ON grade")
+    op.execute("DROP FUNCTION course_completion_count()")
+    op.drop_column('course', 'completion_count')
+
+
+def downgrade():
+    op.add_column('course', sa.Column('completion_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        CREATE FUNCTION course_completion_count() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                IF OLD.user_id IS NOT NULL THEN
+                    UPDATE course SET completion_count = completion_count - 1 WHERE id = OLD.course_id;
+                END IF;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                IF NEW.user_id IS NOT NULL THEN
+                    UPDATE course SET completion_count = completion_count + 1 WHERE id = NEW.course_id;
+                END IF;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER grade_completion_count AFTER INSERT OR DELETE ON grade
+        FOR EACH ROW EXECUTE FUNCTION course_completion_count()
+    """)
+    op.execute("""
+        CREATE TRIGGER grade_completion_count_changed AFTER UPDATE OF user_id ON grade
+        FOR EACH ROW WHEN ((OLD.user_id IS NULL) <> (NEW.user_id IS NULL))
+        EXECUTE FUNCTION course_completion_count()
+    """)
+    op.execute("""
+        UPDATE course SET completion_count = COALESCE(
+            (SELECT sum(quizzes_completed) FROM course_user_stats WHERE course_user_stats.course_id = course.id), 0
+        )
+    """)
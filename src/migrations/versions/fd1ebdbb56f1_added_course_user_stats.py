@@ -0,0 +1,44 @@
+"""Added course_user_stats
+
+Revision ID: fd1ebdbb56f1
+Revises: 0061b7bfed5e
+Create Date: 2026-10-19 11:02:17.530961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fd1ebdbb56f1'
+down_revision = '0061b7bfed5e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('course_user_stats',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_score', sa.Float(), nullable=False),
+    sa.Column('quizzes_completed', sa.Integer(), nullable=False),
+    sa.Column('total_time_completion', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('course_id', 'user_id')
+    )
+    op.create_index('ix_course_user_stats_course_score', 'course_user_stats', ['course_id', 'total_score'], unique=False)
+
+    # Backfill from the existing grades, afterwards the grade routes keep it up to date
+    op.execute("""
+        INSERT INTO course_user_stats (course_id, user_id, total_score, quizzes_completed, total_time_completion)
+        SELECT course_id, user_id, SUM(grade), COUNT(*), SUM(time_completion)
+        FROM grade
+        WHERE course_id IS NOT NULL AND user_id IS NOT NULL
+        GROUP BY course_id, user_id
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_course_user_stats_course_score', table_name='course_user_stats')
+    op.drop_table('course_user_stats')
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Date, BigInteger
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Date, BigInteger, Index, Text
 from sqlalchemy.orm import relationship, declarative_base
 from fastapi_users.db import SQLAlchemyBaseUserTable
 
@@ -11,7 +11,7 @@ class User(SQLAlchemyBaseUserTable[int], Base):
     __tablename__ = 'user'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    telegram_id = Column(BigInteger, nullable=False)
+    telegram_id = Column(BigInteger, nullable=False, index=True)
     name = Column(String, nullable=False)
     surname = Column(String, nullable=False)
     username = Column(String, nullable=False, unique=True)
@@ -21,6 +21,11 @@ class User(SQLAlchemyBaseUserTable[int], Base):
     course = relationship("Course", back_populates="users")
     grades = relationship("Grade", back_populates="user")
 
+    __table_args__ = (
+        # Walks a course's students in id order, e.g. for quiz broadcasts
+        Index('ix_user_course_id_id', 'course_id', 'id'),
+    )
+
 
 class Course(Base):
     __tablename__ = 'course'
@@ -30,16 +35,23 @@ class Course(Base):
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=False)
     people_count = Column(Integer, nullable=False)
+    # Maintained by a Postgres trigger (migration 3e7a9c41d2b6), corrected by src.commands.reconcile_enrollment.
+    # Completions are summed from course_user_stats instead, see src.services.leaderboard.get_completion_counts
+    enrolled_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     users = relationship("User", back_populates="course")
     grades = relationship("Grade", back_populates="course")
 
 
 class Grade(Base):
+    """
+    In Postgres the table is LIST-partitioned by course_id with a (id, course_id) primary key,
+    see migration 5b8f0c2d7e41 and src.commands.grade_partitions. `id` stays unique through its sequence.
+    """
     __tablename__ = 'grade'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    course_id = Column(Integer, ForeignKey('course.id'))
+    course_id = Column(Integer, ForeignKey('course.id'), nullable=False)
     user_id = Column(Integer, ForeignKey('user.id'))
     grade = Column(Float, nullable=False)
     quiz_number = Column(Integer, nullable=False)
@@ -48,3 +60,101 @@ class Grade(Base):
 
     course = relationship("Course", back_populates="grades")
     user = relationship("User", back_populates="grades")
+
+    __table_args__ = (
+        Index('ix_grade_course_user_quiz', 'course_id', 'user_id', 'quiz_number'),
+    )
+
+
+class CourseUserStats(Base):
+    """Per-(course, user) grade aggregates, maintained incrementally by the grade routes."""
+    __tablename__ = 'course_user_stats'
+
+    course_id = Column(Integer, ForeignKey('course.id'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('user.id'), primary_key=True)
+    total_score = Column(Float, nullable=False, default=0)
+    quizzes_completed = Column(Integer, nullable=False, default=0)
+    total_time_completion = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('ix_course_user_stats_course_score', 'course_id', 'total_score'),
+    )
+
+
+class IdempotencyKey(Base):
+    """Responses of requests sent with an Idempotency-Key, shared by all workers."""
+    __tablename__ = 'idempotency_key'
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    response = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class BackgroundJob(Base):
+    """Durable background job, claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED."""
+    __tablename__ = 'background_job'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # 'pending', 'running' or 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_background_job_status_run_at', 'status', 'run_at'),
+    )
+
+
+class CourseDeletion(Base):
+    """Progress of a course teardown, kept after the course row itself is gone."""
+    __tablename__ = 'course_deletion'
+
+    course_id = Column(Integer, primary_key=True)  # no foreign key, it outlives the course
+    status = Column(String(20), nullable=False, default="pending")  # 'pending', 'running', 'completed' or 'failed'
+    user_mode = Column(String(10), nullable=False, default="detach")  # 'detach' or 'delete'
+    grades_deleted = Column(Integer, nullable=False, default=0)
+    users_detached = Column(Integer, nullable=False, default=0)
+    users_deleted = Column(Integer, nullable=False, default=0)
+    quizzes_deleted = Column(Integer, nullable=False, default=0)
+    images_deleted = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class QuizBroadcast(Base):
+    """Telegram notification of a course's students that a quiz was activated, sent by src.services.broadcast."""
+    __tablename__ = 'quiz_broadcast'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    course_id = Column(Integer, nullable=False)  # no foreign key, like course_deletion
+    quiz_number = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # 'pending', 'running', 'completed' or 'failed'
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    last_user_id = Column(Integer, nullable=False, default=0)  # students up to this id are done
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_quiz_broadcast_course_quiz', 'course_id', 'quiz_number'),
+    )
+
+
+class QuizBroadcastFailure(Base):
+    """Dead letter: a broadcast message that could not be delivered, with the last error."""
+    __tablename__ = 'quiz_broadcast_failure'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    broadcast_id = Column(Integer, ForeignKey('quiz_broadcast.id', ondelete='CASCADE'), nullable=False, index=True)
+    telegram_id = Column(BigInteger, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    error = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.database import get_async_session
+from src.schemas.analytics_schemas import QuizAnalytics
+from src.services.analytics import get_quiz_analytics
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/course/{course_id}/quiz/{quiz_number}", response_model=QuizAnalytics)
+async def get_quiz_statistics(course_id: int, quiz_number: int, db: AsyncSession = Depends(get_async_session)):
+    return await get_quiz_analytics(db, course_id, quiz_number)
@@ -1,14 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update
-from typing import List
+import logging
+from datetime import datetime
 
-from src.database.database import get_async_session
-from src.models.models import Course
-from src.schemas.course_schemas import CourseCreate, Course as CourseSchema
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from typing import List, Literal
+
+from src.database.database import get_async_session, get_read_session
+from src.models.models import Course, CourseDeletion
+from src.schemas.course_schemas import (
+    CourseCreate,
+    CourseDeletionStatus,
+    CourseRoster,
+    LeaderboardEntry,
+    RosterStudent,
+    Course as CourseSchema,
+)
+from src.services import course_teardown  # noqa: F401, registers the course.delete job
+from src.services.grade_partitions import create_partition, grade_is_partitioned
+from src.services.jobs import is_stalled, job_queue
+from src.services.leaderboard import get_completion_counts, get_leaderboard
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
+logger = logging.getLogger(__name__)
+
+
+async def _with_completion_counts(db: AsyncSession, courses: List[Course]) -> List[CourseSchema]:
+    completion_counts = await get_completion_counts(db, [course.id for course in courses])
+    return [
+        CourseSchema.model_validate(course).model_copy(update={"completion_count": completion_counts[course.id]})
+        for course in courses
+    ]
+
+
 @router.post("/", response_model=CourseSchema)
 async def create_course(course: CourseCreate, db: AsyncSession = Depends(get_async_session)):
     query = select(Course).where(Course.name == course.name)
@@ -28,15 +55,25 @@ async def create_course(course: CourseCreate, db: AsyncSession = Depends(get_asy
     db.add(db_course)
     await db.commit()
     await db.refresh(db_course)
+
+    connection = await db.connection()
+    if await grade_is_partitioned(connection):
+        try:
+            await create_partition(connection, db_course.id)
+            await db.commit()
+        except Exception:
+            # Its grades land in the default partition until `grade_partitions ensure` runs
+            await db.rollback()
+            logger.exception("Could not create the grade partition of course %d", db_course.id)
     return db_course
 
 
 @router.get("/", response_model=List[CourseSchema])
-async def get_courses(db: AsyncSession = Depends(get_async_session), skip: int = 0, limit: int = 100):
+async def get_courses(db: AsyncSession = Depends(get_read_session), skip: int = 0, limit: int = 100):
     query = select(Course).offset(skip).limit(limit)
     result = await db.execute(query)
     courses = result.scalars().all()
-    return courses
+    return await _with_completion_counts(db, courses)
 
 
 @router.get("/{id}", response_model=CourseSchema)
@@ -47,7 +84,71 @@ async def get_course(course_id: int, db: AsyncSession = Depends(get_async_sessio
 
     if db_course is None:
         raise HTTPException(status_code=404, detail="Course not found")
-    return db_course
+    return (await _with_completion_counts(db, [db_course]))[0]
+
+
+@router.get("/{course_id}/leaderboard", response_model=List[LeaderboardEntry])
+async def get_course_leaderboard(
+        course_id: int,
+        limit: int = Query(10, ge=1, le=100),
+        db: AsyncSession = Depends(get_async_session)
+):
+    rows = await get_leaderboard(db, course_id, limit)
+    return [
+        LeaderboardEntry(
+            rank=rank,
+            user_id=stats.user_id,
+            username=username,
+            name=name,
+            surname=surname,
+            total_score=stats.total_score,
+            quizzes_completed=stats.quizzes_completed,
+            mean_time_completion=stats.total_time_completion / stats.quizzes_completed,
+        )
+        for rank, (stats, username, name, surname) in enumerate(rows, start=1)
+    ]
+
+
+@router.get("/{course_id}/roster", response_model=CourseRoster)
+async def get_course_roster(course_id: int, db: AsyncSession = Depends(get_read_session)):
+    """
+    Students of the course with their grade for every quiz. Three queries whatever the course size:
+    the course, then its users and its grades, each loaded with one SELECT ... IN.
+    """
+    query = (
+        select(Course)
+        .where(Course.id == course_id)
+        .options(selectinload(Course.users), selectinload(Course.grades))
+    )
+    result = await db.execute(query)
+    db_course = result.scalar_one_or_none()
+
+    if db_course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    scores: dict[int, dict[int, float]] = {}
+    for grade in db_course.grades:
+        user_scores = scores.setdefault(grade.user_id, {})
+        user_scores[grade.quiz_number] = max(grade.grade, user_scores.get(grade.quiz_number, grade.grade))
+
+    students = [
+        RosterStudent(
+            user_id=user.id,
+            username=user.username,
+            name=user.name,
+            surname=user.surname,
+            scores=dict(sorted(scores.get(user.id, {}).items())),
+            total_score=sum(scores.get(user.id, {}).values()),
+            quizzes_completed=len(scores.get(user.id, {})),
+        )
+        for user in sorted(db_course.users, key=lambda user: (user.surname, user.name, user.id))
+    ]
+    return CourseRoster(
+        course_id=db_course.id,
+        name=db_course.name,
+        quiz_numbers=sorted({grade.quiz_number for grade in db_course.grades}),
+        students=students,
+    )
 
 
 @router.put("/{id}", response_model=CourseSchema)
@@ -69,20 +170,51 @@ async def update_course(course_id: int, course: CourseCreate, db: AsyncSession =
 
     result = await db.execute(query)
     updated_course = result.scalar_one()
-    return updated_course
-
-
-@router.delete("/{id}")
-async def delete_course(course_id: int, db: AsyncSession = Depends(get_async_session)):
-    query = select(Course).where(Course.id == course_id)
-    result = await db.execute(query)
-    db_course = result.scalar_one_or_none()
-
-    if db_course is None:
+    return (await _with_completion_counts(db, [updated_course]))[0]
+
+
+@router.delete("/{course_id}", response_model=CourseDeletionStatus, status_code=202)
+async def delete_course(
+        course_id: int,
+        users: Literal["detach", "delete"] = Query("detach"),
+        db: AsyncSession = Depends(get_async_session)
+):
+    """
+    Start tearing the course down in the background and return its progress, which
+    GET /courses/{course_id}/deletion keeps reporting. Students are detached from the course,
+    or with `users=delete` deleted unless they have grades in another course.
+    Repeating the request while a teardown runs or waits for a retry returns it, after a
+    failure, or once its job was lost, it starts it again.
+    """
+    deletion = await db.get(CourseDeletion, course_id)
+    if deletion is not None and deletion.status in ("pending", "running") and not is_stalled(deletion.updated_at):
+        return deletion
+
+    db_course = await db.get(Course, course_id)
+    if db_course is None and (deletion is None or deletion.status == "completed"):
         raise HTTPException(status_code=404, detail="Course not found")
 
-    stmt = delete(Course).where(Course.id == course_id)
-    await db.execute(stmt)
-    await db.commit()
-
-    return {"message": f"Course with id: {course_id}, deleted"}
\ No newline at end of file
+    if deletion is None:
+        deletion = CourseDeletion(course_id=course_id)
+        db.add(deletion)
+    deletion.status = "pending"
+    deletion.user_mode = users
+    deletion.updated_at = datetime.utcnow()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request started the teardown first
+        await db.rollback()
+        return await db.get(CourseDeletion, course_id)
+
+    await job_queue.enqueue("course.delete", course_id=course_id)
+    await db.refresh(deletion)
+    return deletion
+
+
+@router.get("/{course_id}/deletion", response_model=CourseDeletionStatus)
+async def get_course_deletion(course_id: int, db: AsyncSession = Depends(get_async_session)):
+    deletion = await db.get(CourseDeletion, course_id)
+    if deletion is None:
+        raise HTTPException(status_code=404, detail="Course is not being deleted")
+    return deletion
\ No newline at end of file
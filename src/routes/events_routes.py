@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Request, WebSocket
+from fastapi.responses import StreamingResponse
+
+from src.config import EVENTS_HEARTBEAT_SECONDS
+from src.services.events import event_hub
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+@router.get("/course/{course_id}")
+async def stream_course_events(course_id: int, request: Request):
+    """Server-Sent Events stream of grade inserts and quiz status changes for a course."""
+    subscription = event_hub.subscribe(course_id)
+
+    async def event_stream():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=EVENTS_HEARTBEAT_SECONDS)
+                if event is None:
+                    # Keeps proxies from closing an idle connection
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/course/{course_id}/ws")
+async def course_events_websocket(websocket: WebSocket, course_id: int):
+    """WebSocket variant of the course event stream."""
+    await websocket.accept()
+    subscription = event_hub.subscribe(course_id)
+
+    async def send_events():
+        while True:
+            event = await subscription.get(timeout=EVENTS_HEARTBEAT_SECONDS)
+            await websocket.send_json(event if event is not None else {"type": "ping"})
+
+    async def wait_for_disconnect():
+        # Incoming messages are ignored, receiving is only how a closed socket is noticed
+        while True:
+            await websocket.receive_text()
+
+    sender = asyncio.create_task(send_events())
+    receiver = asyncio.create_task(wait_for_disconnect())
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        # Collects WebSocketDisconnect/CancelledError so they are not reported as unhandled
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+        event_hub.unsubscribe(subscription)
@@ -1,47 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete, update
-from typing import List
+from typing import List, Optional
 
-from src.database.database import get_async_session
+from src.database.database import get_async_session, get_read_session
 from src.models.models import Grade
 from src.schemas.grades_schemas import GradeCreate, Grade as GradeSchema
+from src.services.grades import create_grade as create_grade_record
+from src.services.idempotency import StoredResponse, idempotency_store, request_fingerprint, scoped_key
+from src.services.invalidation import invalidation_bus
+from src.services.leaderboard import add_grade_to_stats, remove_grade_from_stats
 
 router = APIRouter(prefix="/grades", tags=["grades"])
 
-@router.post("/", response_model=GradeSchema)
-async def create_grade(grade: GradeCreate, db: AsyncSession = Depends(get_async_session)):
-    from sqlalchemy import and_
-    query = select(Grade).where(
-        and_(
-            Grade.course_id == grade.course_id,
-            Grade.user_id == grade.user_id,
-            Grade.quiz_number == grade.quiz_number
-        )
-    )
-    result = await db.execute(query)
-    db_grade = result.scalar_one_or_none()
 
-    if db_grade:
-        raise HTTPException(status_code=400, detail="Grade for this quiz already registered")
+def grade_body(db_grade: Grade) -> dict:
+    return GradeSchema.model_validate(db_grade).model_dump(mode="json")
 
-    db_grade = Grade(
-        course_id=grade.course_id,
-        user_id=grade.user_id,
-        grade=grade.grade,
-        quiz_number=grade.quiz_number,
-        date=grade.date,
-        time_completion=grade.time_completion
-    )
 
-    db.add(db_grade)
-    await db.commit()
-    await db.refresh(db_grade)
-    return db_grade
+@router.post("/", response_model=GradeSchema)
+async def create_grade(
+        grade: GradeCreate,
+        db: AsyncSession = Depends(get_async_session),
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Retries that send the same Idempotency-Key get the stored response of the first
+    successful attempt back, without running the duplicate check again.
+    """
+    if idempotency_key is None:
+        return await create_grade_record(db, grade)
+
+    key = scoped_key("grades:create", idempotency_key)
+    fingerprint = request_fingerprint(grade)
+    stored = await idempotency_store.begin(key, fingerprint)
+    if stored is not None:
+        return JSONResponse(stored.body, status_code=stored.status_code, headers={"Idempotent-Replayed": "true"})
+
+    saved = []  # body of the grade, taken as soon as it is committed
+    try:
+        await create_grade_record(db, grade, on_commit=lambda db_grade: saved.append(grade_body(db_grade)))
+    except BaseException:
+        if not saved:
+            await idempotency_store.release(key)
+            raise
+        # The grade is committed, a retry has to get it back instead of "already registered"
+        await idempotency_store.complete(key, fingerprint, StoredResponse(200, saved[0]))
+        raise
+    await idempotency_store.complete(key, fingerprint, StoredResponse(200, saved[0]))
+    return saved[0]
 
 
 @router.get("/course/{course_id}users/{user_id}", response_model=List[int])
-async def get_graded_quiz_numbers(course_id: int,user_id: int, db: AsyncSession = Depends(get_async_session)):
+async def get_graded_quiz_numbers(course_id: int,user_id: int, db: AsyncSession = Depends(get_read_session)):
     from sqlalchemy import and_
 
     query = select(Grade.quiz_number).where(
@@ -56,8 +68,8 @@ async def get_graded_quiz_numbers(course_id: int,user_id: int, db: AsyncSession
 
 
 
-@router.get("/my-progress/course/{course_id}users/{user_id}", response_model=List[int])
-async def get_grades(course_id: int,user_id: int, db: AsyncSession = Depends(get_async_session)):
+@router.get("/my-progress/course/{course_id}users/{user_id}", response_model=List[GradeSchema])
+async def get_grades(course_id: int,user_id: int, db: AsyncSession = Depends(get_read_session)):
     from sqlalchemy import and_
 
     query = select(Grade).where(
@@ -71,7 +83,7 @@ async def get_grades(course_id: int,user_id: int, db: AsyncSession = Depends(get
     return grades
 
 @router.get("/{id}", response_model=GradeSchema)
-async def get_grade(grade_id: int, db: AsyncSession = Depends(get_async_session)):
+async def get_grade(grade_id: int, db: AsyncSession = Depends(get_read_session)):
     query = select(Grade).where(Grade.id == grade_id)
     result = await db.execute(query)
     db_grade = result.scalar_one_or_none()
@@ -90,13 +102,20 @@ async def update_grade(grade_id: int, grade: GradeCreate, db: AsyncSession = Dep
     if db_grade is None:
         raise HTTPException(status_code=404, detail="Grade not found")
 
+    previous_course_id, previous_quiz_number = db_grade.course_id, db_grade.quiz_number
+
+    # Swap the old contribution for the new one in the same transaction
+    await remove_grade_from_stats(db, db_grade)
     stmt = (
         update(Grade)
         .where(Grade.id == grade_id)
         .values(**grade.dict(exclude_unset=True))
     )
     await db.execute(stmt)
+    await add_grade_to_stats(db, grade)
     await db.commit()
+    invalidation_bus.publish("analytics", previous_course_id, previous_quiz_number)
+    invalidation_bus.publish("analytics", grade.course_id, grade.quiz_number)
 
     result = await db.execute(query)
     updated_course = result.scalar_one()
@@ -112,8 +131,10 @@ async def delete_grade(grade_id: int, db: AsyncSession = Depends(get_async_sessi
     if db_grade is None:
         raise HTTPException(status_code=404, detail="Grade not found")
 
+    await remove_grade_from_stats(db, db_grade)
     stmt = delete(Grade).where(Grade.id == grade_id)
     await db.execute(stmt)
     await db.commit()
+    invalidation_bus.publish("analytics", db_grade.course_id, db_grade.quiz_number)
 
     return {"message": f"Grade with id: {grade_id}, deleted"}
\ No newline at end of file
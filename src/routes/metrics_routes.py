@@ -0,0 +1,56 @@
+from typing import Optional
+
+from fastapi import APIRouter, Request
+
+from src.bot.sender import broadcast_sender
+from src.bot.webhook import telegram_pipeline
+from src.config import pool_settings
+from src.database.database import get_engine, get_replica_engine
+from src.database.mongo import mongo_pool_listener
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+def _pool_metrics(engine) -> Optional[dict]:
+    # Only InstrumentedAsyncPool keeps statistics, engines installed with set_engine may use any pool
+    metrics = getattr(engine.pool, "metrics", None)
+    return metrics() if metrics is not None else None
+
+
+@router.get("/pools")
+async def get_pool_metrics():
+    """Live occupancy and checkout wait statistics of the Postgres and Mongo pools."""
+    metrics = {
+        "postgres": _pool_metrics(get_engine()),
+        "mongo": mongo_pool_listener.metrics(),
+        "settings": pool_settings.model_dump(),
+    }
+    replica_engine = get_replica_engine()
+    if replica_engine is not None:
+        metrics["postgres_replica"] = _pool_metrics(replica_engine)
+    return metrics
+
+
+@router.get("/startup")
+async def get_startup_metrics(request: Request):
+    """How long the lifespan took to build the clients and warm up the pools."""
+    return {"startup_seconds": getattr(request.app.state, "startup_seconds", None)}
+
+
+@router.get("/telegram")
+async def get_telegram_metrics():
+    """Updates handled, failed and turned away by the bot workers, and the broadcast sender's counters."""
+    return {
+        "running": telegram_pipeline.running,
+        "workers": telegram_pipeline.workers,
+        "pending": telegram_pipeline.pending(),
+        "handled": telegram_pipeline.handled,
+        "failed": telegram_pipeline.failed,
+        "rejected": telegram_pipeline.rejected,
+        "broadcast": {
+            "sent": broadcast_sender.sent,
+            "retried": broadcast_sender.retried,
+            "throttled": broadcast_sender.throttled,
+            "failed": broadcast_sender.failed,
+        },
+    }
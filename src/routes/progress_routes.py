@@ -0,0 +1,82 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.database import get_read_session
+from src.database.mongo import get_quiz_collection
+from src.models.models import Grade
+from src.schemas.progress_schemas import CourseProgress, QuizProgress
+
+router = APIRouter(prefix="/progress", tags=["progress"])
+
+
+async def _fetch_course_quizzes(course_id: int):
+    cursor = get_quiz_collection().find(
+        {"course_id": course_id},
+        {"_id": 0, "quiz_number": 1, "is_active": 1, "time_for_completion": 1}
+    ).sort("quiz_number", 1)
+    return await cursor.to_list(length=None)
+
+
+async def _fetch_user_grades(db: AsyncSession, course_id: int, user_id: int):
+    query = select(Grade.quiz_number, Grade.grade, Grade.time_completion, Grade.date).where(
+        and_(
+            Grade.course_id == course_id,
+            Grade.user_id == user_id
+        )
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+@router.get("/course/{course_id}/user/{user_id}", response_model=CourseProgress)
+async def get_course_progress(course_id: int, user_id: int, db: AsyncSession = Depends(get_read_session)):
+    # Mongo and Postgres are independent, so both round trips run at the same time
+    quizzes, grades = await asyncio.gather(
+        _fetch_course_quizzes(course_id),
+        _fetch_user_grades(db, course_id, user_id),
+    )
+
+    grades_by_number = {row.quiz_number: row for row in grades}
+    completed, active, pending = [], [], []
+
+    for quiz in quizzes:
+        grade = grades_by_number.pop(quiz["quiz_number"], None)
+        progress = QuizProgress(
+            quiz_number=quiz["quiz_number"],
+            is_active=quiz.get("is_active", False),
+            time_for_completion=quiz.get("time_for_completion"),
+        )
+        if grade is not None:
+            progress.grade = grade.grade
+            progress.time_completion = grade.time_completion
+            progress.date = grade.date
+            completed.append(progress)
+        elif progress.is_active:
+            active.append(progress)
+        else:
+            pending.append(progress)
+
+    # Grades whose quiz document no longer exists still count as completed work
+    for grade in grades_by_number.values():
+        completed.append(QuizProgress(
+            quiz_number=grade.quiz_number,
+            is_active=False,
+            grade=grade.grade,
+            time_completion=grade.time_completion,
+            date=grade.date,
+        ))
+    completed.sort(key=lambda progress: progress.quiz_number)
+
+    average_grade = sum(progress.grade for progress in completed) / len(completed) if completed else None
+
+    return CourseProgress(
+        course_id=course_id,
+        user_id=user_id,
+        completed=completed,
+        active=active,
+        pending=pending,
+        average_grade=average_grade,
+    )
@@ -1,79 +1,308 @@
-from fastapi import APIRouter, HTTPException, status
-from bson import ObjectId
-from typing import List, Tuple
+import logging
 
-from src.schemas.quiz_schemas import Quiz, Question
-from src.database.mongo import quiz_collection
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, UploadFile, status
+from bson import ObjectId
+from pymongo import ReturnDocument
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, NoReturn, Optional, Tuple, Union
+
+from src.cache import quiz_cache
+from src.config import QUIZ_IMPORT_MAX_BYTES
+from src.schemas.quiz_schemas import (
+    Quiz,
+    Question,
+    QuestionSearchHit,
+    QuestionSearchResult,
+    QuizBroadcastDeadLetter,
+    QuizBroadcastStatus,
+    QuizImportResult,
+    QuizPreview,
+)
+from src.database.database import get_async_session
+from src.database.mongo import get_quiz_collection
+from src.models.models import QuizBroadcast, QuizBroadcastFailure
+from src.services.broadcast import notify_quiz_activated
+from src.services.cleanup import quiz_image_keys
+from src.services.events import publish_quiz_status
+from src.services.invalidation import invalidation_bus
+from src.services.jobs import job_queue
+from src.services.quiz_bundle import export_bundle, import_bundle
+from src.services.quiz_search import quiz_search_index
+from src.services.quizzes import get_quiz as get_cached_quiz
 
 
 router = APIRouter(prefix="/quiz", tags=["quiz"])
 
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_QUIZZES = 50
+
+
+def strip_answers(quiz: dict) -> dict:
+    """Drop correctness flags and explanations, keeping only the answer texts."""
+    return {
+        **quiz,
+        "questions": [
+            {
+                "image_url": question.get("image_url"),
+                "image_key": question.get("image_key"),
+                "question": question["question"],
+                "options": [text for _, text in question.get("answer", [])],
+            }
+            for question in quiz.get("questions", [])
+        ],
+    }
+
+
+def quiz_etag(quiz: dict) -> str:
+    # The URL names a quiz by its number, which deleting an earlier quiz or recreating this one
+    # gives to another document, so the document id is part of the tag along with its version
+    return f'"{quiz["_id"]}-{quiz.get("version", 0)}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Quiz id and version the client expects to overwrite, None when the write is unconditional."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    quiz_id, _, version = value.strip('"').rpartition("-")
+    try:
+        if not quiz_id:
+            raise ValueError(value)
+        return quiz_id, int(version)
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail='If-Match must be a quiz ETag, e.g. "665f1c2e9b1e8a3f4c2d1a0b-3"'
+        )
+
+
+def quiz_filter(course_id: int, quiz_number: int, expected: Optional[Tuple[str, int]] = None) -> dict:
+    query = {"course_id": course_id, "quiz_number": quiz_number}
+    if expected is not None:
+        quiz_id, version = expected
+        query["_id"] = quiz_id
+        query["version"] = {"$in": [0, None]} if version == 0 else version
+    return query
+
+
+async def raise_write_failure(
+        course_id: int,
+        quiz_number: int,
+        expected: Optional[Tuple[str, int]],
+        question_number: Optional[int] = None
+) -> NoReturn:
+    """Work out why a conditional write matched nothing. Only runs on the failure path."""
+    quiz = await get_quiz_collection().find_one({"course_id": course_id, "quiz_number": quiz_number})
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if question_number is not None and question_number >= len(quiz["questions"]):
+        raise HTTPException(status_code=400, detail="Invalid question number")
+    if expected is not None and str(quiz["_id"]) != expected[0]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another quiz has this number now, reload it before writing",
+            headers={"ETag": quiz_etag(quiz)},
+        )
+    if expected is not None and quiz.get("version", 0) != expected[1]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Quiz was modified by someone else, current version is {quiz.get('version', 0)}",
+            headers={"ETag": quiz_etag(quiz)},
+        )
+    raise HTTPException(status_code=400, detail="Failed to update quiz")
+
+
 @router.get("/", response_model=List[Quiz])
 async def get_all_quizzes():
-    quizzes = await quiz_collection.find().to_list(length=100)  # Adjust length if needed
+    quizzes = await get_quiz_collection().find().to_list(length=100)  # Adjust length if needed
     if not quizzes:
         raise HTTPException(status_code=404, detail="No quizzes found")
     return quizzes
 @router.post("/", response_model=Quiz)
-async def create_quiz(quiz: Quiz):
-    existing_quiz = await quiz_collection.find_one({
+async def create_quiz(quiz: Quiz, response: Response):
+    existing_quiz = await get_quiz_collection().find_one({
         "course_id": quiz.course_id,
         "quiz_number": quiz.quiz_number})
     if existing_quiz:
         raise HTTPException(status_code=400, detail=f"Quiz #{quiz.quiz_number} already exists in this course")
 
-    result = await quiz_collection.insert_one(quiz.dict(by_alias=True))
-    created_quiz = await quiz_collection.find_one({"_id": result.inserted_id})
+    result = await get_quiz_collection().insert_one({**quiz.dict(by_alias=True), "version": 1})
+    invalidation_bus.publish("quiz", quiz.course_id, quiz.quiz_number)
+    publish_quiz_status(quiz.course_id, quiz.quiz_number, quiz.is_active)
+    if quiz.is_active:
+        await notify_quiz_activated(quiz.course_id, quiz.quiz_number)
+    created_quiz = await get_quiz_collection().find_one({"_id": result.inserted_id})
+    response.headers["ETag"] = quiz_etag(created_quiz)
 
     return created_quiz
 
 
 @router.get("/course/{course_id}")
 async def get_course_quizzes_ids(course_id: int):
-    cursor = quiz_collection.find(
+    cursor = get_quiz_collection().find(
         {"course_id": course_id},
         {"quiz_number": 1, "is_active": 1})
     return await cursor.to_list(length=None)
 
 
+@router.get("/course/{course_id}/batch", response_model=List[Union[Quiz, QuizPreview]])
+async def get_quizzes_by_numbers(
+        course_id: int,
+        numbers: str = Query(..., description="Comma separated quiz numbers, e.g. 1,2,5"),
+        hide_answers: bool = False
+):
+    try:
+        quiz_numbers = list(dict.fromkeys(int(number) for number in numbers.split(",") if number.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="numbers must be a comma separated list of integers")
+    if not quiz_numbers:
+        raise HTTPException(status_code=400, detail="At least one quiz number is required")
+    if len(quiz_numbers) > MAX_BATCH_QUIZZES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUIZZES} quizzes can be requested at once")
+
+    quizzes = {}
+    missing = []
+    for quiz_number in quiz_numbers:
+        cached = quiz_cache.get((course_id, quiz_number))
+        if cached is None:
+            missing.append(quiz_number)
+        else:
+            quizzes[quiz_number] = cached
+
+    # Everything not cached comes back in a single round trip
+    if missing:
+        cursor = get_quiz_collection().find({"course_id": course_id, "quiz_number": {"$in": missing}})
+        for quiz in await cursor.to_list(length=len(missing)):
+            quiz_cache.set((course_id, quiz["quiz_number"]), quiz)
+            quizzes[quiz["quiz_number"]] = quiz
+
+    ordered = [quizzes[quiz_number] for quiz_number in quiz_numbers if quiz_number in quizzes]
+    if hide_answers:
+        return [strip_answers(quiz) for quiz in ordered]
+    return ordered
+
+
+@router.post("/course/{course_id}/import", response_model=QuizImportResult)
+async def import_course_quizzes(course_id: int, bundle: UploadFile, skip_existing: bool = False):
+    """
+    Create many quizzes from a JSON manifest or a ZIP with `quizzes.json` and images.
+    Nothing is written unless every quiz in the bundle is valid.
+    """
+    data = await bundle.read(QUIZ_IMPORT_MAX_BYTES + 1)
+    if len(data) > QUIZ_IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Bundle is too large")
+    return await import_bundle(course_id, data, skip_existing)
+
+
+@router.get("/course/{course_id}/export")
+async def export_course_quizzes(course_id: int, format: str = Query("json", pattern="^(json|zip)$")):
+    content = await export_bundle(course_id, include_images=format == "zip")
+    media_type = "application/zip" if format == "zip" else "application/json"
+    return Response(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="course_{course_id}_quizzes.{format}"'}
+    )
+
+
+# Declared before /{quiz_id}, which would otherwise take "search" for an id
+@router.get("/search", response_model=QuestionSearchResult)
+async def search_questions(
+        q: str = Query(..., min_length=1, max_length=200),
+        course_id: Optional[int] = None,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(20, ge=1, le=100)
+):
+    """Ranked search over question texts, answer texts and explanations."""
+    await quiz_search_index.refresh()
+    total, hits = quiz_search_index.search(q, course_id, skip, limit)
+    return QuestionSearchResult(
+        query=q,
+        total=total,
+        skip=skip,
+        limit=limit,
+        hits=[
+            QuestionSearchHit(
+                quiz_id=hit.quiz_id,
+                course_id=hit.key[0],
+                quiz_number=hit.key[1],
+                question_number=hit.key[2],
+                question=hit.question,
+                matched_fields=hit.matched_fields,
+                snippet=hit.snippet,
+                score=hit.score,
+            )
+            for hit in hits
+        ],
+    )
+
+
 @router.get("/{quiz_id}", response_model=Quiz)
-async def get_quiz(quiz_id: str):
-    quiz = await quiz_collection.find_one({"_id": quiz_id})
+async def get_quiz(quiz_id: str, response: Response):
+    quiz = await get_quiz_collection().find_one({"_id": quiz_id})
     if quiz is None:
         raise HTTPException(status_code=404, detail="Quiz not found")
+    response.headers["ETag"] = quiz_etag(quiz)
     return quiz
 
 
 @router.get("/course/{course_id}/number/{quiz_number}", response_model=Quiz)
-async def get_quiz_by_number(course_id: int, quiz_number: int):
-    quiz = await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
+async def get_quiz_by_number(
+        course_id: int,
+        quiz_number: int,
+        response: Response,
+        if_none_match: Optional[str] = Header(None)
+):
+    quiz = await get_cached_quiz(course_id, quiz_number)
     if quiz is None:
         raise HTTPException(status_code=404, detail="Quiz not found")
+
+    # Clients that already hold this version get an empty answer instead of the whole document
+    etag = quiz_etag(quiz)
+    if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return quiz
 
 
 @router.patch("/course/{course_id}/number/{quiz_number}", response_model=Quiz)
-async def add_question(course_id: int, quiz_number: int, question: Question):
-    result = await quiz_collection.update_one(
-        {"course_id": course_id, "quiz_number": quiz_number},
-        {"$push": {"questions": question.dict()}})
+async def add_question(
+        course_id: int,
+        quiz_number: int,
+        question: Question,
+        response: Response,
+        if_match: Optional[str] = Header(None)
+):
+    expected = parse_if_match(if_match)
+    quiz = await get_quiz_collection().find_one_and_update(
+        quiz_filter(course_id, quiz_number, expected),
+        {"$push": {"questions": question.dict()}, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER)
+    if quiz is None:
+        await raise_write_failure(course_id, quiz_number, expected)
 
-    if result.modified_count == 1:
-        return await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
-    raise HTTPException(status_code=404, detail="Quiz not found")
+    invalidation_bus.publish("quiz", course_id, quiz_number)
+    response.headers["ETag"] = quiz_etag(quiz)
+    return quiz
 
 
 @router.put("/course/{course_id}/number/{quiz_number}", response_model=Quiz)
-async def update_quiz(course_id: int, quiz_number: int, quiz_update: Quiz):
+async def update_quiz(
+        course_id: int,
+        quiz_number: int,
+        quiz_update: Quiz,
+        response: Response,
+        if_match: Optional[str] = Header(None)
+):
     try:
-        # Check if quiz exists
-        existing_quiz = await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
-        if not existing_quiz:
-            raise HTTPException(status_code=404, detail="Quiz not found")
+        expected = parse_if_match(if_match)
 
         # Check if update would create duplicate quiz number
-        if existing_quiz["quiz_number"] != quiz_update.quiz_number:
-            duplicate = await quiz_collection.find_one({
+        if quiz_number != quiz_update.quiz_number:
+            duplicate = await get_quiz_collection().find_one({
                 "course_id": quiz_update.course_id,
                 "quiz_number": quiz_update.quiz_number,
             })
@@ -83,49 +312,86 @@ async def update_quiz(course_id: int, quiz_number: int, quiz_update: Quiz):
                     detail=f"Quiz #{quiz_update.quiz_number} already exists in this course"
                 )
 
-        # Update quiz
-        update_result = await quiz_collection.update_one(
-            {"course_id": course_id, "quiz_number": quiz_number},
-            {"$set": quiz_update.dict(by_alias=True, exclude={"id"})}
+        # Update quiz, only if nobody else changed it since the client read it
+        changes = quiz_update.dict(by_alias=True, exclude={"id", "version"})
+        previous = await get_quiz_collection().find_one_and_update(
+            quiz_filter(course_id, quiz_number, expected),
+            {"$set": changes, "$inc": {"version": 1}},
+            return_document=ReturnDocument.BEFORE
         )
-
-        if update_result.modified_count == 1:
-            return await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
-
+        if previous is None:
+            await raise_write_failure(course_id, quiz_number, expected)
+
+        invalidation_bus.publish("quiz", course_id, quiz_number)
+        invalidation_bus.publish("quiz", quiz_update.course_id, quiz_update.quiz_number)
+        if previous.get("is_active") != quiz_update.is_active:
+            publish_quiz_status(quiz_update.course_id, quiz_update.quiz_number, quiz_update.is_active)
+            if quiz_update.is_active:
+                await notify_quiz_activated(quiz_update.course_id, quiz_update.quiz_number)
+
+        quiz = {**previous, **changes, "version": previous.get("version", 0) + 1}
+        response.headers["ETag"] = quiz_etag(quiz)
+        return quiz
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/course/{course_id}/number/{quiz_number}/broadcast", response_model=QuizBroadcastStatus)
+async def get_quiz_broadcast(course_id: int, quiz_number: int, db: AsyncSession = Depends(get_async_session)):
+    """Progress of the latest Telegram broadcast announcing that the quiz was activated."""
+    query = (
+        select(QuizBroadcast)
+        .where(QuizBroadcast.course_id == course_id, QuizBroadcast.quiz_number == quiz_number)
+        .order_by(QuizBroadcast.id.desc())
+        .limit(1)
+    )
+    broadcast = (await db.execute(query)).scalar_one_or_none()
+    if broadcast is None:
+        raise HTTPException(status_code=404, detail="Quiz was not broadcast")
+    return broadcast
+
+
+@router.get("/course/{course_id}/number/{quiz_number}/broadcast/failures", response_model=List[QuizBroadcastDeadLetter])
+async def get_quiz_broadcast_failures(
+        course_id: int,
+        quiz_number: int,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=1000),
+        db: AsyncSession = Depends(get_async_session)
+):
+    """Students the latest broadcast of the quiz could not reach, and why."""
+    latest = (
+        select(QuizBroadcast.id)
+        .where(QuizBroadcast.course_id == course_id, QuizBroadcast.quiz_number == quiz_number)
+        .order_by(QuizBroadcast.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    query = (
+        select(QuizBroadcastFailure)
+        .where(QuizBroadcastFailure.broadcast_id == latest)
+        .order_by(QuizBroadcastFailure.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return (await db.execute(query)).scalars().all()
+
+
 @router.put("/course/{course_id}/quiz/{quiz_number}/question/{question_number}/answers", response_model=Quiz)
 async def update_quiz_question_answers(
         course_id: int,
         quiz_number: int,
         question_number: int,
-        answers: List[Tuple[bool, str]]
+        answers: List[Tuple[bool, str]],
+        response: Response,
+        if_match: Optional[str] = Header(None)
 ):
-    try:
-        # Check if quiz exists
-        existing_quiz = await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
-        if not existing_quiz:
-            raise HTTPException(status_code=404, detail="Quiz not found")
-
-        # Check if the question_number is valid
-        if question_number < 0 or question_number >= len(existing_quiz["questions"]):
-            raise HTTPException(status_code=400, detail="Invalid question number")
-
-        # Update only the answers for the specific question
-        update_result = await quiz_collection.update_one(
-            {"course_id": course_id, "quiz_number": quiz_number},
-            {"$set": {f"questions.{question_number}.answer": answers}}
-        )
-
-        if update_result.modified_count == 1:
-            return await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
-        else:
-            raise HTTPException(status_code=400, detail="Failed to update answers")
-
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return await _update_question_field(
+        course_id, quiz_number, question_number, f"questions.{question_number}.answer", answers, response, if_match
+    )
 
 
 @router.put("/course/{course_id}/quiz/{quiz_number}/question/{question_number}", response_model=Quiz)
@@ -133,44 +399,75 @@ async def update_quiz_question(
         course_id: int,
         quiz_number: int,
         question_number: int,
-        question_update: dict
+        question_update: dict,
+        response: Response,
+        if_match: Optional[str] = Header(None)
 ):
-    try:
-        # Check if quiz exists
-        existing_quiz = await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
-        if not existing_quiz:
-            raise HTTPException(status_code=404, detail="Quiz not found")
+    return await _update_question_field(
+        course_id, quiz_number, question_number, f"questions.{question_number}", question_update, response, if_match
+    )
+
 
-        # Check if the question_number is valid
-        if question_number < 0 or question_number >= len(existing_quiz["questions"]):
+async def _update_question_field(
+        course_id: int,
+        quiz_number: int,
+        question_number: int,
+        field: str,
+        value,
+        response: Response,
+        if_match: Optional[str]
+) -> dict:
+    try:
+        expected = parse_if_match(if_match)
+        if question_number < 0:
             raise HTTPException(status_code=400, detail="Invalid question number")
 
-        # Update the specific question
-        update_result = await quiz_collection.update_one(
-            {"course_id": course_id, "quiz_number": quiz_number},
-            {"$set": {f"questions.{question_number}": question_update}}
+        # The question must exist, checked by the filter instead of reading the quiz first
+        query = quiz_filter(course_id, quiz_number, expected)
+        query[f"questions.{question_number}"] = {"$exists": True}
+        quiz = await get_quiz_collection().find_one_and_update(
+            query,
+            {"$set": {field: value}, "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER
         )
+        if quiz is None:
+            await raise_write_failure(course_id, quiz_number, expected, question_number)
 
-        if update_result.modified_count == 1:
-            return await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
-        else:
-            raise HTTPException(status_code=400, detail="Failed to update question")
+        invalidation_bus.publish("quiz", course_id, quiz_number)
+        response.headers["ETag"] = quiz_etag(quiz)
+        return quiz
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/course/{course_id}/number/{quiz_number}")
 async def delete_quiz(course_id: int, quiz_number: int):
     try:
-        quiz_to_delete = await quiz_collection.find_one({"course_id": course_id, "quiz_number": quiz_number})
+        quiz_to_delete = await get_quiz_collection().find_one({"course_id": course_id, "quiz_number": quiz_number})
         if not quiz_to_delete:
             raise HTTPException(status_code=404, detail="Quiz not found")
-        delete_result = await quiz_collection.delete_one({"course_id": course_id, "quiz_number": quiz_number})
-        await quiz_collection.update_many({"course_id": course_id, "quiz_number": {"$gt": quiz_number}},
-                                          {"$inc": {"quiz_number": -1}})
-        if delete_result.deleted_count == 1:
-            return {"detail": "Quiz successfully deleted"}
-        raise HTTPException(status_code=404, detail="Quiz not found")
+        delete_result = await get_quiz_collection().delete_one({"course_id": course_id, "quiz_number": quiz_number})
+        # A renumbered quiz is different content under its URL, so it gets a new version too
+        await get_quiz_collection().update_many({"course_id": course_id, "quiz_number": {"$gt": quiz_number}},
+                                          {"$inc": {"quiz_number": -1, "version": 1}})
+        # Later quizzes were renumbered, so every cached quiz of the course is stale
+        invalidation_bus.publish("quiz", course_id)
+        if delete_result.deleted_count != 1:
+            raise HTTPException(status_code=404, detail="Quiz not found")
     except:
         raise HTTPException(status_code=400, detail="Invalid quiz ID")
 
+    image_keys = quiz_image_keys(quiz_to_delete)
+    if image_keys:
+        try:
+            await job_queue.enqueue("s3.delete_images", file_keys=image_keys)
+        except Exception:
+            # The quiz is gone already, its images are only left behind in the bucket
+            logger.warning(
+                "Could not queue the image cleanup of quiz %d in course %d", quiz_number, course_id,
+                exc_info=True, extra={"event": "quizzes.cleanup_not_queued", "course_id": course_id},
+            )
+    return {"detail": "Quiz successfully deleted"}
+
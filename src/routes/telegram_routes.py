@@ -0,0 +1,32 @@
+from typing import Optional
+
+from aiogram.types import Update
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from src.bot.webhook import get_telegram_bot, telegram_pipeline, webhook_secret_matches
+
+router = APIRouter(prefix="/telegram", tags=["telegram"])
+
+
+@router.post("/webhook")
+async def telegram_webhook(
+        request: Request,
+        secret_token: Optional[str] = Header(None, alias="X-Telegram-Bot-Api-Secret-Token")
+):
+    """
+    Queue the update and answer right away, the workers handle it afterwards.
+    A 503 makes Telegram deliver the update again later.
+    """
+    bot = get_telegram_bot()
+    if bot is None or not telegram_pipeline.running:
+        raise HTTPException(status_code=404, detail="Telegram webhook is not enabled")
+    if not webhook_secret_matches(secret_token):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+
+    try:
+        update = Update.model_validate(await request.json(), context={"bot": bot})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Not a Telegram update")
+    if not telegram_pipeline.submit(update):
+        raise HTTPException(status_code=503, detail="Bot is busy, try again later")
+    return {"ok": True}
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update
+from sqlalchemy import select, delete, update, any_, bindparam, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
 from typing import List
 
-from src.database.database import get_async_session
+from src.database.database import get_async_session, get_read_session
+from src.services.users import get_user_by_telegram_id
 from src.models.models import User
-from src.schemas.user_schemas import UserCreate, User as UserSchema
+from src.schemas.user_schemas import UserCreate, UserLookup, User as UserSchema
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -34,18 +36,28 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_ses
 
 
 @router.get("/", response_model=List[UserSchema])
-async def get_users(db: AsyncSession = Depends(get_async_session), skip: int = 0, limit: int = 100):
+async def get_users(db: AsyncSession = Depends(get_read_session), skip: int = 0, limit: int = 100):
     query = select(User).offset(skip).limit(limit)
     result = await db.execute(query)
     users = result.scalars().all()
     return users
 
 
+@router.post("/lookup", response_model=List[UserSchema])
+async def lookup_users(lookup: UserLookup, db: AsyncSession = Depends(get_async_session)):
+    # A single array parameter keeps this one statement (and one plan) regardless of list size
+    telegram_ids = list(set(lookup.telegram_ids))
+    query = select(User).where(
+        User.telegram_id == any_(bindparam("telegram_ids", telegram_ids, type_=ARRAY(BigInteger)))
+    )
+    result = await db.execute(query)
+    users = result.scalars().all()
+    return users
+
+
 @router.get("/{telegram_id}", response_model=UserSchema)
 async def get_user(telegram_id: int, db: AsyncSession = Depends(get_async_session)):
-    query = select(User).where(User.telegram_id == telegram_id)
-    result = await db.execute(query)
-    db_user = result.scalar_one_or_none()
+    db_user = await get_user_by_telegram_id(db, telegram_id)
 
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
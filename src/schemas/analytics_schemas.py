@@ -0,0 +1,25 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class HistogramBin(BaseModel):
+    lower: float
+    upper: float
+    count: int
+
+
+class QuizAnalytics(BaseModel):
+    course_id: int
+    quiz_number: int
+    submissions: int
+    question_count: Optional[int] = None
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    histogram: List[HistogramBin] = []
+    difficulty: Optional[float] = None
+    mean_time_completion: Optional[float] = None
+    time_score_correlation: Optional[float] = None
@@ -1,5 +1,5 @@
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -26,5 +26,51 @@ class CourseUpdate(CourseBase):
 
 class Course(CourseBase):
     id: int
+    enrolled_count: int = 0  # students currently in the course
+    completion_count: int = 0  # graded quiz submissions, archived grades included, summed from course_user_stats
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    name: str
+    surname: str
+    total_score: float
+    quizzes_completed: int
+    mean_time_completion: float
+
+
+class RosterStudent(BaseModel):
+    user_id: int
+    username: str
+    name: str
+    surname: str
+    scores: Dict[int, float]  # quiz_number -> grade, quizzes without a grade are left out
+    total_score: float
+    quizzes_completed: int
+
+
+class CourseRoster(BaseModel):
+    course_id: int
+    name: str
+    quiz_numbers: List[int]  # every quiz number graded in the course, the columns of the matrix
+    students: List[RosterStudent]
+
+
+class CourseDeletionStatus(BaseModel):
+    course_id: int
+    status: str
+    user_mode: str
+    grades_deleted: int
+    users_detached: int
+    users_deleted: int
+    quizzes_deleted: int
+    images_deleted: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
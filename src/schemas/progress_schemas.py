@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class QuizProgress(BaseModel):
+    quiz_number: int
+    is_active: bool
+    time_for_completion: Optional[int] = None
+    grade: Optional[float] = None
+    time_completion: Optional[float] = None
+    date: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CourseProgress(BaseModel):
+    course_id: int
+    user_id: int
+    completed: List[QuizProgress]
+    active: List[QuizProgress]
+    pending: List[QuizProgress]
+    average_grade: Optional[float] = None
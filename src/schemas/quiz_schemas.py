@@ -1,5 +1,6 @@
+from datetime import datetime
 from typing import List, Optional, Tuple, Annotated
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from bson import ObjectId
 
 # Custom type for ObjectId
@@ -28,9 +29,110 @@ class Quiz(BaseModel):
     questions: List[Question]
     time_for_completion: int
     is_active: bool
+    # Bumped by every write, documents created before versioning have none and count as version 0
+    version: int = 0
 
     model_config = {
         "populate_by_name": True,
         "arbitrary_types_allowed": True,
         "json_encoders": {ObjectId: str},
-    }
\ No newline at end of file
+    }
+
+
+class QuestionPreview(BaseModel):
+    """Question as shown to a student before submission: answer options without correctness flags."""
+    image_url: Optional[str] = None
+    image_key: Optional[str] = None
+    question: str
+    options: List[str]
+
+
+class QuizPreview(BaseModel):
+    id: Annotated[str, Field(alias="_id")]
+    course_id: int
+    quiz_number: int
+    questions: List[QuestionPreview]
+    time_for_completion: int
+    is_active: bool
+    version: int = 0
+
+    model_config = {
+        "populate_by_name": True,
+    }
+
+
+class ImportQuestion(Question):
+    """Question in an import bundle, `image_file` names an image stored inside a ZIP bundle."""
+    image_file: Optional[str] = None
+
+
+class QuizImportItem(BaseModel):
+    quiz_number: int
+    questions: List[ImportQuestion]
+    time_for_completion: int
+    is_active: bool = False
+
+
+class QuizImportItemResult(BaseModel):
+    index: int
+    quiz_number: Optional[int] = None
+    status: str  # 'created', 'skipped', 'invalid' or 'failed'
+    id: Optional[str] = None
+    errors: List[str] = []
+
+
+class ImageImportResult(BaseModel):
+    file: str
+    status: str  # 'uploaded' or 'failed'
+    file_key: Optional[str] = None
+    file_url: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class QuizImportResult(BaseModel):
+    course_id: int
+    created: int
+    quizzes: List[QuizImportItemResult]
+    images: List[ImageImportResult]
+
+
+class QuestionSearchHit(BaseModel):
+    quiz_id: str
+    course_id: int
+    quiz_number: int
+    question_number: int  # position in `questions`, as used by the question routes
+    question: str
+    matched_fields: List[str]  # 'question', 'answers' and/or 'explanation'
+    snippet: str  # HTML-escaped, matches wrapped in <mark>
+    score: float
+
+
+class QuestionSearchResult(BaseModel):
+    query: str
+    total: int
+    skip: int
+    limit: int
+    hits: List[QuestionSearchHit]
+
+
+class QuizBroadcastStatus(BaseModel):
+    id: int
+    course_id: int
+    quiz_number: int
+    status: str  # 'pending', 'running', 'completed' or 'failed'
+    sent: int
+    failed: int  # dead-lettered, listed by GET .../broadcast/failures
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class QuizBroadcastDeadLetter(BaseModel):
+    telegram_id: int
+    attempts: int
+    error: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, ConfigDict, Field
 
 
@@ -29,4 +29,8 @@ class UserUpdate(UserBase):
 class User(UserBase):
     id: int
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserLookup(BaseModel):
+    telegram_ids: List[int] = Field(..., min_length=1, max_length=5000)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import numpy as np
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import analytics_cache
+from src.database.mongo import get_quiz_collection
+from src.models.models import Grade
+from src.schemas.analytics_schemas import HistogramBin, QuizAnalytics
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+
+
+async def load_quiz_grades(db: AsyncSession, course_id: int, quiz_number: int) -> tuple[np.ndarray, np.ndarray]:
+    """Bulk-load only the score and time columns of a quiz into two float arrays."""
+    query = select(Grade.grade, Grade.time_completion).where(
+        and_(
+            Grade.course_id == course_id,
+            Grade.quiz_number == quiz_number
+        )
+    )
+    result = await db.execute(query)
+    rows = result.all()
+    data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+async def _question_count(course_id: int, quiz_number: int):
+    quiz = await get_quiz_collection().find_one(
+        {"course_id": course_id, "quiz_number": quiz_number},
+        {"questions.question": 1}
+    )
+    if quiz is None:
+        return None
+    return len(quiz.get("questions", []))
+
+
+def compute_quiz_analytics(course_id: int, quiz_number: int, scores: np.ndarray,
+                           times: np.ndarray, question_count=None) -> QuizAnalytics:
+    analytics = QuizAnalytics(
+        course_id=course_id,
+        quiz_number=quiz_number,
+        submissions=int(scores.size),
+        question_count=question_count,
+    )
+    if scores.size == 0:
+        return analytics
+
+    analytics.mean = float(scores.mean())
+    analytics.std = float(scores.std())
+    analytics.min = float(scores.min())
+    analytics.max = float(scores.max())
+    analytics.mean_time_completion = float(times.mean())
+    analytics.percentiles = {
+        f"p{percentile}": float(value)
+        for percentile, value in zip(PERCENTILES, np.percentile(scores, PERCENTILES))
+    }
+
+    # Grades are stored as correct-answer counts, so bin over 0..question_count when it is known
+    # (widened if a grade falls outside it), otherwise over the observed range
+    scored_by_count = bool(question_count) and analytics.min >= 0 and analytics.max <= question_count
+    lower = 0.0 if scored_by_count else analytics.min
+    upper = float(question_count) if scored_by_count else analytics.max
+    if upper <= lower:
+        upper = lower + 1.0
+    counts, edges = np.histogram(scores, bins=HISTOGRAM_BINS, range=(lower, upper))
+    analytics.histogram = [
+        HistogramBin(lower=float(edges[index]), upper=float(edges[index + 1]), count=int(count))
+        for index, count in enumerate(counts)
+    ]
+
+    if scored_by_count:
+        analytics.difficulty = analytics.mean / question_count
+
+    # Pearson correlation is undefined with fewer than two points or a constant column
+    if scores.size > 1 and scores.std() > 0 and times.std() > 0:
+        analytics.time_score_correlation = float(np.corrcoef(times, scores)[0, 1])
+
+    return analytics
+
+
+async def get_quiz_analytics(db: AsyncSession, course_id: int, quiz_number: int) -> QuizAnalytics:
+    """Cached per quiz until the next grade write for that quiz invalidates it."""
+    key = (course_id, quiz_number)
+    analytics = analytics_cache.get(key)
+    if analytics is not None:
+        return analytics
+
+    scores, times = await load_quiz_grades(db, course_id, quiz_number)
+    question_count = await _question_count(course_id, quiz_number)
+    analytics = compute_quiz_analytics(course_id, quiz_number, scores, times, question_count)
+    analytics_cache.set(key, analytics)
+    return analytics
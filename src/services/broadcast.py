@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from aiogram import Bot
+from sqlalchemy import and_, select, update
+
+from src.bot.sender import BroadcastSender, broadcast_sender
+from src.bot.webhook import get_telegram_bot
+from src.config import TELEGRAM_BROADCAST_CHUNK_SIZE, TELEGRAM_WEBHOOK_ENABLED
+from src.database.database import get_session_maker
+from src.models.models import QuizBroadcast, QuizBroadcastFailure, User
+from src.services.jobs import is_stalled, job_queue
+
+logger = logging.getLogger(__name__)
+
+
+def activation_message(quiz_number: int) -> str:
+    return f"Quiz #{quiz_number} is open now, send /quiz {quiz_number} to start it."
+
+
+async def _record(broadcast_id: int, **values) -> None:
+    async with get_session_maker()() as db:
+        await db.execute(
+            update(QuizBroadcast)
+            .where(QuizBroadcast.id == broadcast_id)
+            .values(updated_at=datetime.utcnow(), **values)
+        )
+        await db.commit()
+
+
+async def notify_quiz_activated(course_id: int, quiz_number: int) -> Optional[int]:
+    """
+    Queue a broadcast telling the course's students that the quiz is open, returns its id.
+    Does nothing while the bot is disabled or a broadcast of the quiz is still under way or
+    waiting for a retry. One whose job was lost is picked up again after its last finished chunk.
+    Called after the quiz is already saved, so a failure is logged rather than raised.
+    """
+    if not TELEGRAM_WEBHOOK_ENABLED:
+        return None
+    try:
+        async with get_session_maker()() as db:
+            running = (await db.execute(
+                select(QuizBroadcast.id, QuizBroadcast.updated_at).where(and_(
+                    QuizBroadcast.course_id == course_id,
+                    QuizBroadcast.quiz_number == quiz_number,
+                    QuizBroadcast.status.in_(("pending", "running")),
+                )).order_by(QuizBroadcast.id.desc()).limit(1)
+            )).one_or_none()
+            if running is not None and not is_stalled(running.updated_at):
+                return running.id
+        if running is not None:
+            broadcast_id = running.id
+            await _record(broadcast_id, status="pending")
+        else:
+            async with get_session_maker()() as db:
+                broadcast = QuizBroadcast(course_id=course_id, quiz_number=quiz_number)
+                db.add(broadcast)
+                await db.commit()
+                broadcast_id = broadcast.id
+        await job_queue.enqueue("quiz.broadcast", broadcast_id=broadcast_id)
+    except Exception:
+        logger.warning(
+            "Could not start the broadcast of quiz %d in course %d", quiz_number, course_id,
+            exc_info=True, extra={"event": "broadcast.not_started", "course_id": course_id},
+        )
+        return None
+    return broadcast_id
+
+
+async def send_next_chunk(broadcast_id: int, bot: Bot, sender: BroadcastSender) -> bool:
+    """
+    Send the broadcast to the next TELEGRAM_BROADCAST_CHUNK_SIZE students of the course in user
+    id order, returns whether any are left. Progress, counters and dead letters of a chunk are
+    written in one transaction, so a retry continues after the last finished chunk; only the
+    students of an interrupted chunk can get the message twice.
+    """
+    async with get_session_maker()() as db:
+        broadcast = await db.get(QuizBroadcast, broadcast_id)
+        if broadcast is None or broadcast.status == "completed":
+            return False
+        course_id, quiz_number, last_user_id = broadcast.course_id, broadcast.quiz_number, broadcast.last_user_id
+    if broadcast.status != "running":
+        await _record(broadcast_id, status="running", error=None)
+
+    try:
+        # Keyset pagination on (course_id, id), every chunk is an index range scan
+        async with get_session_maker()() as db:
+            recipients = (await db.execute(
+                select(User.id, User.telegram_id)
+                .where(and_(User.course_id == course_id, User.id > last_user_id, User.is_active.is_(True)))
+                .order_by(User.id)
+                .limit(TELEGRAM_BROADCAST_CHUNK_SIZE)
+            )).all()
+        if not recipients:
+            await _record(broadcast_id, status="completed")
+            logger.info(
+                "Quiz %d broadcast to course %d", quiz_number, course_id,
+                extra={"event": "broadcast.completed", "course_id": course_id, "broadcast_id": broadcast_id},
+            )
+            return False
+
+        text = activation_message(quiz_number)
+        results = await asyncio.gather(*(
+            sender.send(bot, recipient.telegram_id, text) for recipient in recipients
+        ))
+        failures = [
+            QuizBroadcastFailure(broadcast_id=broadcast_id, telegram_id=recipient.telegram_id, attempts=attempts, error=error)
+            for recipient, (attempts, error) in zip(recipients, results)
+            if error is not None
+        ]
+        async with get_session_maker()() as db:
+            db.add_all(failures)
+            await db.execute(
+                update(QuizBroadcast)
+                .where(QuizBroadcast.id == broadcast_id)
+                .values(
+                    sent=QuizBroadcast.sent + len(recipients) - len(failures),
+                    failed=QuizBroadcast.failed + len(failures),
+                    last_user_id=recipients[-1].id,
+                    error=None,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            await db.commit()
+    except Exception as e:
+        # Stays 'running' while the job queue retries, _give_up marks it failed after the last attempt
+        await _record(broadcast_id, error=f"{type(e).__name__}: {e}"[:2000])
+        raise
+    return True
+
+
+async def _give_up(broadcast_id: int, error: str) -> None:
+    await _record(broadcast_id, status="failed", error=error[:2000])
+
+
+@job_queue.register("quiz.broadcast", on_exhausted=_give_up)
+async def broadcast_quiz(broadcast_id: int) -> None:
+    """
+    One chunk per job, the next chunk is a new job: every run stays far below the durable
+    queue's lease, so a long broadcast is never picked up by a second worker halfway.
+    """
+    bot = get_telegram_bot()
+    if bot is None:
+        # Fails the attempt, the job queue retries it and a durable queue lets another worker take it
+        raise RuntimeError("The Telegram bot is not running in this process")
+    if await send_next_chunk(broadcast_id, bot, broadcast_sender):
+        await job_queue.enqueue("quiz.broadcast", broadcast_id=broadcast_id)
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from src.database.aws_s3 import get_s3_handler
+from src.database.mongo import get_quiz_collection
+from src.services.jobs import job_queue
+
+
+@job_queue.register("s3.delete_images")
+async def delete_images(file_keys: list[str]) -> None:
+    """
+    Remove images nothing points at anymore. Uploads are named after the file, so other quizzes
+    may show the same key; those keys are kept. Raising makes the job queue retry it later.
+    """
+    file_keys = await unreferenced_image_keys(file_keys)
+    if not file_keys:
+        return
+    success, message = await run_in_threadpool(get_s3_handler().delete_files, file_keys)
+    if not success:
+        raise RuntimeError(message)
+
+
+async def unreferenced_image_keys(file_keys: list[str], exclude_course_id: Optional[int] = None) -> list[str]:
+    """The keys no quiz uses, not counting the quizzes of `exclude_course_id`."""
+    query = {"questions.image_key": {"$in": file_keys}}
+    if exclude_course_id is not None:
+        query["course_id"] = {"$ne": exclude_course_id}
+    referenced = set(await get_quiz_collection().distinct("questions.image_key", query))
+    return [file_key for file_key in file_keys if file_key not in referenced]
+
+
+def quiz_image_keys(quiz: dict) -> list[str]:
+    return [question["image_key"] for question in quiz.get("questions", []) if question.get("image_key")]
@@ -0,0 +1,163 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, delete, exists, select, update
+from starlette.concurrency import run_in_threadpool
+
+from src.config import COURSE_DELETE_BATCH_SIZE
+from src.database.aws_s3 import get_s3_handler
+from src.database.database import get_session_maker
+from src.database.mongo import get_quiz_collection
+from src.models.models import Course, CourseDeletion, CourseUserStats, Grade, User
+from src.services.cleanup import quiz_image_keys, unreferenced_image_keys
+from src.services.grade_partitions import drop_partition, grade_is_partitioned
+from src.services.invalidation import invalidation_bus
+from src.services.jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+async def _record(course_id: int, **values) -> None:
+    async with get_session_maker()() as db:
+        await db.execute(
+            update(CourseDeletion)
+            .where(CourseDeletion.course_id == course_id)
+            .values(updated_at=datetime.utcnow(), **values)
+        )
+        await db.commit()
+
+
+async def _in_batches(course_id: int, counter: Optional[str], statement_for) -> None:
+    """
+    Run `statement_for(limit)` in its own short transaction until it touches no rows,
+    adding each batch to `counter` in the same transaction so progress is never overcounted.
+    """
+    while True:
+        async with get_session_maker()() as db:
+            result = await db.execute(statement_for(COURSE_DELETE_BATCH_SIZE))
+            if result.rowcount == 0:
+                return
+            if counter is not None:
+                await db.execute(
+                    update(CourseDeletion)
+                    .where(CourseDeletion.course_id == course_id)
+                    .values(updated_at=datetime.utcnow(), **{counter: getattr(CourseDeletion, counter) + result.rowcount})
+                )
+            await db.commit()
+
+
+def _delete_grades(course_id: int):
+    def statement(limit: int):
+        batch = select(Grade.id).where(Grade.course_id == course_id).limit(limit).correlate(None)
+        return delete(Grade).where(Grade.id.in_(batch.scalar_subquery()))
+    return statement
+
+
+def _delete_stats(course_id: int):
+    def statement(limit: int):
+        batch = select(CourseUserStats.user_id).where(CourseUserStats.course_id == course_id).limit(limit).correlate(None)
+        return delete(CourseUserStats).where(and_(
+            CourseUserStats.course_id == course_id,
+            CourseUserStats.user_id.in_(batch.scalar_subquery()),
+        ))
+    return statement
+
+
+def _delete_users(course_id: int):
+    def statement(limit: int):
+        # Users with grades in another course keep their account and are only detached
+        batch = (
+            select(User.id)
+            .where(and_(
+                User.course_id == course_id,
+                ~exists().where(Grade.user_id == User.id),
+                ~exists().where(CourseUserStats.user_id == User.id),
+            ))
+            .limit(limit)
+            .correlate(None)
+        )
+        return delete(User).where(User.id.in_(batch.scalar_subquery()))
+    return statement
+
+
+def _detach_users(course_id: int):
+    def statement(limit: int):
+        batch = select(User.id).where(User.course_id == course_id).limit(limit).correlate(None)
+        return update(User).where(User.id.in_(batch.scalar_subquery())).values(course_id=None)
+    return statement
+
+
+async def _delete_quizzes(course_id: int) -> None:
+    """Images go first: if deleting them fails the quizzes still say which keys to retry."""
+    cursor = get_quiz_collection().find({"course_id": course_id}, {"quiz_number": 1, "questions.image_key": 1})
+    quizzes = await cursor.to_list(length=None)
+    if not quizzes:
+        return
+
+    # Uploads are named after the file, quizzes of other courses may show the same images
+    image_keys = await unreferenced_image_keys(
+        sorted({key for quiz in quizzes for key in quiz_image_keys(quiz)}), exclude_course_id=course_id
+    )
+    s3_handler = get_s3_handler()
+    for start in range(0, len(image_keys), COURSE_DELETE_BATCH_SIZE):
+        batch = image_keys[start:start + COURSE_DELETE_BATCH_SIZE]
+        success, message = await run_in_threadpool(s3_handler.delete_files, batch)
+        if not success:
+            raise RuntimeError(message)
+        await _record(course_id, images_deleted=CourseDeletion.images_deleted + len(batch))
+
+    result = await get_quiz_collection().delete_many({"course_id": course_id})
+    await _record(course_id, quizzes_deleted=CourseDeletion.quizzes_deleted + result.deleted_count)
+    invalidation_bus.publish("quiz", course_id)
+    for quiz_number in {quiz["quiz_number"] for quiz in quizzes}:
+        invalidation_bus.publish("analytics", course_id, quiz_number)
+
+
+async def _give_up(course_id: int, error: str) -> None:
+    await _record(course_id, status="failed", error=error[:2000])
+
+
+@job_queue.register("course.delete", on_exhausted=_give_up)
+async def delete_course(course_id: int) -> None:
+    """
+    Tear a course down in steps that are each safe to repeat, so a retried job continues where
+    the failed attempt stopped. Grades, stats and users go in batches of COURSE_DELETE_BATCH_SIZE
+    rows, then the course row itself and its grade partition, then its quizzes and their images.
+    """
+    async with get_session_maker()() as db:
+        deletion = await db.get(CourseDeletion, course_id)
+        if deletion is None or deletion.status == "completed":
+            return
+        user_mode = deletion.user_mode
+    await _record(course_id, status="running", error=None)
+
+    try:
+        await _in_batches(course_id, "grades_deleted", _delete_grades(course_id))
+        await _in_batches(course_id, None, _delete_stats(course_id))
+        if user_mode == "delete":
+            await _in_batches(course_id, "users_deleted", _delete_users(course_id))
+        await _in_batches(course_id, "users_detached", _detach_users(course_id))
+
+        async with get_session_maker()() as db:
+            # Grades submitted while the batches ran are few, they go with the course row
+            await db.execute(delete(Grade).where(Grade.course_id == course_id))
+            await db.execute(delete(CourseUserStats).where(CourseUserStats.course_id == course_id))
+            await db.execute(update(User).where(User.course_id == course_id).values(course_id=None))
+            await db.execute(delete(Course).where(Course.id == course_id))
+            await db.commit()
+
+        async with get_session_maker()() as db:
+            # Its own transaction, dropping a partition locks all of `grade` until it commits
+            connection = await db.connection()
+            if await grade_is_partitioned(connection) and await drop_partition(connection, course_id):
+                await db.commit()
+
+        await _delete_quizzes(course_id)
+    except Exception as e:
+        # Stays 'running' while the job queue retries, _give_up marks it failed after the last attempt
+        await _record(course_id, error=f"{type(e).__name__}: {e}"[:2000])
+        raise
+
+    await _record(course_id, status="completed")
+    logger.info("Course %d deleted", course_id, extra={"event": "courses.deleted", "course_id": course_id})
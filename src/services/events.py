@@ -0,0 +1,88 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Optional
+
+from src.config import EVENTS_QUEUE_SIZE
+
+RESYNC_EVENT = {"type": "resync"}
+
+
+class Subscription:
+    """
+    One connected client. Its queue is bounded: when the client falls behind the oldest
+    events are dropped and a single `resync` event tells it to refetch current state.
+    """
+
+    def __init__(self, course_id: int, queue_size: int):
+        self.course_id = course_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._needs_resync = False
+
+    def offer(self, event: dict) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self._needs_resync = True
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        if self._needs_resync:
+            self._needs_resync = False
+            return RESYNC_EVENT
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class CourseEventHub:
+    """In-process pub/sub: every published event is fanned out to the course's subscribers."""
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: dict[int, set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, course_id: int) -> Subscription:
+        subscription = Subscription(course_id, self.queue_size)
+        self._subscribers[course_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.course_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.course_id]
+
+    def publish(self, course_id: int, event_type: str, data: dict[str, Any]) -> None:
+        subscribers = self._subscribers.get(course_id)
+        if not subscribers:
+            return
+        event = {"type": event_type, "course_id": course_id, "data": data}
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def subscriber_count(self, course_id: int) -> int:
+        return len(self._subscribers.get(course_id, ()))
+
+
+event_hub = CourseEventHub()
+
+
+def publish_grade_created(grade) -> None:
+    event_hub.publish(grade.course_id, "grade.created", {
+        "user_id": grade.user_id,
+        "quiz_number": grade.quiz_number,
+        "grade": grade.grade,
+        "time_completion": grade.time_completion,
+    })
+
+
+def publish_quiz_status(course_id: int, quiz_number: int, is_active: bool) -> None:
+    event_hub.publish(course_id, "quiz.status", {
+        "quiz_number": quiz_number,
+        "is_active": is_active,
+    })
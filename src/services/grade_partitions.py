@@ -0,0 +1,125 @@
+import gzip
+import os
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# `grade` is LIST-partitioned by course_id in Postgres (migration 5b8f0c2d7e41): one partition
+# per course, plus a default partition that catches grades of courses created before theirs was.
+PARTITION_PREFIX = "grade_course_"
+DEFAULT_PARTITION = "grade_default"
+
+_partitioned: Optional[bool] = None
+
+
+def partition_name(course_id: int) -> str:
+    return f"{PARTITION_PREFIX}{int(course_id)}"
+
+
+async def grade_is_partitioned(connection: AsyncConnection) -> bool:
+    """False on SQLite and on databases that haven't run the partitioning migration yet."""
+    global _partitioned
+    if _partitioned is None:
+        if connection.dialect.name != "postgresql":
+            _partitioned = False
+        else:
+            result = await connection.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'grade'::regclass)"
+            ))
+            _partitioned = bool(result.scalar())
+    return _partitioned
+
+
+async def attached_partitions(connection: AsyncConnection) -> dict[int, str]:
+    """Course id -> partition table, for the per-course partitions currently attached to `grade`."""
+    result = await connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'grade'::regclass"
+    ))
+    return {
+        int(name[len(PARTITION_PREFIX):]): name
+        for name in result.scalars()
+        if name.startswith(PARTITION_PREFIX)
+    }
+
+
+async def table_exists(connection: AsyncConnection, name: str) -> bool:
+    result = await connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})
+    return bool(result.scalar())
+
+
+async def create_partition(connection: AsyncConnection, course_id: int) -> bool:
+    """
+    Give the course its own partition, moving its grades out of the default partition.
+    Run inside a transaction. Returns False when the partition already exists.
+    """
+    table = partition_name(course_id)
+    if await table_exists(connection, table):
+        return False
+    await connection.execute(text(f"CREATE TABLE {table} (LIKE grade INCLUDING DEFAULTS)"))
+    await attach_partition(connection, table, course_id)
+    return True
+
+
+async def attach_partition(connection: AsyncConnection, table: str, course_id: int) -> None:
+    """
+    Attach a detached course table, moving the course's grades out of the default partition
+    first: Postgres refuses the ATTACH while the default partition holds rows for the course.
+    """
+    await connection.execute(
+        text(f"INSERT INTO {table} SELECT * FROM {DEFAULT_PARTITION} WHERE course_id = :course_id"),
+        {"course_id": course_id},
+    )
+    await connection.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE course_id = :course_id"), {"course_id": course_id}
+    )
+    # Indexes and foreign keys of `grade` are created on the table as it is attached
+    await connection.execute(text(f"ALTER TABLE grade ATTACH PARTITION {table} FOR VALUES IN ({int(course_id)})"))
+
+
+async def drop_partition(connection: AsyncConnection, course_id: int) -> bool:
+    """Drop the course's partition, attached or not. Returns False when it has none."""
+    table = partition_name(course_id)
+    if not await table_exists(connection, table):
+        return False
+    await connection.execute(text(f"DROP TABLE {table}"))
+    return True
+
+
+async def finished_courses(connection: AsyncConnection, ended_before: date) -> list[int]:
+    result = await connection.execute(
+        text("SELECT id FROM course WHERE end_date < :ended_before ORDER BY id"), {"ended_before": ended_before}
+    )
+    return list(result.scalars())
+
+
+def archive_path(directory: str, course_id: int) -> str:
+    return os.path.join(directory, f"{partition_name(course_id)}.csv.gz")
+
+
+async def export_table(connection: AsyncConnection, table: str, path: str) -> int:
+    """COPY the table into a gzip-compressed CSV. Returns the number of rows exported."""
+    raw_connection = await connection.get_raw_connection()
+    # Only renamed into place once complete, so a failed export never looks like an archive
+    partial = f"{path}.partial"
+    with gzip.open(partial, "wb") as archive:
+        async def write(chunk: bytes) -> None:
+            archive.write(chunk)
+
+        status = await raw_connection.driver_connection.copy_from_table(
+            table, output=write, format="csv", header=True
+        )
+    os.replace(partial, path)
+    return int(status.split()[-1])
+
+
+async def import_table(connection: AsyncConnection, table: str, path: str) -> int:
+    raw_connection = await connection.get_raw_connection()
+    with gzip.open(path, "rb") as archive:
+        status = await raw_connection.driver_connection.copy_to_table(
+            table, source=archive, format="csv", header=True
+        )
+    return int(status.split()[-1])
@@ -0,0 +1,65 @@
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.models import Grade
+from src.schemas.grades_schemas import GradeCreate
+from src.services.events import publish_grade_created
+from src.services.invalidation import invalidation_bus
+from src.services.leaderboard import add_grade_to_stats
+
+
+async def create_grade(
+        db: AsyncSession,
+        grade: GradeCreate,
+        on_commit: Optional[Callable[[Grade], None]] = None,
+) -> Grade:
+    """
+    Record a quiz result, shared by the REST route and the Telegram bot. One grade per quiz and student.
+    `on_commit` is called with the saved grade right after the commit, before anything that can still fail.
+    """
+    query = select(Grade).where(
+        and_(
+            Grade.course_id == grade.course_id,
+            Grade.user_id == grade.user_id,
+            Grade.quiz_number == grade.quiz_number
+        )
+    )
+    result = await db.execute(query)
+    db_grade = result.scalar_one_or_none()
+
+    if db_grade:
+        raise HTTPException(status_code=400, detail="Grade for this quiz already registered")
+
+    db_grade = Grade(
+        course_id=grade.course_id,
+        user_id=grade.user_id,
+        grade=grade.grade,
+        quiz_number=grade.quiz_number,
+        date=grade.date,
+        time_completion=grade.time_completion
+    )
+
+    db.add(db_grade)
+    await add_grade_to_stats(db, db_grade)
+    await db.commit()
+    if on_commit is not None:
+        on_commit(db_grade)
+    await db.refresh(db_grade)
+    invalidation_bus.publish("analytics", db_grade.course_id, db_grade.quiz_number)
+    publish_grade_created(db_grade)
+    return db_grade
+
+
+async def has_grade(db: AsyncSession, course_id: int, user_id: int, quiz_number: int) -> bool:
+    query = select(Grade.id).where(
+        and_(
+            Grade.course_id == course_id,
+            Grade.user_id == user_id,
+            Grade.quiz_number == quiz_number
+        )
+    ).limit(1)
+    result = await db.execute(query)
+    return result.scalar_one_or_none() is not None
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.cache import TTLCache
+from src.config import IDEMPOTENCY_BACKEND, IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_TTL_SECONDS
+from src.database.database import get_session_maker
+from src.models.models import IdempotencyKey
+
+MAX_KEY_LENGTH = 200
+PURGE_INTERVAL_SECONDS = 600
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: object
+
+
+class _Entry(NamedTuple):
+    fingerprint: str
+    response: Optional[StoredResponse]
+
+
+def request_fingerprint(payload: BaseModel) -> str:
+    """Hash of the request body, so a key reused for a different request can be told apart from a retry."""
+    canonical = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def scoped_key(scope: str, key: str) -> str:
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    return f"{scope}:{key}"
+
+
+def _check_entry(fingerprint: str, stored_fingerprint: str, response: Optional[StoredResponse]) -> StoredResponse:
+    if stored_fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if response is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+    return response
+
+
+class InMemoryIdempotencyStore:
+    """
+    Per-worker store, enough when a single worker serves the API.
+    Bounded by `max_entries`, the oldest keys are forgotten first.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """
+        Claim `key` for a new request and return None, or return the response stored by
+        the request that claimed it first.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            return _check_entry(fingerprint, entry.fingerprint, entry.response)
+        self._entries.set(key, _Entry(fingerprint, None))
+        return None
+
+    async def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        self._entries.set(key, _Entry(fingerprint, response))
+
+    async def release(self, key: str) -> None:
+        """Forget a claimed key whose request failed, so the client can retry it."""
+        self._entries.delete(key)
+
+
+class PostgresIdempotencyStore:
+    """
+    Store shared by all workers through the `idempotency_key` table. The primary key makes
+    claiming atomic, expired rows are reclaimed on conflict and purged periodically.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._purged_at = 0.0
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        now = datetime.utcnow()
+        expired_before = now - timedelta(seconds=self.ttl)
+        async with get_session_maker()() as db:
+            await self._purge_expired(db, expired_before)
+
+            insert = postgresql.insert if db.get_bind().dialect.name != "sqlite" else sqlite.insert
+            result = await db.execute(
+                insert(IdempotencyKey)
+                .values(key=key, fingerprint=fingerprint, created_at=now)
+                .on_conflict_do_nothing(index_elements=[IdempotencyKey.key])
+                .returning(IdempotencyKey.key)
+            )
+            if result.scalar_one_or_none() is None:
+                # Someone holds the key, unless their row has expired
+                reclaimed = await db.execute(
+                    update(IdempotencyKey)
+                    .where(and_(IdempotencyKey.key == key, IdempotencyKey.created_at < expired_before))
+                    .values(fingerprint=fingerprint, status_code=None, response=None, created_at=now)
+                    .returning(IdempotencyKey.key)
+                )
+                if reclaimed.scalar_one_or_none() is None:
+                    row = (await db.execute(select(IdempotencyKey).where(IdempotencyKey.key == key))).scalar_one()
+                    response = None
+                    if row.status_code is not None:
+                        response = StoredResponse(row.status_code, json.loads(row.response))
+                    await db.commit()
+                    return _check_entry(fingerprint, row.fingerprint, response)
+            await db.commit()
+        return None
+
+    async def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        async with get_session_maker()() as db:
+            await db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(status_code=response.status_code, response=json.dumps(response.body))
+            )
+            await db.commit()
+
+    async def release(self, key: str) -> None:
+        async with get_session_maker()() as db:
+            await db.execute(
+                delete(IdempotencyKey).where(and_(IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None)))
+            )
+            await db.commit()
+
+    async def _purge_expired(self, db, expired_before: datetime) -> None:
+        if time.monotonic() - self._purged_at < PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = time.monotonic()
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < expired_before))
+
+
+if IDEMPOTENCY_BACKEND == "postgres":
+    idempotency_store = PostgresIdempotencyStore(ttl=IDEMPOTENCY_TTL_SECONDS)
+else:
+    idempotency_store = InMemoryIdempotencyStore(max_entries=IDEMPOTENCY_MAX_ENTRIES, ttl=IDEMPOTENCY_TTL_SECONDS)
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import uuid
+from typing import Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.cache import (
+    analytics_cache,
+    invalidate_course_quizzes,
+    invalidate_quiz,
+    invalidate_quiz_analytics,
+    quiz_cache,
+)
+from src.config import (
+    CACHE_INVALIDATION_CHANNEL,
+    CACHE_INVALIDATION_ENABLED,
+    CACHE_INVALIDATION_HEALTHCHECK_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+FLUSH_ALL = "*"
+MAX_PENDING_MESSAGES = 1000
+MAX_RECONNECT_DELAY = 30.0
+
+
+class InvalidationBus:
+    """
+    Keeps the in-process caches of every uvicorn worker coherent.
+
+    `publish` evicts locally right away and queues a compact message, which a background
+    task sends with `pg_notify` on a connection from the SQLAlchemy asyncpg engine. The same
+    connection LISTENs on the channel and evicts whatever other workers published.
+
+    Messages look like `<worker>:<seq>:<namespace>:<key,...>`. A gap in a worker's sequence
+    numbers or a reconnect means messages may have been missed, and every cache is flushed.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex[:8]
+        self._handlers: dict[str, list[Callable[..., None]]] = {}
+        self._flush_handlers: list[Callable[[], None]] = []
+        self._outgoing: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._seq = 0
+        self._last_seen: dict[str, int] = {}
+        self.flushes = 0
+
+    def register(self, namespace: str, evict: Callable[..., None], flush: Callable[[], None]) -> None:
+        """Several handlers may register for a namespace, each is called for every key evicted from it."""
+        self._handlers.setdefault(namespace, []).append(evict)
+        self._flush_handlers.append(flush)
+
+    def publish(self, namespace: str, *key: int) -> None:
+        """Evict `key` from `namespace` in this worker and broadcast it to the others."""
+        self._evict(namespace, key)
+        if self._outgoing is None:
+            return
+        message = f"{namespace}:{','.join(str(part) for part in key)}"
+        if self._outgoing.full():
+            # Too far behind to replay individual keys, tell everyone to start over instead
+            self._drain_outgoing()
+            message = f"{FLUSH_ALL}:"
+        self._outgoing.put_nowait(message)
+
+    def flush_local(self) -> None:
+        self.flushes += 1
+        for flush in self._flush_handlers:
+            flush()
+
+    async def start(self, engine: AsyncEngine) -> None:
+        if engine.dialect.name != "postgresql":
+            logger.info("Cache invalidation bus disabled: %s has no LISTEN/NOTIFY", engine.dialect.name)
+            return
+        self._outgoing = asyncio.Queue(maxsize=MAX_PENDING_MESSAGES)
+        self._task = asyncio.create_task(self._run(engine))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._outgoing = None
+
+    async def _run(self, engine: AsyncEngine) -> None:
+        delay = 1.0
+        first_connection = True
+        while True:
+            try:
+                async with engine.connect() as connection:
+                    raw_connection = await connection.get_raw_connection()
+                    delay = 1.0
+                    await self._listen(raw_connection.driver_connection, first_connection)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Cache invalidation bus lost its connection, retrying in %.0fs", delay)
+            first_connection = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _listen(self, driver_connection, first_connection: bool) -> None:
+        connection_lost = asyncio.Event()
+
+        def on_termination(_):
+            connection_lost.set()
+
+        driver_connection.add_termination_listener(on_termination)
+        await driver_connection.add_listener(self.channel, self._on_notification)
+        try:
+            # Anything could have been published while we were not listening
+            self._last_seen.clear()
+            if not first_connection:
+                self.flush_local()
+                self._drain_outgoing()
+                self._outgoing.put_nowait(f"{FLUSH_ALL}:")
+
+            while not connection_lost.is_set():
+                try:
+                    message = await asyncio.wait_for(
+                        self._outgoing.get(), CACHE_INVALIDATION_HEALTHCHECK_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    await driver_connection.execute("SELECT 1")
+                    continue
+                self._seq += 1
+                await driver_connection.execute(
+                    "SELECT pg_notify($1, $2)", self.channel, f"{self.worker_id}:{self._seq}:{message}"
+                )
+            raise ConnectionError("listener connection terminated")
+        finally:
+            driver_connection.remove_termination_listener(on_termination)
+            if not driver_connection.is_closed():
+                await driver_connection.remove_listener(self.channel, self._on_notification)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            worker_id, seq, namespace, raw_key = payload.split(":", 3)
+            seq = int(seq)
+            key = tuple(int(part) for part in raw_key.split(",") if part)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation message %r", payload)
+            return
+
+        if worker_id == self.worker_id:
+            return
+
+        last_seen = self._last_seen.get(worker_id)
+        self._last_seen[worker_id] = seq
+        if namespace == FLUSH_ALL or (last_seen is not None and seq != last_seen + 1):
+            self.flush_local()
+            return
+        self._evict(namespace, key)
+
+    def _evict(self, namespace: str, key: tuple) -> None:
+        for evict in self._handlers.get(namespace, ()):
+            evict(*key)
+
+    def _drain_outgoing(self) -> None:
+        while not self._outgoing.empty():
+            self._outgoing.get_nowait()
+
+
+def _evict_quiz(course_id: int, quiz_number: Optional[int] = None) -> None:
+    if quiz_number is None:
+        invalidate_course_quizzes(course_id)
+    else:
+        invalidate_quiz(course_id, quiz_number)
+
+
+invalidation_bus = InvalidationBus(CACHE_INVALIDATION_CHANNEL)
+invalidation_bus.register("quiz", _evict_quiz, quiz_cache.clear)
+invalidation_bus.register("analytics", invalidate_quiz_analytics, analytics_cache.clear)
+
+
+async def start_invalidation_bus(engine: AsyncEngine) -> None:
+    if CACHE_INVALIDATION_ENABLED:
+        await invalidation_bus.start(engine)
+
+
+async def stop_invalidation_bus() -> None:
+    await invalidation_bus.stop()
@@ -0,0 +1,362 @@
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import and_, delete, or_, select, update
+
+from src.config import (
+    JOBS_BACKEND,
+    JOBS_DRAIN_SECONDS,
+    JOBS_LEASE_SECONDS,
+    JOBS_MAX_ATTEMPTS,
+    JOBS_POLL_SECONDS,
+    JOBS_QUEUE_SIZE,
+    JOBS_RETRY_BASE_SECONDS,
+    JOBS_RETRY_MAX_SECONDS,
+    JOBS_WORKERS,
+)
+from src.database.database import get_session_maker
+from src.models.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[..., Awaitable[None]]
+
+
+def is_stalled(updated_at: datetime) -> bool:
+    """
+    Whether a job that records its progress, last at `updated_at`, can't still be running or
+    waiting for a retry: its lease and the longest backoff have both passed since. Lets a caller
+    restart work whose job was lost, e.g. by the in-memory queue restarting.
+    """
+    return updated_at < datetime.utcnow() - timedelta(seconds=JOBS_LEASE_SECONDS + JOBS_RETRY_MAX_SECONDS)
+
+
+class Job:
+    def __init__(self, name: str, payload: dict, attempts: int = 0, id: Optional[int] = None,
+                 locked_until: Optional[datetime] = None):
+        self.name = name
+        self.payload = payload
+        self.attempts = attempts
+        self.id = id
+        # End of the durable queue's lease as this worker last set it, proves the claim is still ours
+        self.locked_until = locked_until
+
+
+class JobQueue:
+    """
+    In-process queue for work that can happen after the response is sent.
+    Handlers are registered by name and called with the job payload as keyword arguments.
+    A failing job is retried with exponential backoff up to `max_attempts` times, after the last
+    one the `on_exhausted` callback given to `register` is called with the payload and the error.
+    On shutdown the queue stops taking jobs and gives the pending ones `drain_timeout`
+    seconds to finish; whatever is left after that is lost, use the durable queue if that matters.
+    """
+
+    def __init__(
+            self,
+            workers: int = JOBS_WORKERS,
+            max_attempts: int = JOBS_MAX_ATTEMPTS,
+            retry_base: float = JOBS_RETRY_BASE_SECONDS,
+            retry_max: float = JOBS_RETRY_MAX_SECONDS,
+            queue_size: int = JOBS_QUEUE_SIZE,
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.queue_size = queue_size
+        self._handlers: dict[str, JobHandler] = {}
+        self._on_exhausted: dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+        self.completed = 0
+        self.failed = 0
+
+    def register(self, name: str, on_exhausted: Optional[JobHandler] = None) -> Callable[[JobHandler], JobHandler]:
+        def decorator(handler: JobHandler) -> JobHandler:
+            self._handlers[name] = handler
+            if on_exhausted is not None:
+                self._on_exhausted[name] = on_exhausted
+            return handler
+        return decorator
+
+    async def enqueue(self, name: str, **payload) -> None:
+        if name not in self._handlers:
+            raise ValueError(f"No handler registered for job {name!r}")
+        job = Job(name, payload)
+        if self._queue is None or self._queue.full():
+            # Not started (scripts, shutdown) or too far behind: run it right away rather than dropping it.
+            # There is no retry on this path, so a failure is final
+            error = await self._run(job)
+            if error is not None:
+                await self._exhausted(job.name, job.payload, error)
+            return
+        self._queue.put_nowait(job)
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = JOBS_DRAIN_SECONDS) -> None:
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Job queue stopped with %d jobs still pending", self._queue.qsize())
+        if self._retries:
+            logger.warning("Job queue stopped with %d jobs waiting for a retry", len(self._retries))
+        for task in [*self._tasks, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks = []
+        self._retries.clear()
+        self._queue = None
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        # Jitter, so jobs that failed together don't all come back at the same moment
+        return delay * random.uniform(0.5, 1)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                error = await self._run(job)
+                if error is not None and job.attempts < self.max_attempts:
+                    retry = asyncio.create_task(self._retry_later(job, self.retry_delay(job.attempts)))
+                    self._retries.add(retry)
+                    retry.add_done_callback(self._retries.discard)
+                elif error is not None:
+                    await self._exhausted(job.name, job.payload, error)
+            finally:
+                self._queue.task_done()
+
+    async def _retry_later(self, job: Job, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if self._queue is None:
+            logger.warning(
+                "Job %s dropped, the queue stopped before its retry", job.name,
+                extra={"event": "jobs.dropped", "job": job.name},
+            )
+            return
+        # Waits for room instead of dropping the job when the queue is full
+        await self._queue.put(job)
+
+    async def _run(self, job: Job) -> Optional[str]:
+        """Run one attempt of the job, returns the error or None when it succeeded."""
+        job.attempts += 1
+        try:
+            await self._handlers[job.name](**job.payload)
+        except Exception as e:
+            self.failed += 1
+            logger.warning(
+                "Job %s failed (attempt %d of %d)", job.name, job.attempts, self.max_attempts,
+                exc_info=True, extra={"event": "jobs.failed", "job": job.name, "error": str(e)},
+            )
+            return f"{type(e).__name__}: {e}"
+        self.completed += 1
+        return None
+
+    async def _exhausted(self, name: str, payload: dict, error: str) -> None:
+        callback = self._on_exhausted.get(name)
+        if callback is None:
+            return
+        try:
+            await callback(error=error, **payload)
+        except Exception:
+            logger.exception("on_exhausted of job %s failed", name)
+
+
+class DurableJobQueue(JobQueue):
+    """
+    Jobs stored in the `background_job` table, so they survive restarts and are shared by all
+    workers. Workers claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers
+    never wait on or double-claim the same row. A claim is a lease: a job whose worker died is
+    picked up again once `lease` seconds have passed; while the handler runs its worker extends
+    the lease every third of it, so only a job whose worker stopped is claimed twice. Every claim
+    counts as an attempt, so a job that keeps killing its worker still runs out of them. Finished
+    jobs are deleted, jobs that ran out of attempts stay with status 'failed' for inspection. Only
+    the worker holding the current lease settles a job.
+    """
+
+    def __init__(self, poll_interval: float = JOBS_POLL_SECONDS, lease: float = JOBS_LEASE_SECONDS, **kwargs):
+        super().__init__(**kwargs)
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._running = 0
+
+    async def enqueue(self, name: str, **payload) -> None:
+        if name not in self._handlers:
+            raise ValueError(f"No handler registered for job {name!r}")
+        async with get_session_maker()() as db:
+            db.add(BackgroundJob(name=name, payload=json.dumps(payload), run_at=datetime.utcnow()))
+            await db.commit()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = JOBS_DRAIN_SECONDS) -> None:
+        if self._wakeup is None:
+            return
+        # Stop claiming, let the jobs in progress finish; unclaimed jobs stay in the table
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.gather(*self._tasks, return_exceptions=True), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Job workers stopped with %d jobs in progress, they run again after the lease", self._running)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Could not claim a background job")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._running += 1
+            try:
+                stopped = asyncio.Event()
+                heartbeat = asyncio.create_task(self._heartbeat(job, stopped))
+                try:
+                    error = await self._run(job)
+                finally:
+                    # Stopped rather than cancelled, so no lease extension is left half written
+                    stopped.set()
+                    await heartbeat
+                await self._finish(job, error)
+            finally:
+                self._running -= 1
+
+    async def _heartbeat(self, job: Job, stopped: asyncio.Event) -> None:
+        """Extend the job's lease every third of it until `stopped` is set."""
+        while True:
+            try:
+                await asyncio.wait_for(stopped.wait(), self.lease / 3)
+                return
+            except asyncio.TimeoutError:
+                pass
+            locked_until = datetime.utcnow() + timedelta(seconds=self.lease)
+            try:
+                async with get_session_maker()() as db:
+                    extended = await db.execute(
+                        update(BackgroundJob)
+                        .where(and_(BackgroundJob.id == job.id, BackgroundJob.locked_until == job.locked_until))
+                        .values(locked_until=locked_until)
+                    )
+                    await db.commit()
+            except Exception:
+                logger.warning("Could not extend the lease of job %s", job.name, exc_info=True)
+                continue
+            if extended.rowcount != 1:
+                # Expired and claimed by another worker already, _finish will leave the job to it
+                return
+            job.locked_until = locked_until
+
+    async def _claim(self) -> Optional[Job]:
+        now = datetime.utcnow()
+        async with get_session_maker()() as db:
+            query = (
+                select(BackgroundJob)
+                .where(or_(
+                    and_(BackgroundJob.status == "pending", BackgroundJob.run_at <= now),
+                    and_(BackgroundJob.status == "running", BackgroundJob.locked_until < now),
+                ))
+                .order_by(BackgroundJob.run_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            row = (await db.execute(query)).scalar_one_or_none()
+            if row is None:
+                return None
+            if row.attempts >= self.max_attempts:
+                # Only a job whose lease expired gets here: its worker died on every attempt
+                row.status = "failed"
+                row.locked_until = None
+                row.last_error = row.last_error or "Worker stopped before the job finished"
+                await db.commit()
+                logger.warning(
+                    "Job %s failed, its worker stopped on each of %d attempts", row.name, row.attempts,
+                    extra={"event": "jobs.failed", "job": row.name},
+                )
+                await self._exhausted(row.name, json.loads(row.payload), row.last_error)
+                return None
+            # As read, before the claim counts this attempt; _run adds it to the job again
+            attempts = row.attempts
+            locked_until = now + timedelta(seconds=self.lease)
+            # Only matches while the row is still as we read it. Redundant under SKIP LOCKED,
+            # but keeps the claim exclusive on databases without row locks (SQLite in benchmarks)
+            claimed = await db.execute(
+                update(BackgroundJob)
+                .where(and_(
+                    BackgroundJob.id == row.id,
+                    BackgroundJob.status == row.status,
+                    BackgroundJob.locked_until.is_(None) if row.locked_until is None
+                    else BackgroundJob.locked_until == row.locked_until,
+                ))
+                .values(status="running", locked_until=locked_until, attempts=BackgroundJob.attempts + 1)
+            )
+            await db.commit()
+            if claimed.rowcount != 1:
+                return None
+        return Job(row.name, json.loads(row.payload), attempts=attempts, id=row.id, locked_until=locked_until)
+
+    async def _finish(self, job: Job, error: Optional[str]) -> None:
+        exhausted = error is not None and job.attempts >= self.max_attempts
+        # Matches only while this worker still holds the lease: once it expired and another
+        # worker claimed the job, that worker's attempt is the one that settles it
+        held = and_(
+            BackgroundJob.id == job.id,
+            BackgroundJob.status == "running",
+            BackgroundJob.locked_until == job.locked_until,
+        )
+        async with get_session_maker()() as db:
+            if error is None:
+                settled = await db.execute(delete(BackgroundJob).where(held))
+            else:
+                values = {"attempts": job.attempts, "last_error": error[:2000], "locked_until": None}
+                if exhausted:
+                    values["status"] = "failed"
+                else:
+                    values["status"] = "pending"
+                    values["run_at"] = datetime.utcnow() + timedelta(seconds=self.retry_delay(job.attempts))
+                settled = await db.execute(update(BackgroundJob).where(held).values(**values))
+            await db.commit()
+        if settled.rowcount != 1:
+            logger.warning(
+                "Job %s outlived its lease, its result is left to the worker that claimed it since", job.name,
+                extra={"event": "jobs.lease_lost", "job": job.name},
+            )
+            return
+        if exhausted:
+            await self._exhausted(job.name, job.payload, error)
+
+
+if JOBS_BACKEND == "postgres":
+    job_queue = DurableJobQueue()
+else:
+    job_queue = JobQueue()
@@ -0,0 +1,95 @@
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import analytics_cache
+from src.models.models import CourseUserStats, User
+
+
+def _upsert(db: AsyncSession):
+    """Pick the dialect specific INSERT that supports ON CONFLICT."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
+
+
+async def _apply_delta(db: AsyncSession, course_id: int, user_id: int,
+                       score: float, time_completion: float, completed: int) -> None:
+    if course_id is None or user_id is None:
+        return
+
+    stmt = _upsert(db)(CourseUserStats).values(
+        course_id=course_id,
+        user_id=user_id,
+        total_score=score,
+        quizzes_completed=completed,
+        total_time_completion=time_completion,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CourseUserStats.course_id, CourseUserStats.user_id],
+        set_={
+            "total_score": CourseUserStats.total_score + stmt.excluded.total_score,
+            "quizzes_completed": CourseUserStats.quizzes_completed + stmt.excluded.quizzes_completed,
+            "total_time_completion": CourseUserStats.total_time_completion + stmt.excluded.total_time_completion,
+        }
+    )
+    await db.execute(stmt)
+
+    if completed < 0:
+        await db.execute(
+            delete(CourseUserStats).where(
+                and_(
+                    CourseUserStats.course_id == course_id,
+                    CourseUserStats.user_id == user_id,
+                    CourseUserStats.quizzes_completed <= 0
+                )
+            )
+        )
+
+
+async def add_grade_to_stats(db: AsyncSession, grade) -> None:
+    """Add a grade's contribution. Runs inside the caller's transaction, before commit."""
+    await _apply_delta(db, grade.course_id, grade.user_id, grade.grade, grade.time_completion, 1)
+
+
+async def remove_grade_from_stats(db: AsyncSession, grade) -> None:
+    """Remove a grade's contribution. Runs inside the caller's transaction, before commit."""
+    await _apply_delta(db, grade.course_id, grade.user_id, -grade.grade, -grade.time_completion, -1)
+
+
+async def get_leaderboard(db: AsyncSession, course_id: int, limit: int):
+    """Top `limit` students of a course, best total score first and faster average time on ties."""
+    mean_time = CourseUserStats.total_time_completion / CourseUserStats.quizzes_completed
+    query = (
+        select(CourseUserStats, User.username, User.name, User.surname)
+        .join(User, User.id == CourseUserStats.user_id)
+        .where(CourseUserStats.course_id == course_id)
+        .order_by(CourseUserStats.total_score.desc(), mean_time.asc())
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+async def get_completion_counts(db: AsyncSession, course_ids: list[int]) -> dict[int, int]:
+    """
+    Graded submissions per course, archived grades included, in one grouped SELECT for the
+    courses not cached yet. Cached per course until the next grade write of the course.
+    """
+    counts = {}
+    for course_id in course_ids:
+        count = analytics_cache.get((course_id, None))
+        if count is not None:
+            counts[course_id] = count
+    missing = [course_id for course_id in course_ids if course_id not in counts]
+    if missing:
+        result = await db.execute(
+            select(CourseUserStats.course_id, func.sum(CourseUserStats.quizzes_completed))
+            .where(CourseUserStats.course_id.in_(missing))
+            .group_by(CourseUserStats.course_id)
+        )
+        totals = dict(result.all())
+        for course_id in missing:
+            counts[course_id] = int(totals.get(course_id) or 0)
+            analytics_cache.set((course_id, None), counts[course_id])
+    return counts
@@ -0,0 +1,285 @@
+import asyncio
+import io
+import json
+import logging
+import posixpath
+import zipfile
+import zlib
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+
+from src.config import QUIZ_IMPORT_IMAGE_CONCURRENCY, QUIZ_IMPORT_MAX_BYTES, QUIZ_IMPORT_MAX_QUIZZES
+from src.database.aws_s3 import get_s3_handler
+from src.database.mongo import get_quiz_collection
+from src.schemas.quiz_schemas import (
+    ImageImportResult,
+    QuizImportItem,
+    QuizImportItemResult,
+    QuizImportResult,
+)
+from src.services.broadcast import notify_quiz_activated
+from src.services.events import publish_quiz_status
+from src.services import cleanup  # noqa: F401, registers the s3.delete_images job
+from src.services.invalidation import invalidation_bus
+from src.services.jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+# Name of the quiz list inside a ZIP bundle, every other entry is an image
+MANIFEST_NAME = "quizzes.json"
+EXPORT_IMAGE_DIR = "images"
+
+# What reading a damaged member of an archive that passed is_zipfile can raise
+CORRUPT_ZIP_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError)
+
+
+def read_bundle(data: bytes) -> tuple[list, Optional[zipfile.ZipFile]]:
+    """
+    A bundle is either the JSON manifest itself or a ZIP holding `quizzes.json` plus images.
+    The manifest is `{"quizzes": [...]}` or just the list. Decompresses, so call it in a thread.
+    """
+    archive = None
+    manifest = data
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+            # Checked before anything is decompressed, so a small archive can't expand without bound
+            if sum(info.file_size for info in archive.infolist()) > QUIZ_IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Bundle is too large once uncompressed")
+            manifest = archive.read(MANIFEST_NAME)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"ZIP bundle has no {MANIFEST_NAME}")
+        except CORRUPT_ZIP_ERRORS:
+            raise HTTPException(status_code=400, detail="ZIP bundle is corrupt")
+
+    try:
+        parsed = json.loads(manifest)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Bundle is neither a ZIP file nor valid JSON")
+    quizzes = parsed.get("quizzes") if isinstance(parsed, dict) else parsed
+    if not isinstance(quizzes, list):
+        raise HTTPException(status_code=400, detail="Bundle must contain a list of quizzes")
+    if len(quizzes) > QUIZ_IMPORT_MAX_QUIZZES:
+        raise HTTPException(status_code=400, detail=f"At most {QUIZ_IMPORT_MAX_QUIZZES} quizzes can be imported at once")
+    return quizzes, archive
+
+
+def _validate(raw_quizzes: list, archive: Optional[zipfile.ZipFile],
+              existing: set, skip_existing: bool) -> tuple[list, dict]:
+    """Validate every quiz before anything is written. Returns the per-item results and the quizzes to create."""
+    results = []
+    to_create = {}
+    image_names = set(archive.namelist()) if archive is not None else set()
+    seen = set()
+
+    for index, raw in enumerate(raw_quizzes):
+        result = QuizImportItemResult(index=index, status="invalid")
+        results.append(result)
+        try:
+            item = QuizImportItem.model_validate(raw)
+        except ValidationError as e:
+            result.quiz_number = raw.get("quiz_number") if isinstance(raw, dict) else None
+            result.errors = [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+            continue
+
+        result.quiz_number = item.quiz_number
+        if item.quiz_number in seen:
+            result.errors.append(f"Quiz #{item.quiz_number} appears more than once in the bundle")
+        seen.add(item.quiz_number)
+        for number, question in enumerate(item.questions):
+            if question.image_file is not None and question.image_file not in image_names:
+                result.errors.append(f"questions.{number}.image_file: {question.image_file} is not in the bundle")
+        if item.quiz_number in existing:
+            if skip_existing:
+                result.status = "skipped"
+                continue
+            result.errors.append(f"Quiz #{item.quiz_number} already exists in this course")
+        if not result.errors:
+            result.status = "created"
+            to_create[index] = item
+    return results, to_create
+
+
+def _read_images(archive: zipfile.ZipFile, names: set) -> dict:
+    """Decompress every image before the first upload, so a corrupt member leaves nothing behind in S3."""
+    try:
+        return {name: archive.read(name) for name in names}
+    except CORRUPT_ZIP_ERRORS:
+        raise HTTPException(status_code=400, detail="ZIP bundle is corrupt")
+
+
+async def _upload_images(course_id: int, archive: zipfile.ZipFile, names: set) -> dict:
+    """Upload images with at most QUIZ_IMPORT_IMAGE_CONCURRENCY boto3 calls in flight."""
+    semaphore = asyncio.Semaphore(QUIZ_IMPORT_IMAGE_CONCURRENCY)
+    s3_handler = get_s3_handler()
+    contents = await run_in_threadpool(_read_images, archive, names)
+
+    async def upload(name: str) -> ImageImportResult:
+        # A fresh prefix per image: files in different folders of the bundle, or in an earlier
+        # import that existing quizzes still show, may share a name
+        file_key = f"quiz_images/{course_id}/{ObjectId()}/{posixpath.basename(name)}"
+        async with semaphore:
+            content = contents[name]
+            success, url_or_error = await run_in_threadpool(s3_handler.upload_file, io.BytesIO(content), file_key)
+        if success:
+            return ImageImportResult(file=name, status="uploaded", file_key=file_key, file_url=url_or_error)
+        return ImageImportResult(file=name, status="failed", detail=url_or_error)
+
+    uploaded = await asyncio.gather(*(upload(name) for name in sorted(names)))
+    return {image.file: image for image in uploaded}
+
+
+async def _discard_images(course_id: int, file_keys: list[str]) -> None:
+    """Queue the deletion of uploads no created quiz uses. The import has happened, so a failure is only logged."""
+    if not file_keys:
+        return
+    try:
+        await job_queue.enqueue("s3.delete_images", file_keys=file_keys)
+    except Exception:
+        logger.warning(
+            "Could not queue the cleanup of %d unused imported images", len(file_keys),
+            exc_info=True, extra={"event": "quizzes.cleanup_not_queued", "course_id": course_id},
+        )
+
+
+def _document(course_id: int, item: QuizImportItem, images: dict) -> dict:
+    questions = []
+    for question in item.questions:
+        data = question.model_dump(exclude={"image_file"})
+        if question.image_file is not None:
+            image = images[question.image_file]
+            data["image_key"] = image.file_key
+            data["image_url"] = image.file_url
+        questions.append(data)
+    return {
+        "_id": str(ObjectId()),
+        "course_id": course_id,
+        "quiz_number": item.quiz_number,
+        "questions": questions,
+        "time_for_completion": item.time_for_completion,
+        "is_active": item.is_active,
+        "version": 1,
+    }
+
+
+async def import_bundle(course_id: int, data: bytes, skip_existing: bool = False) -> QuizImportResult:
+    raw_quizzes, archive = await run_in_threadpool(read_bundle, data)
+    numbers = [raw.get("quiz_number") for raw in raw_quizzes if isinstance(raw, dict)]
+    cursor = get_quiz_collection().find(
+        {"course_id": course_id, "quiz_number": {"$in": [number for number in numbers if isinstance(number, int)]}},
+        {"quiz_number": 1}
+    )
+    existing = {quiz["quiz_number"] for quiz in await cursor.to_list(length=None)}
+
+    results, to_create = _validate(raw_quizzes, archive, existing, skip_existing)
+    if any(result.status == "invalid" for result in results):
+        report = QuizImportResult(course_id=course_id, created=0, quizzes=results, images=[])
+        raise HTTPException(status_code=422, detail=report.model_dump())
+
+    image_names = {
+        question.image_file
+        for item in to_create.values()
+        for question in item.questions
+        if question.image_file is not None
+    }
+    images = await _upload_images(course_id, archive, image_names) if image_names else {}
+
+    documents = []
+    indexes = []
+    for index, item in to_create.items():
+        failed = [
+            question.image_file for question in item.questions
+            if question.image_file is not None and images[question.image_file].status != "uploaded"
+        ]
+        if failed:
+            results[index].status = "failed"
+            results[index].errors = [f"Image {name} could not be uploaded" for name in failed]
+            continue
+        documents.append(_document(course_id, item, images))
+        indexes.append(index)
+
+    uploaded_keys = {image.file_key for image in images.values() if image.status == "uploaded"}
+    # One round trip for the whole course, unordered so one bad document doesn't stop the rest
+    failed_positions = {}
+    if documents:
+        try:
+            await get_quiz_collection().insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed_positions = {error["index"]: error["errmsg"] for error in e.details.get("writeErrors", [])}
+        except BaseException:
+            # Some documents may have been written, the job only deletes keys no quiz uses
+            await _discard_images(course_id, sorted(uploaded_keys))
+            raise
+
+    created = 0
+    for position, (index, document) in enumerate(zip(indexes, documents)):
+        if position in failed_positions:
+            results[index].status = "failed"
+            results[index].errors = [failed_positions[position]]
+            continue
+        results[index].id = document["_id"]
+        created += 1
+        if document["is_active"]:
+            publish_quiz_status(course_id, document["quiz_number"], True)
+            await notify_quiz_activated(course_id, document["quiz_number"])
+    if created:
+        invalidation_bus.publish("quiz", course_id)
+
+    # Images of quizzes dropped for another image's failure, or rejected by the insert
+    used_keys = {
+        question.get("image_key")
+        for position, document in enumerate(documents)
+        if position not in failed_positions
+        for question in document["questions"]
+    }
+    await _discard_images(course_id, sorted(uploaded_keys - used_keys))
+
+    return QuizImportResult(course_id=course_id, created=created, quizzes=results, images=list(images.values()))
+
+
+async def export_bundle(course_id: int, include_images: bool) -> bytes:
+    """Export every quiz of the course as a JSON manifest, or as a ZIP that also holds the images."""
+    cursor = get_quiz_collection().find({"course_id": course_id}, {"_id": 0, "course_id": 0, "version": 0})
+    quizzes = sorted(await cursor.to_list(length=None), key=lambda quiz: quiz["quiz_number"])
+    if not quizzes:
+        raise HTTPException(status_code=404, detail="No quizzes found")
+
+    if not include_images:
+        return json.dumps({"course_id": course_id, "quizzes": quizzes}).encode()
+
+    image_keys = {
+        question["image_key"]
+        for quiz in quizzes
+        for question in quiz.get("questions", [])
+        if question.get("image_key")
+    }
+    semaphore = asyncio.Semaphore(QUIZ_IMPORT_IMAGE_CONCURRENCY)
+    s3_handler = get_s3_handler()
+
+    async def download(file_key: str) -> tuple[str, Optional[bytes]]:
+        async with semaphore:
+            success, content = await run_in_threadpool(s3_handler.download_file, file_key)
+        return file_key, content if success else None
+
+    downloaded = dict(await asyncio.gather(*(download(file_key) for file_key in sorted(image_keys))))
+    for quiz in quizzes:
+        for question in quiz.get("questions", []):
+            # Images that could not be downloaded keep pointing at their old URL
+            if downloaded.get(question.get("image_key")) is not None:
+                question["image_file"] = f"{EXPORT_IMAGE_DIR}/{question['image_key']}"
+
+    def build_zip() -> bytes:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(MANIFEST_NAME, json.dumps({"course_id": course_id, "quizzes": quizzes}))
+            for file_key, content in downloaded.items():
+                if content is not None:
+                    archive.writestr(f"{EXPORT_IMAGE_DIR}/{file_key}", content)
+        return buffer.getvalue()
+
+    return await run_in_threadpool(build_zip)
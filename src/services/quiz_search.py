@@ -0,0 +1,222 @@
+import asyncio
+import html
+import math
+import re
+import time
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from src.config import QUIZ_SEARCH_REBUILD_SECONDS
+from src.database.mongo import get_quiz_collection
+from src.services.invalidation import invalidation_bus
+
+# Matches in the question text count more than in the answers, and those more than in the explanation
+FIELD_WEIGHTS = {"question": 3.0, "answers": 1.5, "explanation": 1.0}
+SNIPPET_LENGTH = 160
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r"\w+")
+
+QuestionKey = tuple[int, int, int]  # (course_id, quiz_number, question_number)
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class _IndexedQuestion(NamedTuple):
+    quiz_id: str
+    fields: dict  # field name -> text
+    terms: dict  # term -> weighted frequency
+    length: float
+
+
+class SearchHit(NamedTuple):
+    key: QuestionKey
+    quiz_id: str
+    question: str
+    score: float
+    matched_fields: list
+    snippet: str
+
+
+def _index_question(quiz_id: str, question: dict) -> _IndexedQuestion:
+    fields = {
+        "question": question.get("question") or "",
+        "answers": " / ".join(text for _, text in question.get("answer") or []),
+        "explanation": question.get("explanation") or "",
+    }
+    terms = Counter()
+    for field, text in fields.items():
+        for token in tokenize(text):
+            terms[token] += FIELD_WEIGHTS[field]
+    return _IndexedQuestion(quiz_id, fields, dict(terms), sum(terms.values()))
+
+
+def highlight(text: str, terms: set, length: int = SNIPPET_LENGTH) -> str:
+    """HTML-escaped excerpt of `text` around the first matching term, every match wrapped in <mark>."""
+    matches = [match for match in _TOKEN.finditer(text) if match.group().lower() in terms]
+    start = 0
+    if matches and len(text) > length:
+        start = max(0, min(matches[0].start() - length // 4, len(text) - length))
+    end = min(len(text), start + length)
+
+    parts = ["…" if start > 0 else ""]
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+    parts.append("…" if end < len(text) else "")
+    return "".join(parts)
+
+
+class QuizSearchIndex:
+    """
+    Inverted index over question texts, answer texts and explanations of every quiz, kept in
+    each worker. It is built from Mongo on the first search and then follows quiz writes through
+    the "quiz" namespace of the invalidation bus: a write marks the quiz (or the whole course)
+    stale, and the next search reloads only what is stale before answering.
+    """
+
+    def __init__(self, rebuild_interval: float = QUIZ_SEARCH_REBUILD_SECONDS):
+        self.rebuild_interval = rebuild_interval
+        self._postings: dict[str, set[QuestionKey]] = {}
+        self._questions: dict[QuestionKey, _IndexedQuestion] = {}
+        self._quiz_questions: dict[tuple[int, int], list[QuestionKey]] = {}
+        self._total_length = 0.0
+        self._built_at: Optional[float] = None
+        self._stale_quizzes: set[tuple[int, int]] = set()
+        self._stale_courses: set[int] = set()
+        self._lock = asyncio.Lock()
+
+    def mark_stale(self, course_id: int, quiz_number: Optional[int] = None) -> None:
+        if quiz_number is None:
+            self._stale_courses.add(course_id)
+        else:
+            self._stale_quizzes.add((course_id, quiz_number))
+
+    def clear(self) -> None:
+        self._built_at = None
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at > self.rebuild_interval:
+                await self._rebuild()
+                return
+            # Swapped out before awaiting, so writes during the reload are picked up next time
+            courses, self._stale_courses = self._stale_courses, set()
+            quizzes, self._stale_quizzes = self._stale_quizzes, set()
+            quizzes = {key for key in quizzes if key[0] not in courses}
+            for course_id in courses:
+                await self._reload({"course_id": course_id}, [key for key in self._quiz_questions if key[0] == course_id])
+            if quizzes:
+                query = {"$or": [{"course_id": course_id, "quiz_number": number} for course_id, number in quizzes]}
+                await self._reload(query, quizzes)
+
+    async def _rebuild(self) -> None:
+        self._stale_courses.clear()
+        self._stale_quizzes.clear()
+        built_at = time.monotonic()
+        # Searches keep using the current index until the new one is complete
+        fresh = QuizSearchIndex(self.rebuild_interval)
+        for quiz in await self._fetch({}):
+            fresh._add_quiz(quiz)
+        self._postings, self._questions, self._quiz_questions, self._total_length = (
+            fresh._postings, fresh._questions, fresh._quiz_questions, fresh._total_length
+        )
+        self._built_at = built_at
+
+    async def _fetch(self, query: dict) -> list[dict]:
+        cursor = get_quiz_collection().find(
+            query, {"course_id": 1, "quiz_number": 1, "questions.question": 1,
+                    "questions.answer": 1, "questions.explanation": 1}
+        )
+        return await cursor.to_list(length=None)
+
+    async def _reload(self, query: dict, previous: list) -> None:
+        quizzes = await self._fetch(query)
+        for quiz_key in previous:
+            self._remove_quiz(quiz_key)
+        for quiz in quizzes:
+            self._add_quiz(quiz)
+
+    def _add_quiz(self, quiz: dict) -> None:
+        quiz_key = (quiz["course_id"], quiz["quiz_number"])
+        self._remove_quiz(quiz_key)
+        keys = []
+        for number, question in enumerate(quiz.get("questions", [])):
+            key = (*quiz_key, number)
+            indexed = _index_question(str(quiz["_id"]), question)
+            self._questions[key] = indexed
+            self._total_length += indexed.length
+            for term in indexed.terms:
+                self._postings.setdefault(term, set()).add(key)
+            keys.append(key)
+        self._quiz_questions[quiz_key] = keys
+
+    def _remove_quiz(self, quiz_key: tuple[int, int]) -> None:
+        for key in self._quiz_questions.pop(quiz_key, []):
+            indexed = self._questions.pop(key)
+            self._total_length -= indexed.length
+            for term in indexed.terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.discard(key)
+                    if not postings:
+                        del self._postings[term]
+
+    def search(self, query: str, course_id: Optional[int] = None,
+               skip: int = 0, limit: int = 20) -> tuple[int, list[SearchHit]]:
+        """
+        Questions matching any term of the query, best BM25 score first.
+        Returns the number of matches and the requested page of them.
+        """
+        terms = set(tokenize(query))
+        if not terms or not self._questions:
+            return 0, []
+        total = len(self._questions)
+        average_length = self._total_length / total
+
+        scores: dict[QuestionKey, float] = {}
+        for term in terms:
+            postings = self._postings.get(term, ())
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key in postings:
+                if course_id is not None and key[0] != course_id:
+                    continue
+                indexed = self._questions[key]
+                frequency = indexed.terms[term]
+                norm = K1 * (1 - B + B * indexed.length / average_length)
+                scores[key] = scores.get(key, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        # Snippets are only built for the page that is returned
+        return len(ranked), [self._hit(key, score, terms) for key, score in ranked[skip:skip + limit]]
+
+    def _hit(self, key: QuestionKey, score: float, terms: set) -> SearchHit:
+        indexed = self._questions[key]
+        matched = [field for field, text in indexed.fields.items() if terms.intersection(tokenize(text))]
+        return SearchHit(
+            key=key,
+            quiz_id=indexed.quiz_id,
+            question=indexed.fields["question"],
+            score=round(score, 4),
+            matched_fields=matched,
+            snippet=highlight(indexed.fields[matched[0]], terms),
+        )
+
+
+quiz_search_index = QuizSearchIndex()
+invalidation_bus.register("quiz", quiz_search_index.mark_stale, quiz_search_index.clear)
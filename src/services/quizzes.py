@@ -0,0 +1,14 @@
+from typing import Optional
+
+from src.cache import quiz_cache
+from src.database.mongo import get_quiz_collection
+
+
+async def get_quiz(course_id: int, quiz_number: int) -> Optional[dict]:
+    """Quiz document by its number in the course, served from the quiz cache when possible."""
+    quiz = quiz_cache.get((course_id, quiz_number))
+    if quiz is None:
+        quiz = await get_quiz_collection().find_one({"course_id": course_id, "quiz_number": quiz_number})
+        if quiz is not None:
+            quiz_cache.set((course_id, quiz_number), quiz)
+    return quiz
@@ -0,0 +1,12 @@
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.models import User
+
+
+async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> Optional[User]:
+    query = select(User).where(User.telegram_id == telegram_id)
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
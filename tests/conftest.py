@@ -0,0 +1,65 @@
+"""
+Every test gets its own SQLite database and in-memory Mongo, installed through set_engine and
+set_mongo_client, so neither Postgres, MongoDB nor the network is needed.
+
+Usage:
+    pip install -r tests/requirements.txt
+    python -m pytest tests
+
+Tests are plain functions that drive their coroutines with asyncio.run.
+"""
+import asyncio
+import os
+
+# Every test request comes from one address, the rate limit tests build their own middleware
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.cache import analytics_cache, quiz_cache
+from src.database.database import set_engine
+from src.database.mongo import set_mongo_client
+from src.models.models import Base
+
+
+def sqlite_engine(path) -> AsyncEngine:
+    # No pooled connection outlives the asyncio.run that opened it
+    return create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+
+async def create_schema(engine: AsyncEngine) -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
+def api_client(app, client: tuple = ("127.0.0.1", 50000)) -> httpx.AsyncClient:
+    """HTTP client calling the ASGI app in process, `client` is the address the app sees."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=client), base_url="http://test")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlite_engine(tmp_path / "primary.db")
+    asyncio.run(create_schema(engine))
+    set_engine(engine)
+    yield engine
+    set_engine(None)
+
+
+@pytest.fixture(autouse=True)
+def mongo():
+    client = AsyncMongoMockClient()
+    set_mongo_client(client)
+    yield client
+    set_mongo_client(None)
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    yield
+    quiz_cache.clear()
+    analytics_cache.clear()
@@ -0,0 +1,63 @@
+import asyncio
+import uuid
+
+import pytest
+
+from src.main import app
+from src.services import grades
+from tests.conftest import api_client
+
+GRADE = {
+    "course_id": 1, "user_id": 1, "quiz_number": 1, "grade": 8,
+    "time_completion": 60, "date": "2025-02-01T10:00:00",
+}
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError("connection dropped")
+
+
+async def submit(client, key: str):
+    return await client.post("/grades/", json=GRADE, headers={"Idempotency-Key": key})
+
+
+def test_retry_after_a_failure_past_the_commit_gets_the_saved_grade(engine, monkeypatch):
+    key = str(uuid.uuid4())
+
+    async def scenario():
+        async with api_client(app) as client:
+            with monkeypatch.context() as patch:
+                patch.setattr(grades, "publish_grade_created", fail)
+                with pytest.raises(RuntimeError):
+                    await submit(client, key)
+
+            retried = await submit(client, key)
+            assert retried.status_code == 200
+            assert retried.headers["Idempotent-Replayed"] == "true"
+            assert retried.json()["grade"] == 8
+
+            saved = await client.get(f"/grades/{retried.json()['id']}", params={"grade_id": retried.json()["id"]})
+            assert saved.status_code == 200
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_a_failure_before_the_commit_runs_again(engine, monkeypatch):
+    key = str(uuid.uuid4())
+
+    async def scenario():
+        async with api_client(app) as client:
+            with monkeypatch.context() as patch:
+                patch.setattr(grades, "add_grade_to_stats", fail)
+                with pytest.raises(RuntimeError):
+                    await submit(client, key)
+
+            retried = await submit(client, key)
+            assert retried.status_code == 200
+            assert "Idempotent-Replayed" not in retried.headers
+
+            replayed = await submit(client, key)
+            assert replayed.headers["Idempotent-Replayed"] == "true"
+            assert replayed.json() == retried.json()
+
+    asyncio.run(scenario())
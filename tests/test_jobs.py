@@ -0,0 +1,80 @@
+import asyncio
+
+from sqlalchemy import select
+
+from src.database.database import get_session_maker
+from src.models.models import BackgroundJob
+from src.services.jobs import DurableJobQueue
+
+LEASE = 0.5
+
+
+def durable_queue() -> DurableJobQueue:
+    return DurableJobQueue(workers=2, lease=LEASE, poll_interval=0.02, retry_base=0.01, max_attempts=5)
+
+
+async def job_rows() -> list:
+    async with get_session_maker()() as db:
+        return (await db.execute(select(BackgroundJob))).scalars().all()
+
+
+async def no_jobs_left() -> None:
+    while await job_rows():
+        await asyncio.sleep(0.02)
+
+
+async def run_until(queue: DurableJobQueue, done, timeout: float = 5) -> None:
+    await queue.start()
+    try:
+        await asyncio.wait_for(done(), timeout)
+    finally:
+        await queue.stop(drain_timeout=timeout)
+
+
+def test_a_job_running_longer_than_its_lease_runs_once(engine):
+    queue = durable_queue()
+    calls = []
+
+    @queue.register("slow")
+    async def slow() -> None:
+        calls.append(len(calls) + 1)
+        await asyncio.sleep(LEASE * 3)
+
+    async def scenario():
+        await queue.enqueue("slow")
+        await run_until(queue, no_jobs_left)
+
+    asyncio.run(scenario())
+    assert calls == [1]
+
+
+def test_a_worker_that_lost_its_lease_leaves_the_job_to_the_next_one(engine, monkeypatch):
+    queue = durable_queue()
+    calls = []
+
+    async def no_heartbeat(job, stopped):
+        # A worker that can't extend its lease, e.g. its event loop is blocked
+        await stopped.wait()
+
+    monkeypatch.setattr(queue, "_heartbeat", no_heartbeat)
+
+    @queue.register("slow")
+    async def slow() -> None:
+        attempt = len(calls) + 1
+        calls.append(attempt)
+        if attempt == 1:
+            # Outlives its lease, the second worker claims the job meanwhile and this attempt
+            # fails while the second one is still running
+            await asyncio.sleep(LEASE * 1.4)
+            raise RuntimeError("first attempt failed")
+        await asyncio.sleep(LEASE * 0.6)
+
+    async def scenario():
+        await queue.enqueue("slow")
+        await run_until(queue, no_jobs_left)
+
+    asyncio.run(scenario())
+    # The late failure neither rescheduled the job nor overwrote the second claim
+    assert calls == [1, 2]
+    assert queue.failed == 1
+    assert queue.completed == 1
@@ -0,0 +1,87 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from src.database.aws_s3 import S3Handler, set_s3_handler
+from src.database.mongo import get_quiz_collection
+from src.services import quiz_bundle
+from src.services.quiz_bundle import import_bundle
+
+BUCKET = "quiz-images"
+
+
+def make_bundle(images_per_quiz: dict) -> bytes:
+    """ZIP bundle with one question per image, `images_per_quiz` maps quiz numbers to image names."""
+    quizzes = [
+        {
+            "quiz_number": number,
+            "time_for_completion": 60,
+            "questions": [{"question": f"{name}?", "answer": [[True, "yes"]], "image_file": name} for name in names],
+        }
+        for number, names in images_per_quiz.items()
+    ]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(quiz_bundle.MANIFEST_NAME, json.dumps({"quizzes": quizzes}))
+        for names in images_per_quiz.values():
+            for name in names:
+                archive.writestr(name, f"image {name}")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        set_s3_handler(S3Handler(client, bucket_name=BUCKET))
+        yield client
+        set_s3_handler(None)
+
+
+def stored_keys(s3) -> set:
+    return {item["Key"] for item in s3.list_objects_v2(Bucket=BUCKET).get("Contents", [])}
+
+
+def test_images_of_a_quiz_the_insert_rejects_are_deleted(s3, monkeypatch):
+    upload_images = quiz_bundle._upload_images
+
+    async def upload_then_lose_the_race(course_id, archive, names):
+        # Another import creates quiz #2 while the images of this one upload
+        images = await upload_images(course_id, archive, names)
+        await get_quiz_collection().insert_one({"course_id": course_id, "quiz_number": 2, "questions": []})
+        return images
+
+    monkeypatch.setattr(quiz_bundle, "_upload_images", upload_then_lose_the_race)
+
+    async def scenario():
+        await get_quiz_collection().create_index([("course_id", 1), ("quiz_number", 1)], unique=True)
+        return await import_bundle(1, make_bundle({1: ["1.png"], 2: ["2.png"]}))
+
+    result = asyncio.run(scenario())
+    assert result.created == 1
+    assert [quiz.status for quiz in result.quizzes] == ["created", "failed"]
+    kept = next(image.file_key for image in result.images if image.file == "1.png")
+    assert stored_keys(s3) == {kept}
+
+
+def test_images_of_a_quiz_dropped_for_a_failed_upload_are_deleted(s3, monkeypatch):
+    upload_file = S3Handler.upload_file
+
+    def fail_2b(handler, file, file_key):
+        if file_key.endswith("/2b.png"):
+            return False, "Access Denied"
+        return upload_file(handler, file, file_key)
+
+    monkeypatch.setattr(S3Handler, "upload_file", fail_2b)
+    # 2.png uploads, but quiz #2 can't be created without 2b.png
+    result = asyncio.run(import_bundle(1, make_bundle({1: ["1.png"], 2: ["2.png", "2b.png"]})))
+    assert result.created == 1
+    assert [quiz.status for quiz in result.quizzes] == ["created", "failed"]
+    kept = next(image.file_key for image in result.images if image.file == "1.png")
+    assert stored_keys(s3) == {kept}
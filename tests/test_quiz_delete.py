@@ -0,0 +1,26 @@
+import asyncio
+
+from src.database.mongo import get_quiz_collection
+from src.main import app
+from src.routes import quiz_routes
+from tests.conftest import api_client
+
+
+def test_delete_succeeds_when_the_image_cleanup_cannot_be_queued(monkeypatch):
+    async def broken_enqueue(name, **payload):
+        raise ConnectionError("job table unreachable")
+
+    monkeypatch.setattr(quiz_routes.job_queue, "enqueue", broken_enqueue)
+
+    async def scenario():
+        quizzes = get_quiz_collection()
+        await quizzes.insert_one({
+            "course_id": 1, "quiz_number": 1, "version": 1,
+            "questions": [{"question": "2 + 2?", "image_key": "quiz_images/1/a/plot.png"}],
+        })
+        async with api_client(app) as client:
+            response = await client.delete("/quiz/course/1/number/1")
+        assert response.status_code == 200
+        assert await quizzes.count_documents({"course_id": 1}) == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import asyncio
+
+from src.database.mongo import get_quiz_collection
+from src.services.quiz_search import QuizSearchIndex
+
+
+def test_searches_during_a_rebuild_use_the_previous_index(monkeypatch):
+    index = QuizSearchIndex()
+
+    async def scenario():
+        await get_quiz_collection().insert_one({
+            "course_id": 1, "quiz_number": 1,
+            "questions": [{"question": "What is photosynthesis?", "answer": [[True, "Light to sugar"]]}],
+        })
+        await index.refresh()
+        assert index.search("photosynthesis")[0] == 1
+
+        fetch = index._fetch
+        fetching, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_fetch(query):
+            fetching.set()
+            await release.wait()
+            return await fetch(query)
+
+        monkeypatch.setattr(index, "_fetch", slow_fetch)
+        index.clear()
+        rebuild = asyncio.create_task(index.refresh())
+        await fetching.wait()
+        during = index.search("photosynthesis")
+        release.set()
+        await rebuild
+        return during, index.search("photosynthesis")
+
+    during, after = asyncio.run(scenario())
+    assert during[0] == 1
+    assert after[0] == 1
+    assert during[1][0].key == (1, 1, 0)
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi_users.jwt import generate_jwt
+
+from src.auth.config import get_jwt_strategy
+from src.middleware import rate_limit
+from src.middleware.rate_limit import DEFAULT_POLICIES, RateLimitMiddleware
+from tests.conftest import api_client
+
+SCHOOL_NETWORK = ("203.0.113.7", 50000)
+GRADE_SUBMIT = next(policy for policy in DEFAULT_POLICIES if policy.name == "grade_submit")
+
+
+@pytest.fixture(autouse=True)
+def frozen_clock(monkeypatch):
+    """No bucket refills during a test, however slow the machine."""
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: 1000.0))
+
+
+def limited_app() -> RateLimitMiddleware:
+    app = FastAPI()
+
+    @app.post("/grades/")
+    async def create_grade(payload: dict):
+        return payload
+
+    return RateLimitMiddleware(app)
+
+
+def access_token(user_id: int) -> str:
+    strategy = get_jwt_strategy()
+    data = {"sub": str(user_id), "aud": strategy.token_audience}
+    return generate_jwt(data, strategy.encode_key, strategy.lifetime_seconds, algorithm=strategy.algorithm)
+
+
+def test_a_class_submitting_from_one_network_goes_through():
+    students = 40
+
+    async def scenario():
+        async with api_client(limited_app(), client=SCHOOL_NETWORK) as client:
+            responses = await asyncio.gather(*(
+                client.post("/grades/", json={"user_id": user_id, "quiz_number": 1})
+                for user_id in range(1, students + 1)
+            ))
+        return [response.status_code for response in responses]
+
+    assert students > GRADE_SUBMIT.burst
+    assert asyncio.run(scenario()) == [200] * students
+
+
+def test_the_shared_network_bucket_still_has_a_limit():
+    async def scenario():
+        async with api_client(limited_app(), client=SCHOOL_NETWORK) as client:
+            statuses = [
+                (await client.post("/grades/", json={"user_id": user_id})).status_code
+                for user_id in range(GRADE_SUBMIT.ip_burst + 1)
+            ]
+        return statuses
+
+    statuses = asyncio.run(scenario())
+    assert statuses[:-1] == [200] * GRADE_SUBMIT.ip_burst
+    assert statuses[-1] == 429
+
+
+def test_signed_in_students_get_their_own_bucket():
+    async def scenario():
+        async with api_client(limited_app(), client=SCHOOL_NETWORK) as client:
+            signed_in = {"Authorization": f"Bearer {access_token(7)}"}
+            statuses = [
+                (await client.post("/grades/", json={}, headers=signed_in)).status_code
+                for _ in range(GRADE_SUBMIT.burst + 1)
+            ]
+            # The rest of the network is not held back by that student
+            anonymous = await client.post("/grades/", json={})
+        return statuses, anonymous.status_code
+
+    statuses, anonymous = asyncio.run(scenario())
+    assert statuses[:-1] == [200] * GRADE_SUBMIT.burst
+    assert statuses[-1] == 429
+    assert anonymous == 200
+
+
+def test_a_forged_token_shares_the_network_bucket():
+    async def scenario():
+        async with api_client(limited_app(), client=SCHOOL_NETWORK) as client:
+            for user_id in range(GRADE_SUBMIT.ip_burst):
+                forged = {"Authorization": f"Bearer not-a-token-{user_id}"}
+                assert (await client.post("/grades/", json={}, headers=forged)).status_code == 200
+            return (await client.post("/grades/", json={})).status_code
+
+    assert asyncio.run(scenario()) == 429
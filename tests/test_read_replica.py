@@ -0,0 +1,118 @@
+import asyncio
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from src.cache import TTLCache
+from src.database import database
+from src.database.database import ReplicaHealth, get_session_maker
+from src.main import app
+from src.middleware.read_your_writes import ReadYourWritesMiddleware
+from src.models.models import Course
+from tests.conftest import api_client, create_schema, sqlite_engine
+
+STICKY_SECONDS = 1
+ANOTHER_CLIENT = ("10.0.0.2", 50000)
+
+
+async def add_course(session_maker, name: str) -> None:
+    async with session_maker() as session:
+        session.add(Course(name=name, start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), people_count=1))
+        await session.commit()
+
+
+@pytest.fixture
+def replica(engine, tmp_path, monkeypatch):
+    """A second SQLite database standing in for the replica, told apart by the course it holds."""
+    replica = sqlite_engine(tmp_path / "replica.db")
+    replica_session_maker = sessionmaker(replica, class_=AsyncSession, expire_on_commit=False)
+
+    async def seed():
+        await create_schema(replica)
+        await add_course(get_session_maker(), "primary")
+        await add_course(replica_session_maker, "replica")
+
+    asyncio.run(seed())
+    health = ReplicaHealth(replica, max_lag=2, check_interval=0)
+    monkeypatch.setattr(database, "_replica_engine", replica)
+    monkeypatch.setattr(database, "_replica_session_maker", replica_session_maker)
+    monkeypatch.setattr(database, "_replica_health", health)
+    monkeypatch.setattr(database, "recent_writers", TTLCache(ttl=STICKY_SECONDS))
+    # SQLite has no pg_is_in_recovery(), report the lag a Postgres replica would
+    monkeypatch.setattr(database, "REPLICA_LAG_QUERY", text("SELECT 0"))
+    return health
+
+
+async def course_names(client) -> list:
+    response = await client.get("/courses/")
+    assert response.status_code == 200
+    return sorted(course["name"] for course in response.json())
+
+
+def test_reads_go_to_the_replica(replica):
+    async def scenario():
+        async with api_client(ReadYourWritesMiddleware(app)) as client:
+            assert await course_names(client) == ["replica"]
+
+    asyncio.run(scenario())
+    assert replica.lag == 0
+
+
+def test_writer_reads_from_the_primary_until_its_entry_expires(replica):
+    async def scenario():
+        routed = ReadYourWritesMiddleware(app)
+        async with api_client(routed) as writer, api_client(routed, client=ANOTHER_CLIENT) as reader:
+            response = await writer.post(
+                "/courses/",
+                json={"name": "new", "start_date": "2025-01-01", "end_date": "2025-12-31", "people_count": 1},
+            )
+            assert response.status_code == 200
+
+            assert await course_names(writer) == ["new", "primary"]
+            assert await course_names(reader) == ["replica"]
+
+            await asyncio.sleep(STICKY_SECONDS + 0.05)
+            assert await course_names(writer) == ["replica"]
+
+    asyncio.run(scenario())
+
+
+def test_lagging_replica_falls_back_to_the_primary(replica, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_LAG_QUERY", text("SELECT 30"))
+
+    async def scenario():
+        async with api_client(ReadYourWritesMiddleware(app)) as client:
+            assert await course_names(client) == ["primary"]
+
+    asyncio.run(scenario())
+    assert replica.lag == 30
+    assert not replica.usable
+
+
+def test_failed_health_check_falls_back_to_the_primary(replica, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_LAG_QUERY", text("SELECT pg_is_in_recovery()"))
+
+    async def scenario():
+        async with api_client(ReadYourWritesMiddleware(app)) as client:
+            assert await course_names(client) == ["primary"]
+
+    asyncio.run(scenario())
+    assert replica.lag is None
+    assert not replica.usable
+
+
+def test_health_is_measured_once_per_interval(replica, monkeypatch):
+    replica.check_interval = 60
+    replica.usable, replica._checked_at = True, time.monotonic()
+    # Would fail if it ran, the cached result is used instead
+    monkeypatch.setattr(database, "REPLICA_LAG_QUERY", text("SELECT pg_is_in_recovery()"))
+
+    async def scenario():
+        async with api_client(ReadYourWritesMiddleware(app)) as client:
+            assert await course_names(client) == ["replica"]
+
+    asyncio.run(scenario())